@@ -0,0 +1,144 @@
+"""
+Async serving mode with micro-batched semantic search
+A single-process asyncio HTTP server for long-running deployments. Requests are
+adapted to the API Gateway event shape (see local_server.build_event) and run
+on a handler thread pool; /search queries are collected by a MicroBatcher for
+up to BATCH_MAX_WAIT_MS (or BATCH_MAX_SIZE queries), encoded with one ONNX call
+on the batcher's inference thread and scored with one matrix product.
+
+Usage:
+    python async_server.py --port 8000 --max-batch-size 16 --max-wait-ms 5
+    python async_server.py --embeddings embeddings.npz
+"""
+import argparse
+import asyncio
+import importlib
+import json
+from concurrent.futures import ThreadPoolExecutor
+from http import HTTPStatus
+from urllib.parse import urlsplit
+
+from utils.config import Config
+from utils import single_flight
+from local_server import build_event, response_body, load_embeddings
+
+import lambda_handler
+
+
+async def read_request(reader):
+    """
+    Read one HTTP/1.1 request
+    Returns:
+        tuple: (method, target, version, headers dict with lower-case names, body), or None at EOF
+    """
+    request_line = await reader.readline()
+    if not request_line.strip():
+        return None
+    method, target, version = request_line.decode('latin-1').rstrip('\r\n').split(' ', 2)
+
+    headers = {}
+    while True:
+        line = await reader.readline()
+        if line in (b'\r\n', b'\n', b''):
+            break
+        name, _, value = line.decode('latin-1').partition(':')
+        headers[name.strip().lower()] = value.strip()
+
+    length = int(headers.get('content-length') or 0)
+    body = await reader.readexactly(length) if length else b''
+    return method, target, version, headers, body
+
+
+def format_response(response, keep_alive):
+    """Serialize a Lambda proxy response as HTTP/1.1 bytes"""
+    status = response.get('statusCode', 500)
+    payload = response_body(response)
+    try:
+        reason = HTTPStatus(status).phrase
+    except ValueError:
+        reason = ''
+    lines = [f"HTTP/1.1 {status} {reason}"]
+    for name, value in (response.get('headers') or {}).items():
+        lines.append(f"{name}: {value}")
+    lines.append(f"Content-Length: {len(payload)}")
+    lines.append(f"Connection: {'keep-alive' if keep_alive else 'close'}")
+    return ('\r\n'.join(lines) + '\r\n\r\n').encode('latin-1') + payload
+
+
+class AsyncServer:
+    """
+    asyncio front end; handlers run on a thread pool so blocking DynamoDB and
+    batcher waits never stall the event loop
+    """
+
+    def __init__(self, host, port, handler_threads):
+        self.host = host
+        self.port = port
+        self.executor = ThreadPoolExecutor(max_workers=handler_threads, thread_name_prefix='handler')
+
+    async def handle_connection(self, reader, writer):
+        loop = asyncio.get_running_loop()
+        try:
+            while True:
+                try:
+                    request = await read_request(reader)
+                except (asyncio.IncompleteReadError, ValueError):
+                    break
+                if request is None:
+                    break
+                method, target, version, headers, body = request
+                parts = urlsplit(target)
+                event = build_event(method, parts.path, parts.query, headers, body)
+
+                response = await loop.run_in_executor(self.executor, lambda_handler.lambda_handler, event, None)
+
+                keep_alive = version == 'HTTP/1.1' and headers.get('connection', '').lower() != 'close'
+                writer.write(format_response(response, keep_alive))
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+    async def serve(self):
+        server = await asyncio.start_server(self.handle_connection, self.host, self.port, backlog=512)
+        print(f"Serving on http://{self.host}:{self.port} (async, {self.executor._max_workers} handler threads)")
+        async with server:
+            await server.serve_forever()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve the API with asyncio and micro-batched /search")
+    parser.add_argument('--host', default=Config.SERVER_HOST)
+    parser.add_argument('--port', type=int, default=Config.SERVER_PORT)
+    parser.add_argument('--handler-threads', type=int, default=Config.SERVER_HANDLER_THREADS)
+    parser.add_argument('--max-batch-size', type=int, default=Config.BATCH_MAX_SIZE)
+    parser.add_argument('--max-wait-ms', type=float, default=Config.BATCH_MAX_WAIT_MS)
+    parser.add_argument('--embeddings', help='local embeddings base archive (.npz) instead of S3')
+    args = parser.parse_args()
+
+    recommendations = importlib.import_module('lambda_functions.RecommendationFunctions')
+    if args.embeddings:
+        from utils.embedding_snapshot import EmbeddingSnapshot, MatrixEmbeddings, SnapshotHolder
+        embeddings, version = load_embeddings(args.embeddings)
+        holder = SnapshotHolder(recommendations.get_s3_client, refresh_interval=0)
+        holder.set(EmbeddingSnapshot(MatrixEmbeddings.from_dict(embeddings), version))
+        recommendations._snapshot_holder = holder
+    # Load embeddings (from S3 unless given) and the model before taking traffic
+    lambda_handler.load_module('lambda_functions.RecommendationFunctions')
+    recommendations.load_embeddings()
+    recommendations.get_encoder()
+
+    batcher = recommendations.enable_semantic_batching(args.max_batch_size, args.max_wait_ms)
+    try:
+        asyncio.run(AsyncServer(args.host, args.port, args.handler_threads).serve())
+    except KeyboardInterrupt:
+        pass
+    finally:
+        print(json.dumps({'semantic_batching': batcher.metrics(), 'coalescing': single_flight.metrics()}))
+
+
+if __name__ == "__main__":
+    main()
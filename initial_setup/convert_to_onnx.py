@@ -1,71 +1,252 @@
 from sentence_transformers import SentenceTransformer
 import os
+import time
+import shutil
+import argparse
 import boto3
+import numpy as np
+import onnxruntime
+from onnxruntime.quantization import quantize_dynamic, QuantType
+from onnxruntime.transformers.optimizer import optimize_model
 from utils.config import Config
 from transformers import AutoTokenizer, AutoModel
 import torch
 from pathlib import Path
 
-def convert_and_optimize_model():
-    """Convert sentence-transformer model to ONNX and optimize it"""
-    
+# Sentences used for the accuracy check and the latency benchmark
+SAMPLE_SENTENCES = [
+    "This is a test sentence",
+    "action movies with superheroes and adventure",
+    "romantic comedies set in New York",
+    "sci-fi movies about space exploration",
+    "animated family movies",
+    "thrillers with plot twists",
+    "classic western films",
+    "horror movies with haunted houses",
+    "biographical sports dramas",
+    "A young wizard discovers his heritage and attends a school of magic, where he faces the dark lord who killed his parents",
+]
+
+VARIANTS = ['fp32', 'optimized', 'int8']
+
+
+class PooledSentenceEncoder(torch.nn.Module):
+    """Transformer followed by masked mean pooling and L2 normalization"""
+
+    def __init__(self, transformer):
+        super().__init__()
+        self.transformer = transformer
+
+    def forward(self, input_ids, attention_mask):
+        last_hidden_state = self.transformer(input_ids=input_ids, attention_mask=attention_mask)[0]
+        mask = attention_mask.unsqueeze(-1).to(last_hidden_state.dtype)
+        summed = (last_hidden_state * mask).sum(dim=1)
+        counts = mask.sum(dim=1).clamp(min=1e-9)
+        return torch.nn.functional.normalize(summed / counts, p=2, dim=1)
+
+
+def export_model(transformer, tokenizer, model_path, pooled):
+    """Export the transformer (optionally with pooling folded in) to ONNX"""
+    inputs = tokenizer("This is a test sentence", return_tensors="pt", padding=True, truncation=True)
+
+    if pooled:
+        module = PooledSentenceEncoder(transformer).eval()
+        output_name = 'sentence_embedding'
+        output_axes = {0: 'batch'}
+    else:
+        module = transformer
+        output_name = 'last_hidden_state'
+        output_axes = {0: 'batch', 1: 'sequence'}
+
+    torch.onnx.export(
+        module,
+        (inputs['input_ids'], inputs['attention_mask']),
+        model_path,
+        input_names=['input_ids', 'attention_mask'],
+        output_names=[output_name],
+        dynamic_axes={
+            'input_ids': {0: 'batch', 1: 'sequence'},
+            'attention_mask': {0: 'batch', 1: 'sequence'},
+            output_name: output_axes
+        },
+        opset_version=14
+    )
+
+
+def optimize_graph(model_path, optimized_path, transformer_config):
+    """Apply ORT transformer fusions (attention, layernorm, gelu) to the exported graph"""
+    optimized = optimize_model(
+        model_path,
+        model_type='bert',
+        num_heads=transformer_config.num_attention_heads,
+        hidden_size=transformer_config.hidden_size
+    )
+    optimized.save_model_to_file(optimized_path)
+    print(f"Fused operators: {optimized.get_fused_operator_statistics()}")
+
+
+def quantize_graph(model_path, quantized_path):
+    """Int8 dynamic quantization of the weights (activations quantized at runtime)"""
+    quantize_dynamic(model_path, quantized_path, weight_type=QuantType.QInt8)
+
+
+def onnx_sentence_embeddings(session, tokenizer, sentences):
+    """Run an exported variant and return L2-normalized sentence embeddings"""
+    inputs = tokenizer(sentences, return_tensors="np", padding=True, truncation=True)
+    input_ids = inputs['input_ids'].astype(np.int64)
+    attention_mask = inputs['attention_mask'].astype(np.int64)
+    output = session.run(None, {"input_ids": input_ids, "attention_mask": attention_mask})[0]
+
+    if output.ndim == 3:
+        mask = attention_mask[..., None].astype(output.dtype)
+        output = (output * mask).sum(axis=1) / np.maximum(mask.sum(axis=1), 1e-9)
+    return output / np.linalg.norm(output, axis=1, keepdims=True)
+
+
+def check_accuracy(model, session, tokenizer):
+    """
+    Cosine agreement between an ONNX variant and the PyTorch sentence-transformer
+    Returns:
+        tuple: (mean cosine, min cosine) over SAMPLE_SENTENCES
+    """
+    reference = model.encode(SAMPLE_SENTENCES, normalize_embeddings=True)
+    candidate = onnx_sentence_embeddings(session, tokenizer, SAMPLE_SENTENCES)
+    cosines = np.sum(reference * candidate, axis=1)
+    return float(cosines.mean()), float(cosines.min())
+
+
+def benchmark_latency(session, tokenizer, iterations=50, warmup=5):
+    """
+    Single-query CPU latency, padded to the tokenizer max length like the Lambda path
+    Returns:
+        dict: p50/p95/mean latency in milliseconds
+    """
+    inputs = tokenizer(SAMPLE_SENTENCES[1], return_tensors="np", padding='max_length', truncation=True, max_length=128)
+    feed = {
+        "input_ids": inputs['input_ids'].astype(np.int64),
+        "attention_mask": inputs['attention_mask'].astype(np.int64)
+    }
+    for _ in range(warmup):
+        session.run(None, feed)
+
+    timings = []
+    for _ in range(iterations):
+        start = time.perf_counter()
+        session.run(None, feed)
+        timings.append((time.perf_counter() - start) * 1000)
+
+    return {
+        'p50_ms': float(np.percentile(timings, 50)),
+        'p95_ms': float(np.percentile(timings, 95)),
+        'mean_ms': float(np.mean(timings))
+    }
+
+
+def convert_and_optimize_model(pooled=False, publish_variant='int8', min_cosine=0.99, upload=True):
+    """
+    Convert sentence-transformer model to ONNX and optimize it
+    Produces fp32, ORT-optimized and int8 dynamically-quantized variants, checks
+    each against the PyTorch model and benchmarks it, then publishes the chosen
+    variant as model.onnx. A variant below min_cosine falls back to the
+    optimized graph if that one passes on its own, else to the plain fp32 export.
+    Only model.onnx, the tokenizer and the config are uploaded.
+    Args:
+        pooled: fold mean pooling + L2 normalization into the graph
+        publish_variant: one of VARIANTS to publish as model.onnx
+        min_cosine: minimum per-sentence cosine agreement required to publish
+        upload: upload model.onnx, the tokenizer and the config to S3
+    """
     print(f"Starting conversion of {Config.EMBEDDING_MODEL} to ONNX...")
-    
+
     # Create output directory
     output_dir = "model_onnx"
     if not os.path.exists(output_dir):
         os.makedirs(output_dir)
-    
+
     try:        # Load the model
         model = SentenceTransformer(Config.EMBEDDING_MODEL)
         base_model = model._first_module()
-        
+
         # Get the underlying transformer model and tokenizer
         tokenizer = base_model.tokenizer
         transformer = base_model.auto_model
-        
-        # Create dummy input for ONNX export
-        inputs = tokenizer("This is a test sentence", return_tensors="pt", padding=True, truncation=True)
-        
+
+        paths = {variant: f"{output_dir}/model_{variant}.onnx" for variant in VARIANTS}
+
         # Export to ONNX
-        torch.onnx.export(
-            transformer,
-            (inputs['input_ids'], inputs['attention_mask']),
-            f"{output_dir}/model.onnx",
-            input_names=['input_ids', 'attention_mask'],
-            output_names=['last_hidden_state'],
-            dynamic_axes={
-                'input_ids': {0: 'batch', 1: 'sequence'},
-                'attention_mask': {0: 'batch', 1: 'sequence'},
-                'last_hidden_state': {0: 'batch', 1: 'sequence'}
-            },
-            opset_version=14
-        )
-        
-        print("Model converted to ONNX format")
-        
+        export_model(transformer, tokenizer, paths['fp32'], pooled)
+        print(f"Model converted to ONNX format ({'pooled sentence_embedding' if pooled else 'last_hidden_state'} output)")
+
+        optimize_graph(paths['fp32'], paths['optimized'], transformer.config)
+        print("ORT graph optimization done")
+
+        quantize_graph(paths['optimized'], paths['int8'])
+        print("Int8 dynamic quantization done")
+
+        # Accuracy check and latency benchmark per variant
+        results = {}
+        for variant, path in paths.items():
+            session = onnxruntime.InferenceSession(path, providers=['CPUExecutionProvider'])
+            mean_cos, min_cos = check_accuracy(model, session, tokenizer)
+            latency = benchmark_latency(session, tokenizer)
+            size_mb = os.path.getsize(path) / (1024 * 1024)
+            results[variant] = {'mean_cosine': mean_cos, 'min_cosine': min_cos, 'size_mb': size_mb, **latency}
+            print(f"{variant:>10}: cosine mean={mean_cos:.5f} min={min_cos:.5f} | "
+                  f"p50={latency['p50_ms']:.2f}ms p95={latency['p95_ms']:.2f}ms | {size_mb:.1f} MB")
+
+        selected = None
+        for variant in dict.fromkeys([publish_variant, 'optimized', 'fp32']):
+            if results[variant]['min_cosine'] >= min_cosine:
+                selected = variant
+                break
+            print(f"Warning: {variant} min cosine {results[variant]['min_cosine']:.5f} < {min_cosine}")
+        if selected is None:
+            print("Warning: no variant reaches the accuracy gate, publishing 'fp32'")
+            selected = 'fp32'
+        elif selected != publish_variant:
+            print(f"Publishing '{selected}' instead of '{publish_variant}'")
+        shutil.copyfile(paths[selected], f"{output_dir}/model.onnx")
+        print(f"Published variant '{selected}' as model.onnx")
+
         # Save tokenizer and configs
         tokenizer.save_pretrained(output_dir)
         transformer.config.save_pretrained(output_dir)
         print("Tokenizer and configs saved")
-        
+
         # Upload to S3
-        if Config.EMBEDDINGS_BUCKET:
+        if upload and Config.EMBEDDINGS_BUCKET:
             s3_client = boto3.client('s3')
-            
-            # Upload all files in the directory
+
+            # Upload model.onnx with the tokenizer and configs, not the candidate variants
+            variant_files = {os.path.basename(path) for path in paths.values()}
             for root, _, files in os.walk(output_dir):
                 for file in files:
+                    if file in variant_files:
+                        continue
                     local_path = os.path.join(root, file)
                     s3_key = os.path.join('model_onnx', file)
                     print(f"Uploading {local_path} to s3://{Config.EMBEDDINGS_BUCKET}/{s3_key}")
                     s3_client.upload_file(local_path, Config.EMBEDDINGS_BUCKET, s3_key)
-            
+
             print("Model uploaded to S3 successfully")
-    
+
+        return results
+
     except Exception as e:
         print(f"Error during conversion: {str(e)}")
         raise
 
 if __name__ == "__main__":
-    convert_and_optimize_model()
+    parser = argparse.ArgumentParser(description="Convert, optimize and quantize the embedding model")
+    parser.add_argument('--pooled', action='store_true', help='fold mean pooling + L2 normalization into the graph')
+    parser.add_argument('--variant', choices=VARIANTS, default='int8', help='variant published as model.onnx')
+    parser.add_argument('--min-cosine', type=float, default=0.99, help='accuracy gate for the published variant')
+    parser.add_argument('--no-upload', action='store_true', help='skip the S3 upload')
+    args = parser.parse_args()
+
+    convert_and_optimize_model(
+        pooled=args.pooled,
+        publish_variant=args.variant,
+        min_cosine=args.min_cosine,
+        upload=not args.no_upload
+    )
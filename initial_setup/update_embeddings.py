@@ -0,0 +1,90 @@
+"""
+Publish incremental embedding updates without regenerating the full archive.
+
+Usage:
+    python -m initial_setup.update_embeddings add new_movies.npz [--no-attributes]
+    python -m initial_setup.update_embeddings delete 123 456
+    python -m initial_setup.update_embeddings compact
+    python -m initial_setup.update_embeddings attributes
+
+`add` expects a .npz holding one (N, 385) array in the same layout as
+embeddings.npz (384 embedding columns followed by the movie_id column).
+`attributes` rebuilds the filter columns (genres, release_year, adult,
+vote_count) from the Movies table. `add` republishes them too, so the new
+movies are not excluded by every filter; write their Movies rows first.
+"""
+import argparse
+
+from utils.config import Config
+import utils.database as db
+import utils.embedding_store as embedding_store
+import utils.movie_attributes as movie_attributes
+
+
+def add_movies(s3, npz_path):
+    """Publish the movies in npz_path as an upsert segment"""
+    with open(npz_path, 'rb') as f:
+        upserts = embedding_store.load_base_archive(f.read())
+    return embedding_store.publish_delta(s3, upserts=upserts)
+
+
+def delete_movies(s3, movie_ids):
+    """Publish a segment removing movie_ids"""
+    return embedding_store.publish_delta(s3, deletes=movie_ids)
+
+
+def publish_attributes(s3):
+    """Scan the Movies table and publish its filter columns"""
+    table = db.movies_table
+    scan_kwargs = {
+        'ProjectionExpression': 'movie_id, genres, release_year, adult, vote_count'
+    }
+    items = []
+    while True:
+        response = table.scan(**scan_kwargs)
+        items.extend(response.get('Items', []))
+        last_key = response.get('LastEvaluatedKey')
+        if not last_key:
+            break
+        scan_kwargs['ExclusiveStartKey'] = last_key
+    attributes = movie_attributes.MovieAttributes.from_items(items)
+    movie_attributes.publish_attributes(s3, attributes)
+    print(f"Published attributes of {len(attributes)} movies ({len(attributes.genre_names)} genres)")
+    return attributes
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Manage embedding delta segments")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    add_parser = subparsers.add_parser('add', help='Add or update movie vectors')
+    add_parser.add_argument('npz_path')
+    add_parser.add_argument('--no-attributes', action='store_true',
+                            help='do not republish the filter columns from the Movies table')
+
+    delete_parser = subparsers.add_parser('delete', help='Remove movie vectors')
+    delete_parser.add_argument('movie_ids', nargs='+')
+
+    subparsers.add_parser('compact', help='Merge all segments into the base archive')
+    subparsers.add_parser('attributes', help='Publish the filter columns from the Movies table')
+
+    args = parser.parse_args()
+
+    if not Config.EMBEDDINGS_BUCKET:
+        raise ValueError("EMBEDDINGS_BUCKET not configured")
+    s3 = db.get_client('s3')
+
+    if args.command == 'add':
+        add_movies(s3, args.npz_path)
+        if not args.no_attributes:
+            publish_attributes(s3)
+    elif args.command == 'delete':
+        delete_movies(s3, args.movie_ids)
+    elif args.command == 'compact':
+        embedding_store.compact(s3)
+    elif args.command == 'attributes':
+        publish_attributes(s3)
+
+
+if __name__ == "__main__":
+    main()
@@ -4,8 +4,23 @@ from decimal import Decimal
 from boto3.dynamodb.conditions import Key
 
 from utils.config import Config
-from utils.utils_function import get_authenticated_user, build_response, sanitize_input, log_user_activity, get_item_converted
+from utils.utils_function import get_authenticated_user, invalidate_user, build_response, sanitize_input, log_user_activity, get_path_parameter
 import utils.database as db
+import utils.activity_log as activity_log
+import utils.pagination as pagination
+import utils.tracing as tracing
+import utils.seen_movies as seen_movies
+from utils.account_purge import purge_user_data
+
+def get_movie_items(movie_ids):
+    """
+    Read the metadata items of several movies with BatchGetItem
+    Returns:
+        list: one item per movie ID, in order (None if missing)
+    """
+    items = db.batch_get_items(db.movies_table, [{'movie_id': str(mid)} for mid in movie_ids])
+    by_id = {item['movie_id']: item for item in items}
+    return [by_id.get(str(mid)) for mid in movie_ids]
 
 def handle_get_favorites(event):
     """
@@ -13,7 +28,7 @@ def handle_get_favorites(event):
     """
     try:
         # Verify JWT token
-        user = get_authenticated_user(event)
+        user = get_authenticated_user(event, read_only=True)
         if not user:
             return build_response(401, {'error': 'Authentication required'})
         
@@ -25,15 +40,10 @@ def handle_get_favorites(event):
         )
         
         favorite_items = response.get('Items', [])
-        results = []
-        for item in favorite_items:
-            mid = item.get('movie_id')
-            resp = db.movies_table.get_item(Key={'movie_id': str(mid)})
-            movie = resp.get('Item')
-            if movie:
-                results.append(movie)
+        with tracing.span('metadata'):
+            movies = get_movie_items([item.get('movie_id') for item in favorite_items])
+        results = [movie for movie in movies if movie]
 
-        results = get_item_converted(results)
         # Format response
         return build_response(200, {
             'movies': results
@@ -72,6 +82,7 @@ def handle_add_favorite(event):
         )
         
         # Log activity
+        seen_movies.invalidate(user_id)
         log_user_activity(user_id, 'add_favorite', {'movie_id': movie_id})
         
         return build_response(200, {'message': 'Movie added to favorites'})
@@ -80,7 +91,7 @@ def handle_add_favorite(event):
         print(f"Add favorite error: {str(e)}")
         return build_response(500, {'error': 'Error adding favorite '+ str(e)})
 
-def handle_remove_favorite(event):
+def handle_remove_favorite(event, path_params=None):
     """
     Handle remove favorite request
     """
@@ -91,9 +102,7 @@ def handle_remove_favorite(event):
             return build_response(401, {'error': 'Authentication required'})
         
         # Extract movie ID from path
-        path = event.get('rawPath', '')
-        path_parts = path.split('/')
-        movie_id = path_parts[-1]
+        movie_id = get_path_parameter(event, path_params, 'movie_id')
         
         if not movie_id:
             return build_response(400, {'error': 'Movie ID is required'})
@@ -109,6 +118,7 @@ def handle_remove_favorite(event):
         )
         
         # Log activity
+        seen_movies.invalidate(user_id)
         log_user_activity(user_id, 'remove_favorite', {'movie_id': movie_id})
         
         return build_response(200, {'message': 'Movie removed from favorites'})
@@ -117,18 +127,17 @@ def handle_remove_favorite(event):
         print(f"Remove favorite error: {str(e)}")
         return build_response(500, {'error': 'Error removing favorite'})
 
-def handle_toggle_favorite(event):
+def handle_toggle_favorite(event, path_params=None):
     """
     Handle toggle favorite request
     """
     try:
         # Verify JWT token
-        user = get_authenticated_user(event)
+        user = get_authenticated_user(event, read_only=True)
         if not user:
             return build_response(401, {'error': 'Authentication required'})
         
-        path = event.get('rawPath', '')
-        movie_id = path.split('/')[-1]
+        movie_id = get_path_parameter(event, path_params, 'movie_id')
         if not movie_id:
             return build_response(400, {'error': 'Movie ID is required'})
         
@@ -152,7 +161,87 @@ def handle_toggle_favorite(event):
         print(f"Toggle favorite error: {str(e)}")
         return build_response(500, {'error': 'Error toggling favorite'})
 
-def handle_remove_review(event):
+def handle_batch_status(event):
+    """
+    Handle batch favorite/reviewed status request
+    Returns both flags for every requested movie in one call, replacing one
+    toggle request per movie card
+    """
+    try:
+        # Verify JWT token
+        user = get_authenticated_user(event, read_only=True)
+        if not user:
+            return build_response(401, {'error': 'Authentication required'})
+        
+        # Parse request body
+        request_body = json.loads(event.get('body', '{}'))
+        movie_ids = request_body.get('movie_ids', [])
+        if not isinstance(movie_ids, list) or not movie_ids:
+            return build_response(400, {'error': 'Movie IDs are required'})
+        if len(movie_ids) > Config.STATUS_MAX_MOVIES:
+            return build_response(400, {'error': f'At most {Config.STATUS_MAX_MOVIES} movie IDs are allowed'})
+        
+        movie_ids = list(dict.fromkeys(str(mid) for mid in movie_ids))
+        user_id = user.get('user_id')
+        
+        if len(movie_ids) > Config.STATUS_QUERY_THRESHOLD:
+            # Large lists: one keys-only query per table is cheaper than many key lookups
+            favorite_ids = seen_movies.query_user_movie_ids(db.favorites_table, user_id)
+            reviewed_ids = seen_movies.query_user_movie_ids(db.reviews_table, user_id)
+        else:
+            favorite_ids, reviewed_ids = batch_get_user_movie_ids(user_id, movie_ids)
+        
+        statuses = {
+            mid: {
+                'isFavorite': mid in favorite_ids,
+                'isReviewed': mid in reviewed_ids
+            }
+            for mid in movie_ids
+        }
+        return build_response(200, {'statuses': statuses})
+    
+    except json.JSONDecodeError:
+        return build_response(400, {'error': 'Invalid JSON in request body'})
+    except Exception as e:
+        print(f"Batch status error: {str(e)}")
+        return build_response(500, {'error': 'Error getting movie statuses'})
+
+def batch_get_user_movie_ids(user_id, movie_ids):
+    """
+    Look up (user_id, movie_id) in the favorites and reviews tables with BatchGetItem
+    Args:
+        user_id: User ID
+        movie_ids: Movie IDs to check
+    Returns:
+        tuple: (set of favorite movie IDs, set of reviewed movie IDs)
+    """
+    favorites_name = db.favorites_table.name
+    reviews_name = db.reviews_table.name
+    found = {favorites_name: set(), reviews_name: set()}
+    
+    keys = [{'user_id': user_id, 'movie_id': mid} for mid in movie_ids]
+    per_table = db.BATCH_GET_LIMIT // 2  # both tables share the 100-key limit
+    for start in range(0, len(keys), per_table):
+        chunk = keys[start:start + per_table]
+        request_items = {
+            name: {'Keys': chunk, 'ProjectionExpression': 'movie_id'}
+            for name in (favorites_name, reviews_name)
+        }
+        attempt = 0
+        while request_items:
+            if attempt:
+                time.sleep(min(0.05 * (2 ** attempt), 1.0))
+            attempt += 1
+            response = db.dynamodb.batch_get_item(RequestItems=request_items)
+            for name, items in response.get('Responses', {}).items():
+                found[name].update(item['movie_id'] for item in items)
+            request_items = response.get('UnprocessedKeys') or {}
+            if request_items and attempt >= db.BATCH_GET_MAX_ATTEMPTS:
+                raise RuntimeError('BatchGetItem left unprocessed keys')
+    
+    return found[favorites_name], found[reviews_name]
+
+def handle_remove_review(event, path_params=None):
     """
     Handle remove review request
     """
@@ -163,9 +252,7 @@ def handle_remove_review(event):
             return build_response(401, {'error': 'Authentication required'})
         
         # Extract movie ID from path
-        path = event.get('rawPath', '')
-        path_parts = path.split('/')
-        movie_id = path_parts[-1]
+        movie_id = get_path_parameter(event, path_params, 'movie_id')
         
         if not movie_id:
             return build_response(400, {'error': 'Movie ID is required'})
@@ -181,6 +268,7 @@ def handle_remove_review(event):
         )
         
         # Log activity
+        seen_movies.invalidate(user_id)
         log_user_activity(user_id, 'remove_review', {'movie_id': movie_id})
 
         return build_response(200, {'message': 'Movie removed from reviews'})
@@ -189,22 +277,18 @@ def handle_remove_review(event):
         print(f"Remove reviewed movie error: {str(e)}")
         return build_response(500, {'error': 'Error removing reviewed movie'})
     
-def handle_toggle_reviewed(event):
+def handle_toggle_reviewed(event, path_params=None):
     """
     Check if a movie is in the user's reviewed list
     """
     try:
         # Verify JWT token
-        user = get_authenticated_user(event)
+        user = get_authenticated_user(event, read_only=True)
         if not user:
             return build_response(401, {'error': 'Authentication required'})
         
         # Extract movie_id from path
-        path = event.get('rawPath', '')
-        movie_id = path.split('/')[-1]
-        if not movie_id:
-            return build_response(400, {'error': 'Movie ID is required'})
-        
+        movie_id = get_path_parameter(event, path_params, 'movie_id')
         if not movie_id:
             return build_response(400, {'error': 'Movie ID is required'})
         
@@ -243,25 +327,24 @@ def handle_delete_account(event):
         
         # Delete all user data from all tables
         try:
+            # Write out buffered activity first so the purge sees it
+            activity_log.flush()
+            
+            # Delete favorites, reviews and activity in parallel
+            with tracing.span('purge'):
+                summary = purge_user_data(user_id)
+            if not summary['complete']:
+                # Keep the user record so the deletion can be retried
+                return build_response(500, {'error': 'Error deleting account data', 'summary': summary})
+            
             # Delete from users table
             db.users_table.delete_item(
                 Key={'email': email}
             )
+            invalidate_user(email)
+            seen_movies.invalidate(user_id)
             
-            # Delete all favorites
-            favorites = db.favorites_table.query(
-                KeyConditionExpression=Key('user_id').eq(user_id)
-            ).get('Items', [])
-            
-            for favorite in favorites:
-                db.favorites_table.delete_item(
-                    Key={
-                        'user_id': user_id,
-                        'movie_id': favorite.get('movie_id')
-                    }
-                )
-            
-            return build_response(200, {'message': 'Account successfully deleted'})
+            return build_response(200, {'message': 'Account successfully deleted', 'summary': summary})
             
         except Exception as e:
             print(f"Error deleting account data: {str(e)}")
@@ -274,52 +357,74 @@ def handle_delete_account(event):
 def handle_get_activity(event):
     """
     Handle get user activity request
+    Query string parameters:
+        limit: page size (default ACTIVITY_PAGE_SIZE, at most ACTIVITY_MAX_PAGE_SIZE)
+        since/until: inclusive timestamp bounds in milliseconds
+        next: cursor returned by the previous page
     """
     try:
         # Verify JWT token
-        user = get_authenticated_user(event)
+        user = get_authenticated_user(event, read_only=True)
         if not user:
             return build_response(401, {'error': 'Authentication required'})
         
         user_id = user.get('user_id')
+        params = event.get('queryStringParameters') or {}
         
-        # Query activity table for user's activities
-        response = db.activity_table.query(
-            KeyConditionExpression=Key('user_id').eq(user_id),
-            ScanIndexForward=False  # Sort by timestamp descending
-        )
+        try:
+            limit = int(params.get('limit', Config.ACTIVITY_PAGE_SIZE))
+            since = int(params['since']) if params.get('since') else None
+            until = int(params['until']) if params.get('until') else None
+        except ValueError:
+            return build_response(400, {'error': 'limit, since and until must be integers'})
+        limit = min(max(1, limit), Config.ACTIVITY_MAX_PAGE_SIZE)
+        if since is not None and until is not None and since > until:
+            return build_response(400, {'error': 'since must not be after until'})
+        
+        # Range condition on the timestamp sort key
+        key_condition = Key('user_id').eq(user_id)
+        if since is not None and until is not None:
+            key_condition = key_condition & Key('timestamp').between(since, until)
+        elif since is not None:
+            key_condition = key_condition & Key('timestamp').gte(since)
+        elif until is not None:
+            key_condition = key_condition & Key('timestamp').lte(until)
+        
+        query_kwargs = {
+            'KeyConditionExpression': key_condition,
+            'ScanIndexForward': False,  # Sort by timestamp descending
+            'Limit': limit
+        }
+        
+        if params.get('next'):
+            cursor = pagination.decode_key_cursor(params['next'])
+            start_timestamp = cursor.get('timestamp')
+            if not isinstance(start_timestamp, int) \
+                    or (since is not None and start_timestamp < since) \
+                    or (until is not None and start_timestamp > until):
+                raise pagination.InvalidCursorError("Cursor does not match this request")
+            # The hash key always comes from the token, never from the cursor
+            query_kwargs['ExclusiveStartKey'] = {'user_id': user_id, 'timestamp': start_timestamp}
+        
+        response = db.activity_table.query(**query_kwargs)
         
         activity_items = response.get('Items', [])
-        activity_items = get_item_converted(activity_items)
+        last_key = response.get('LastEvaluatedKey')
+        next_cursor = pagination.encode_key_cursor(last_key, ['timestamp']) if last_key else None
+        
         # Format response
         return build_response(200, {
-            'activities': activity_items
+            'activities': activity_items,
+            'next': next_cursor
         })
     
+    except pagination.InvalidCursorError as e:
+        print(f"Get activity invalid cursor: {str(e)}")
+        return build_response(400, {'error': 'Invalid cursor'})
     except Exception as e:
         print(f"Get activity error: {str(e)}")
         return build_response(500, {'error': 'Error getting activity history'})
 
-def log_user_activity(user_id, action, data=None):
-    """
-    Log user activity to activity table
-    """
-    timestamp = int(time.time() * 1000)  # Milliseconds for sorting
-    
-    item = {
-        'user_id': user_id,
-        'timestamp': timestamp,
-        'action': action
-    }
-    
-    if data:
-        item['data'] = data
-    
-    try:
-        db.activity_table.put_item(Item=item)
-    except Exception as e:
-        print(f"Error logging activity: {str(e)}")
-    
 def handle_add_review(event):
     """
     Handle add review request
@@ -351,6 +456,7 @@ def handle_add_review(event):
         )
         
         # Log activity
+        seen_movies.invalidate(user_id)
         log_user_activity(user_id, 'add_review', {'movie_id': movie_id, 'rating': rating})
 
         return build_response(200, {'message': 'Review added successfully'})
@@ -365,7 +471,7 @@ def handle_get_reviews(event):
     """
     try:
         # Verify JWT token
-        user = get_authenticated_user(event)
+        user = get_authenticated_user(event, read_only=True)
         if not user:
             return build_response(401, {'error': 'Authentication required'})
         
@@ -379,16 +485,13 @@ def handle_get_reviews(event):
         review_items = response.get('Items', [])
 
         results = []
-        for item in review_items:
-            mid = item.get('movie_id')
-            score = item.get('rating')
-            resp = db.movies_table.get_item(Key={'movie_id': str(mid)})
-            movie = resp.get('Item')
+        with tracing.span('metadata'):
+            movies = get_movie_items([item.get('movie_id') for item in review_items])
+        for item, movie in zip(review_items, movies):
             if movie:
-                movie['rating'] = score
+                movie['rating'] = item.get('rating')
                 results.append(movie)
                 
-        results = get_item_converted(results)
         # Format response
         return build_response(200, {
             'movies': results
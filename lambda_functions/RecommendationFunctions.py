@@ -1,24 +1,46 @@
 import json
-from boto3.dynamodb.conditions import Key, Attr
+import re
+from boto3.dynamodb.conditions import Key
 import numpy as np
-import boto3
 import os
 import tempfile
-import onnxruntime
+import threading
+import time
 from tokenizers import Tokenizer
-import io
 
 from utils.config import Config
-from utils.utils_function import get_authenticated_user, build_response, get_item_converted
+from utils.utils_function import get_authenticated_user, build_response, get_accept_encoding
 import utils.database as db
+import utils.onnx_session as onnx_session
+import utils.pagination as pagination
+import utils.tracing as tracing
+import utils.fanout as fanout
+import utils.movie_attributes as movie_attributes
+import utils.seen_movies as seen_movies
+from utils.embedding_snapshot import SnapshotHolder
+from utils.micro_batching import MicroBatcher
+from utils.single_flight import SingleFlight
 
 # Global variables for caching
 _model = None
 _tokenizer = None
 _model_config = None
 _onnx_session = None
-_s3_client = None
-_dynamodb = None
+_snapshot_holder = None
+_encoder = None
+_semantic_batcher = None
+_attributes = None  # (ETag, MovieAttributes) as published
+_row_attributes = None  # (snapshot version, ETag, MovieAttributes aligned to the snapshot rows)
+_attributes_checked_at = 0
+_attributes_lock = threading.Lock()
+
+# Concurrent identical lookups share one computation / DynamoDB read
+_similar_flight = SingleFlight('similar')
+_semantic_flight = SingleFlight('semantic')
+_metadata_flight = SingleFlight('movie_metadata')
+
+# Movies attribute names accepted in a 'fields' projection
+FIELD_NAME_PATTERN = re.compile(r'^[A-Za-z_][A-Za-z0-9_]{0,63}$')
 
 def handle_semantic_search(event):
     """
@@ -28,27 +50,48 @@ def handle_semantic_search(event):
         # Parse request body
         request_body = json.loads(event.get('body', '{}'))
         query = request_body.get('query')
-        top_k = int(request_body.get('top_k', 10))
+        top_k = max(1, int(request_body.get('top_k', 10)))
+        fields = parse_fields(request_body, event)
+        filters = movie_attributes.parse_filters(request_body.get('filters'))
         
         if not query:
             return build_response(400, {'error': 'Query is required'})
+
+        # Optional: leave out the movies the logged-in user already rated or favorited
+        exclude_user = None
+        if request_body.get('exclude_seen'):
+            user = get_authenticated_user(event, read_only=True)
+            if not user:
+                return build_response(401, {'error': 'Authentication required to exclude seen movies'})
+            exclude_user = user.get('user_id')
         
         # Perform semantic search
-        result = recommend_semantic(query, top_k)
+        snapshot = get_embeddings_snapshot()
+        with tracing.span('ranking'):
+            result, next_cursor = pagination.get_page(
+                'search', ranking_params({'query': query}, filters, exclude_user), snapshot.version, top_k,
+                request_body.get('cursor'),
+                lambda depth: recommend_semantic(query, depth, snapshot=snapshot, filters=filters, exclude_user=exclude_user)
+            )
         
         # Load metadata for each result
-        movies = []
-        for movie_id, score in result:
-            movie = get_movie_metadata(movie_id)
-            if movie:
-                movie['score'] = score
-                movies.append(movie)
+        with tracing.span('metadata'):
+            movies = load_movie_results(result, fields)
 
-        movies = get_item_converted(movies)
-        return build_response(200, movies)
+        return build_response(200, movies, headers=result_headers(snapshot, next_cursor), accept_encoding=get_accept_encoding(event))
 
     except json.JSONDecodeError:
         return build_response(400, {'error': 'Invalid JSON in request body'})
+    except pagination.InvalidCursorError as e:
+        print(f"Invalid cursor: {str(e)}")
+        return build_response(400, {'error': 'Invalid cursor'})
+    except movie_attributes.InvalidFilterError as e:
+        return build_response(400, {'error': str(e)})
+    except movie_attributes.AttributesUnavailableError as e:
+        print(f"Filters unavailable: {str(e)}")
+        return build_response(503, {'error': 'Filters are not available'})
+    except pagination.CursorExpiredError as e:
+        return build_response(410, {'error': str(e)})
     except Exception as e:
         print(f"Semantic search error: {str(e)}")
         return build_response(500, {'error': 'Error performing semantic search'})
@@ -62,27 +105,39 @@ def handle_content_based_search(event):
         # Parse request body
         request_body = json.loads(event.get('body', '{}'))
         movie_ids = request_body.get('movie_ids', [])
-        top_k = int(request_body.get('top_k', 10))
+        top_k = max(1, int(request_body.get('top_k', 10)))
+        fields = parse_fields(request_body, event)
+        filters = movie_attributes.parse_filters(request_body.get('filters'))
         
         if not movie_ids:
             return build_response(400, {'error': 'Movie IDs are required'})
         
         # Perform content-based search
-        result = recommend_content(movie_ids, top_k)
+        snapshot = get_embeddings_snapshot()
+        with tracing.span('ranking'):
+            result, next_cursor = pagination.get_page(
+                'content', ranking_params({'movie_ids': movie_ids}, filters), snapshot.version, top_k, request_body.get('cursor'),
+                lambda depth: recommend_content(movie_ids, depth, snapshot=snapshot, filters=filters)
+            )
         
         # Load metadata for each result
-        movies = []
-        for movie_id, score in result:
-            movie = get_movie_metadata(movie_id)
-            if movie:
-                movie['score'] = score
-                movies.append(movie)
+        with tracing.span('metadata'):
+            movies = load_movie_results(result, fields)
 
-        movies = get_item_converted(movies)
-        return build_response(200, movies)
+        return build_response(200, movies, headers=result_headers(snapshot, next_cursor), accept_encoding=get_accept_encoding(event))
 
     except json.JSONDecodeError:
         return build_response(400, {'error': 'Invalid JSON in request body'})
+    except pagination.InvalidCursorError as e:
+        print(f"Invalid cursor: {str(e)}")
+        return build_response(400, {'error': 'Invalid cursor'})
+    except movie_attributes.InvalidFilterError as e:
+        return build_response(400, {'error': str(e)})
+    except movie_attributes.AttributesUnavailableError as e:
+        print(f"Filters unavailable: {str(e)}")
+        return build_response(503, {'error': 'Filters are not available'})
+    except pagination.CursorExpiredError as e:
+        return build_response(410, {'error': str(e)})
     except Exception as e:
         print(f"Content-based search error: {str(e)}")
         return build_response(500, {'error': 'Error performing content-based search'})
@@ -94,32 +149,37 @@ def handle_collaborative_search(event):
     """
     try:
         # Verify JWT token
-        user = get_authenticated_user(event)
+        user = get_authenticated_user(event, read_only=True)
         if not user:
             return build_response(401, {'error': 'Authentication required'})
         
         # Parse request body
         request_body = json.loads(event.get('body', '{}'))
-        top_k = int(request_body.get('top_k', 10))
+        top_k = max(1, int(request_body.get('top_k', 10)))
+        fields = parse_fields(request_body, event)
         
         user_id = user.get('user_id')
         
         # Perform collaborative filtering
-        result = recommend_collaborative(user_id, top_k)
+        with tracing.span('ranking'):
+            result, next_cursor = pagination.get_page(
+                'collaborative', {'user_id': user_id}, 'collaborative', top_k, request_body.get('cursor'),
+                lambda depth: recommend_collaborative(user_id, depth)
+            )
         
         # Load metadata for each result
-        movies = []
-        for movie_id, score in result:
-            movie = get_movie_metadata(movie_id)
-            if movie:
-                movie['score'] = score
-                movies.append(movie)
+        with tracing.span('metadata'):
+            movies = load_movie_results(result, fields)
 
-        movies = get_item_converted(movies)
-        return build_response(200, movies)
+        return build_response(200, movies, headers=result_headers(None, next_cursor), accept_encoding=get_accept_encoding(event))
 
     except json.JSONDecodeError:
         return build_response(400, {'error': 'Invalid JSON in request body'})
+    except pagination.InvalidCursorError as e:
+        print(f"Invalid cursor: {str(e)}")
+        return build_response(400, {'error': 'Invalid cursor'})
+    except pagination.CursorExpiredError as e:
+        return build_response(410, {'error': str(e)})
     except Exception as e:
         print(f"Collaborative search error: {str(e)}")
         return build_response(500, {'error': 'Error performing collaborative search'})
@@ -133,102 +193,256 @@ def handle_similar_search(event):
         # Parse request body
         request_body = json.loads(event.get('body', '{}'))
         movie_id = request_body.get('movie_id')
-        top_k = int(request_body.get('top_k', 10))
+        top_k = max(1, int(request_body.get('top_k', 10)))
+        fields = parse_fields(request_body, event)
+        filters = movie_attributes.parse_filters(request_body.get('filters'))
         
         if not movie_id:
             return build_response(400, {'error': 'Movie ID is required'})
+
+        # Optional: leave out the movies the logged-in user already rated or favorited
+        exclude_user = None
+        if request_body.get('exclude_seen'):
+            user = get_authenticated_user(event, read_only=True)
+            if not user:
+                return build_response(401, {'error': 'Authentication required to exclude seen movies'})
+            exclude_user = user.get('user_id')
         
         # Perform similar movie search
-        result = recommend_similar(movie_id, top_k)
+        snapshot = get_embeddings_snapshot()
+        with tracing.span('ranking'):
+            result, next_cursor = pagination.get_page(
+                'similar', ranking_params({'movie_id': movie_id}, filters, exclude_user), snapshot.version, top_k,
+                request_body.get('cursor'),
+                lambda depth: recommend_similar(movie_id, depth, snapshot=snapshot, filters=filters, exclude_user=exclude_user)
+            )
         
         # Load metadata for each result
-        movies = []
-        for similar_movie_id, score in result:
-            movie = get_movie_metadata(similar_movie_id)
-            if movie:
-                movie['score'] = score
-                movies.append(movie)
-        movies = get_item_converted(movies)
-        return build_response(200, movies)
+        with tracing.span('metadata'):
+            movies = load_movie_results(result, fields)
+        return build_response(200, movies, headers=result_headers(snapshot, next_cursor), accept_encoding=get_accept_encoding(event))
         
     except json.JSONDecodeError:
         return build_response(400, {'error': 'Invalid JSON in request body'})
+    except pagination.InvalidCursorError as e:
+        print(f"Invalid cursor: {str(e)}")
+        return build_response(400, {'error': 'Invalid cursor'})
+    except movie_attributes.InvalidFilterError as e:
+        return build_response(400, {'error': str(e)})
+    except movie_attributes.AttributesUnavailableError as e:
+        print(f"Filters unavailable: {str(e)}")
+        return build_response(503, {'error': 'Filters are not available'})
+    except pagination.CursorExpiredError as e:
+        return build_response(410, {'error': str(e)})
     except Exception as e:
         print(f"Similar search error: {str(e)}")
         return build_response(500, {'error': 'Error performing similar movie search'})
 
 
-def get_movie_metadata(movie_id):
+def ranking_params(params, filters, exclude_user=None):
     """
-    Fetch movie metadata from DynamoDB
+    Ranking parameters for the cursor hash: filtered and per-user rankings
+    get their own cursors
     """
+    if filters:
+        params = {**params, 'filters': filters}
+    if exclude_user:
+        params = {**params, 'exclude_user': exclude_user}
+    return params
+
+
+def parse_fields(request_body, event=None):
+    """
+    Parse the optional 'fields' projection of a recommendation request
+    Accepts a list or a comma-separated string of Movies attribute names, in
+    the request body or the 'fields' query string parameter
+    Returns:
+        list: attribute names to return (always including movie_id), or None for all
+    """
+    fields = request_body.get('fields')
+    if not fields and event:
+        fields = (event.get('queryStringParameters') or {}).get('fields')
+    if not fields:
+        return None
+    if isinstance(fields, str):
+        fields = fields.split(',')
+    fields = [f.strip() for f in fields if isinstance(f, str) and FIELD_NAME_PATTERN.match(f.strip())]
+    fields = [f for f in fields if f != 'score']
+    if not fields:
+        return None
+    return ['movie_id'] + [f for f in dict.fromkeys(fields) if f != 'movie_id']
+
+
+def projection_kwargs(fields):
+    """
+    Build get_item / BatchGetItem keyword arguments projecting only the requested attributes
+    Attribute names go through ExpressionAttributeNames so reserved words work
+    """
+    if not fields:
+        return {}
+    names = {f'#f{i}': field for i, field in enumerate(fields)}
+    return {
+        'ProjectionExpression': ', '.join(names),
+        'ExpressionAttributeNames': names
+    }
+
+
+def load_movie_results(result, fields=None):
+    """
+    Load metadata for (movie_id, score) results, attaching the score
+    Args:
+        result: list of (movie_id, score) tuples
+        fields: optional attribute projection from parse_fields
+    Returns:
+        list: movie items in result order
+    """
+    items = get_movie_metadata([mid for mid, _ in result], fields)
+    movies = []
+    for (_, score), movie in zip(result, items):
+        if movie:
+            movie['score'] = score
+            movies.append(movie)
+    return movies
+
+
+def get_movie_metadata(movie_ids, fields=None):
+    """
+    Fetch the metadata of several movies from DynamoDB with BatchGetItem
+    Concurrent requests for the same movies and projection share one read; each
+    caller gets its own copy of the items (load_movie_results adds the score).
+    Returns:
+        list: one item per movie ID, in order (None if missing or on error)
+    """
+    movie_ids = [str(movie_id) for movie_id in movie_ids]
+    key = (tuple(movie_ids), tuple(fields) if fields else None)
     try:
-        resp = db.movies_table.get_item(Key={'movie_id': str(movie_id)})
-        movie = resp.get('Item')
-        movie = get_item_converted(movie)
-        return movie
+        by_id = _metadata_flight.do(key, lambda: _fetch_movie_metadata(movie_ids, fields))
     except Exception as e:
-        print(f"Error fetching movie metadata for {movie_id}: {str(e)}")
-        return None
+        print(f"Error fetching movie metadata for {len(movie_ids)} movies: {str(e)}")
+        return [None] * len(movie_ids)
+    return [dict(by_id[movie_id]) if movie_id in by_id else None for movie_id in movie_ids]
+
+
+def _fetch_movie_metadata(movie_ids, fields):
+    items = db.batch_get_items(db.movies_table, [{'movie_id': movie_id} for movie_id in movie_ids],
+                               **projection_kwargs(fields))
+    return {item['movie_id']: item for item in items}
     
     
 # Recommendation functions
 
-def recommend_semantic(query, top_k):
+def recommend_semantic(query, top_k, snapshot=None, filters=None, exclude_user=None):
     """
     Recommend movies based on semantic similarity to query using ONNX model
+    Identical concurrent queries (same text, top_k, filters, user and snapshot) are coalesced.
     """
     try:
-        # Get ONNX model components
-        onnx_session, tokenizer, model_config = get_model()
-        
-        # Encode the query using the ONNX model
-        encoded = tokenizer.encode(query)
-        
-        # Prepare inputs for ONNX model
-        input_ids = np.array([encoded.ids], dtype=np.int64)
-        attention_mask = np.array([encoded.attention_mask], dtype=np.int64)
-        token_type_ids = np.array([encoded.type_ids], dtype=np.int64)
-        
-        onnx_inputs = {
-            "input_ids": input_ids,
-            "attention_mask": attention_mask
-        }
-        
-        # Run inference
-        onnx_outputs = onnx_session.run(None, onnx_inputs)
-        
-        # Extract embeddings (typically from last hidden state)
-        # For sentence transformers, we usually take the mean of token embeddings
-        last_hidden_state = onnx_outputs[0]  # Shape: (batch_size, seq_len, hidden_size)
-        
-        # Apply attention mask and compute mean pooling
-        attention_mask_expanded = np.expand_dims(attention_mask, -1)
-        masked_embeddings = last_hidden_state * attention_mask_expanded
-        sum_embeddings = np.sum(masked_embeddings, axis=1)
-        sum_mask = np.sum(attention_mask, axis=1, keepdims=True)
-        query_embedding = (sum_embeddings / np.maximum(sum_mask, 1e-9))[0]  # Take first batch item
-        
-        # Normalize the embedding
-        query_embedding = query_embedding / np.linalg.norm(query_embedding)
-        query_emb = query_embedding.tolist()
-        
-        # Compare with precomputed embeddings
-        embed_map = load_embeddings()
-        sims = [(mid, cosine_similarity(query_emb, emb)) for mid, emb in embed_map.items()]
-        sims.sort(key=lambda x: x[1], reverse=True)
-        return sims[:top_k]
+        snapshot = snapshot if snapshot is not None else get_embeddings_snapshot()
+        return _semantic_flight.do(
+            (query, top_k, snapshot.version, filter_key(filters), exclude_user),
+            lambda: _rank_semantic(query, top_k, snapshot, request_mask(snapshot, filters, exclude_user)))
     except Exception as e:
         print(f"Error in semantic recommendation: {str(e)}")
         raise
 
 
-def recommend_content(movie_ids, top_k):
+def _rank_semantic(query, top_k, snapshot, mask):
+    if _semantic_batcher is not None:
+        # Long-running servers: share one encode + matrix product with concurrent queries
+        with tracing.span('batched_search'):
+            return _semantic_batcher.submit((query, top_k, snapshot, mask))
+
+    # Encode the query using the ONNX model (IO binding over preallocated buffers)
+    with tracing.span('encode'):
+        query_emb = get_encoder().encode(query)
+
+    # Compare with precomputed embeddings
+    with tracing.span('scoring'):
+        ids, scores = cosine_scores(snapshot, query_emb)
+        return top_k_scores(ids, scores, top_k, mask)
+
+
+def rank_semantic_batch(requests):
+    """
+    Rank several semantic queries with one ONNX call and one matrix product
+    Args:
+        requests: list of (query, top_k, snapshot, row mask or None) tuples
+    Returns:
+        list: one list of (movie_id, score) per request, best first
+    """
+    query_embs = get_encoder().encode_batch([request[0] for request in requests])
+    results = [None] * len(requests)
+
+    # Requests of one batch normally share a snapshot; group in case a swap happened mid-batch
+    groups = {}
+    for i, request in enumerate(requests):
+        groups.setdefault(id(request[2]), (request[2], []))[1].append(i)
+
+    for snapshot, indexes in groups.values():
+        ids, matrix, inverse_norms = snapshot.matrix_view()
+        scores = (matrix @ query_embs[indexes].T) * inverse_norms[:, None]  # (N, batch) cosine
+        for column, i in enumerate(indexes):
+            _, top_k, _, mask = requests[i]
+            results[i] = top_k_scores(ids, scores[:, column], top_k, mask)
+    return results
+
+
+def cosine_scores(snapshot, vector):
+    """
+    Cosine similarity of a vector with every row of the snapshot
+    Returns:
+        tuple: (ids list, (N,) scores), 0 for zero vectors
+    """
+    ids, matrix, inverse_norms = snapshot.matrix_view()
+    vector = np.asarray(vector, dtype=np.float32)
+    norm = float(np.linalg.norm(vector))
+    if norm == 0:
+        return ids, np.zeros(len(ids), dtype=np.float32)
+    return ids, (matrix @ vector) * inverse_norms / norm
+
+
+def top_k_scores(ids, scores, top_k, mask=None):
+    """
+    Best top_k (movie_id, score) pairs of a score vector, best first
+    Rows where mask is False are never selected.
+    """
+    rows = None
+    if mask is not None:
+        rows = np.flatnonzero(mask)
+        scores = scores[rows]
+    if top_k <= 0 or len(scores) == 0:
+        return []
+    if top_k < len(scores):
+        candidates = np.argpartition(-scores, top_k - 1)[:top_k]
+    else:
+        candidates = np.arange(len(scores))
+    order = candidates[np.argsort(-scores[candidates], kind='stable')]
+    if rows is None:
+        return [(ids[i], float(scores[i])) for i in order]
+    return [(ids[rows[i]], float(scores[i])) for i in order]
+
+
+def enable_semantic_batching(max_batch_size=None, max_wait_ms=None):
+    """
+    Route recommend_semantic through a micro-batcher (long-running servers only)
+    Args:
+        max_batch_size: most queries per ONNX call (default BATCH_MAX_SIZE)
+        max_wait_ms: longest a query waits for others (default BATCH_MAX_WAIT_MS)
+    Returns:
+        MicroBatcher: the installed batcher
+    """
+    global _semantic_batcher
+    _semantic_batcher = MicroBatcher(rank_semantic_batch, max_batch_size, max_wait_ms, name='semantic-batcher')
+    return _semantic_batcher
+
+
+def recommend_content(movie_ids, top_k, snapshot=None, filters=None):
     """
     Recommend movies based on content similarity to user's rated movies
     """
     try:
-        embed_map = load_embeddings()
+        snapshot = snapshot if snapshot is not None else get_embeddings_snapshot()
+        embed_map = snapshot.embeddings
 
         filtered = [(mid, rating) for mid, rating in movie_ids if mid in embed_map]
         if not filtered:
@@ -240,39 +454,132 @@ def recommend_content(movie_ids, top_k):
         weighted_vectors = np.array(vectors) * np.array(weights)[:, None]  # shape: (n, d)
         avg_emb = np.sum(weighted_vectors, axis=0) / np.sum(weights) #shape: (d,)
 
-        seen_ids = set(mid for mid, _ in movie_ids)
-        sims = [(mid, cosine_similarity(avg_emb, emb)) for mid, emb in embed_map.items() if mid not in seen_ids]
-        sims.sort(key=lambda x: x[1], reverse=True)
-        return sims[:top_k]
+        seen_rows = [snapshot.index_of(mid) for mid, _ in filtered]
+        with tracing.span('scoring'):
+            mask = combine_masks(filter_mask(snapshot, filters), exclude_rows(snapshot, seen_rows))
+            ids, scores = cosine_scores(snapshot, avg_emb)
+            return top_k_scores(ids, scores, top_k, mask)
     except Exception as e:
         print(f"Error in content-based recommendation: {str(e)}")
         raise
     
 
-def recommend_similar(movie_id, top_k):
+def recommend_similar(movie_id, top_k, snapshot=None, filters=None, exclude_user=None):
     """
     Recommend movies similar to a given movie
+    Identical concurrent requests (same movie, top_k, filters, user and snapshot) are coalesced.
     """
     try:
-        embed_map = load_embeddings()
-        if movie_id not in embed_map:
-            return []
-        vector = embed_map[movie_id]
-        sims = [(mid, cosine_similarity(vector, emb)) for mid, emb in embed_map.items() if mid != movie_id]
-        sims.sort(key=lambda x: x[1], reverse=True)
-        return sims[:top_k]
+        snapshot = snapshot if snapshot is not None else get_embeddings_snapshot()
+        return _similar_flight.do(
+            (movie_id, top_k, snapshot.version, filter_key(filters), exclude_user),
+            lambda: _rank_similar(movie_id, top_k, snapshot, request_mask(snapshot, filters, exclude_user)))
     except Exception as e:
         print(f"Error in similar movie recommendation: {str(e)}")
         raise
 
 
+def _rank_similar(movie_id, top_k, snapshot, mask):
+    row = snapshot.index_of(movie_id)
+    if row is None:
+        return []
+    _, matrix, _ = snapshot.matrix_view()
+    with tracing.span('scoring'):
+        ids, scores = cosine_scores(snapshot, matrix[row])
+        return top_k_scores(ids, scores, top_k, combine_masks(mask, exclude_rows(snapshot, [row])))
+
+
+# Row masks: True = the movie may be returned
+
+def filter_key(filters):
+    """Stable identity of normalized filters, for coalescing and cursors"""
+    return json.dumps(filters, sort_keys=True) if filters else None
+
+
+def filter_mask(snapshot, filters):
+    """
+    Row mask of the snapshot's movies matching the request filters
+    Returns:
+        numpy bool array, or None when there are no filters
+    """
+    if not filters:
+        return None
+    with tracing.span('filter'):
+        return get_row_attributes(snapshot).mask(filters)
+
+
+def request_mask(snapshot, filters=None, exclude_user=None):
+    """
+    Row mask of a request: its filters and, for exclude_user, the movies that
+    user already rated or favorited
+    Returns:
+        numpy bool array, or None when nothing is excluded
+    """
+    user_mask = None
+    if exclude_user:
+        with tracing.span('seen_movies'):
+            user_mask = seen_movies.seen_mask(exclude_user, snapshot)
+    return combine_masks(filter_mask(snapshot, filters), user_mask)
+
+
+def exclude_rows(snapshot, rows):
+    """Row mask excluding the given rows (None entries are ignored)"""
+    rows = [row for row in rows if row is not None]
+    if not rows:
+        return None
+    mask = np.ones(len(snapshot), dtype=bool)
+    mask[rows] = False
+    return mask
+
+
+def combine_masks(*masks):
+    """AND of the given row masks, skipping None; None when all are None"""
+    masks = [mask for mask in masks if mask is not None]
+    if not masks:
+        return None
+    combined = masks[0]
+    for mask in masks[1:]:
+        combined = combined & mask
+    return combined
+
+
+def get_row_attributes(snapshot):
+    """
+    Movie attributes aligned to the snapshot's matrix rows
+    The published archive is reloaded when its ETag changes (checked at most
+    every EMBEDDINGS_REFRESH_SECONDS) and realigned once per snapshot version.
+    Raises:
+        movie_attributes.AttributesUnavailableError: no archive is published
+    """
+    global _attributes, _row_attributes, _attributes_checked_at
+    now = time.time()
+    interval = Config.EMBEDDINGS_REFRESH_SECONDS
+    fresh = _attributes is not None and (interval <= 0 or now - _attributes_checked_at < interval)
+    cached = _row_attributes
+    if fresh and cached is not None and cached[0] == snapshot.version and cached[1] == _attributes[0]:
+        return cached[2]
+
+    with _attributes_lock:
+        if _attributes is None or not (interval <= 0 or now - _attributes_checked_at < interval):
+            s3 = get_s3_client()
+            etag = movie_attributes.get_version(s3) if _attributes is not None else None
+            if _attributes is None or etag != _attributes[0]:
+                attributes, etag = movie_attributes.load_attributes(s3)
+                _attributes = (etag, attributes)
+            _attributes_checked_at = now
+        cached = _row_attributes
+        if cached is None or cached[0] != snapshot.version or cached[1] != _attributes[0]:
+            ids, _, _ = snapshot.matrix_view()
+            cached = _row_attributes = (snapshot.version, _attributes[0], _attributes[1].aligned_to(ids))
+        return cached[2]
+
+
 def recommend_collaborative(user_id, top_k):
     """
     Recommend movies using collaborative filtering
     """
     try:
-        dynamodb = get_dynamodb()
-        reviews_tbl = dynamodb.Table(Config.REVIEWS_TABLE)
+        reviews_tbl = db.reviews_table
         resp = reviews_tbl.query(KeyConditionExpression=Key('user_id').eq(str(user_id)))
         user_ratings = {item['movie_id']: float(item['rating']) for item in resp.get('Items', [])}
         
@@ -280,8 +587,11 @@ def recommend_collaborative(user_id, top_k):
             return []
 
         other_users = {}
-        for mid in user_ratings:
-            resp_movies = reviews_tbl.scan(FilterExpression=Attr('movie_id').eq(str(mid)))
+        # One MovieIndex query per rated movie and one query per neighbour, all independent: fan them out
+        rated_pages = fanout.map_calls(
+            lambda mid: reviews_tbl.query(IndexName='MovieIndex', KeyConditionExpression=Key('movie_id').eq(str(mid))),
+            list(user_ratings))
+        for mid, resp_movies in zip(user_ratings, rated_pages):
             for itm in resp_movies.get('Items', []):
                 other = itm['user_id']
                 rating = float(itm['rating'])
@@ -308,9 +618,10 @@ def recommend_collaborative(user_id, top_k):
         top_users = [u for u, _ in sims_users[:10]]
         scores = {}
         weights = {}
-        for other in top_users:
+        neighbour_pages = fanout.map_calls(
+            lambda other: reviews_tbl.query(KeyConditionExpression=Key('user_id').eq(other)), top_users)
+        for other, resp_user in zip(top_users, neighbour_pages):
             sim_score = dict(sims_users)[other]
-            resp_user = reviews_tbl.query(KeyConditionExpression=Key('user_id').eq(other))
             for itm in resp_user.get('Items', []):
                 mid = itm['movie_id']
                 if mid in user_ratings: 
@@ -324,8 +635,6 @@ def recommend_collaborative(user_id, top_k):
         if not results:
             return []
         results.sort(key=lambda x: x[1], reverse=True)
-        results = get_item_converted(results)
-        print(type(results))
         return results[:top_k]
     except Exception as e:
         print(f"Error in collaborative filtering recommendation: {str(e)}")
@@ -334,76 +643,52 @@ def recommend_collaborative(user_id, top_k):
 # Utility functions
 
 
-def parse_embeddings_array(arr):
+def get_snapshot_holder():
     """
-    arr: numpy array shape (N, 385), 
-    con le prime 384 colonne float embedding e l'ultima colonna string movie_id
+    Get the process-wide embeddings snapshot holder
     """
-    embeddings_dict = {}
-    
-    # Seleziona tutte le righe
-    for i in range(arr.shape[0]):
-        # Estrai embedding come float array
-        embedding = arr[i, :-1].astype(np.float32)
-        # Estrai movie_id come stringa
-        movie_id = arr[i, -1]
-        # Se movie_id è bytes, decodifica
-        if isinstance(movie_id, bytes):
-            movie_id = movie_id.decode('utf-8')
-        embeddings_dict[movie_id] = embedding
-    
-    return embeddings_dict
+    global _snapshot_holder
+    if _snapshot_holder is None:
+        _snapshot_holder = SnapshotHolder(get_s3_client)
+    return _snapshot_holder
+
+
+def get_embeddings_snapshot():
+    """
+    Get the active embeddings snapshot, loading it on first use
+    The background refresh thread swaps in new versions as they are published
+    """
+    try:
+        if not Config.EMBEDDINGS_BUCKET:
+            raise ValueError("EMBEDDINGS_BUCKET not configured")
+        return get_snapshot_holder().get()
+    except Exception as e:
+        print(f"Error loading embeddings: {str(e)}")
+        import traceback
+        print(f"Traceback: {traceback.format_exc()}")
+        raise
+
 
 def load_embeddings():
     """
     Load embeddings from S3 bucket
-    Support .npz (compressed numpy archive), .npy (binary numpy array) and .jsonl (text) formats
+    Uses the base snapshot + delta segments layout from utils.embedding_store
+    (.npz archives, with the base cached locally between loads)
     """
-    if Config._embeddings is None:
-        try:
-            print("Loading embeddings.")
-            if not Config.EMBEDDINGS_BUCKET:
-                raise ValueError("EMBEDDINGS_BUCKET not configured")
-            s3 = get_s3_client()
+    return get_embeddings_snapshot().embeddings
 
-            print(f"Loading embeddings from s3://{Config.EMBEDDINGS_BUCKET}/{Config.EMBEDDINGS_OUTPUT_FILE}")
-            obj = s3.get_object(Bucket=Config.EMBEDDINGS_BUCKET, Key=Config.EMBEDDINGS_OUTPUT_FILE)
-
-            file_content = obj["Body"].read()
-            print(f"File size: {len(file_content)} bytes")
-            file_like = io.BytesIO(file_content)
-
-            if Config.EMBEDDINGS_OUTPUT_FILE.endswith('.npz'):
-                print("Detected .npz format, loading as compressed numpy archive")
-                npzfile = np.load(file_like, allow_pickle=True)
-
-                # Se il file .npz contiene più array, prendi il primo (o modifica se sai il nome)
-                # Qui assumiamo un solo array o prendiamo il primo disponibile
-                array_names = npzfile.files
-                if not array_names:
-                    raise ValueError("No arrays found in .npz file")
-                arr = npzfile[array_names[0]]
-                print(f"Loaded array '{array_names[0]}' with shape {arr.shape} and dtype {arr.dtype}")
-
-                # Caso specifico: array 2D con embeddings + movie_id
-                if arr.ndim == 2 and arr.shape[1] == 385:
-                    temp = {}
-                    for i in range(arr.shape[0]):
-                        embedding = arr[i, :-1].astype(np.float32)
-                        movie_id = arr[i, -1]
-                        if isinstance(movie_id, bytes):
-                            movie_id = movie_id.decode('utf-8')
-                        temp[movie_id] = embedding
-                    Config._embeddings = temp
-                else:
-                    raise ValueError(f"Unexpected array shape or format in .npz: {arr.shape}")
-            print("Finish loading embeddings")
-        except Exception as e:
-            print(f"Error loading embeddings: {str(e)}")
-            import traceback
-            print(f"Traceback: {traceback.format_exc()}")
-            raise
-    return Config._embeddings
+
+def result_headers(snapshot, next_cursor=None):
+    """
+    Response headers for a page of results: the embeddings version it was
+    computed with and the cursor of the next page, when there is one
+    """
+    headers = {}
+    if snapshot is not None:
+        headers['X-Embeddings-Version'] = str(snapshot.version)
+    if next_cursor:
+        headers['X-Next-Cursor'] = next_cursor
+    return headers
 
 
 def get_model():
@@ -451,14 +736,19 @@ def get_model():
                     pad_type_id=0
                 )
                 
+                # Reuse the optimized graph cached by a previous start of this sandbox
+                optimized_model_path = None
+                if Config.ONNX_CACHE_DIR:
+                    head = s3.head_object(Bucket=Config.MODEL_BUCKET, Key=Config.MODEL_ONNX_FILE)
+                    etag = head.get('ETag', '').strip('"')
+                    optimized_model_path = os.path.join(Config.ONNX_CACHE_DIR, f"model.{etag}.opt.onnx")
+                
                 # Download and load ONNX model
                 model_path = os.path.join(temp_dir, "model.onnx")
-                s3.download_file(Config.MODEL_BUCKET, Config.MODEL_ONNX_FILE, model_path)
+                if not (optimized_model_path and os.path.exists(optimized_model_path)):
+                    s3.download_file(Config.MODEL_BUCKET, Config.MODEL_ONNX_FILE, model_path)
                 
-                _onnx_session = onnxruntime.InferenceSession(
-                    model_path, 
-                    providers=['CPUExecutionProvider']
-                )
+                _onnx_session = onnx_session.create_session(model_path, optimized_model_path)
                 
                 print("ONNX model, tokenizer, and config loaded successfully from S3")
                 
@@ -477,18 +767,24 @@ def get_model():
     return _onnx_session, _tokenizer, _model_config
 
 
+def get_encoder():
+    """
+    Get the sentence encoder wrapping the ONNX session and tokenizer
+    """
+    global _encoder
+    if _encoder is None:
+        session, tokenizer, _ = get_model()
+        truncation = tokenizer.truncation or {}
+        _encoder = onnx_session.SentenceEncoder(session, tokenizer, truncation.get('max_length', 128))
+    return _encoder
+
+
 def get_s3_client():
-    global _s3_client
-    if _s3_client is None:
-        _s3_client = boto3.client("s3")
-    return _s3_client
+    return db.get_client('s3')
 
 
 def get_dynamodb():
-    global _dynamodb
-    if _dynamodb is None:
-        _dynamodb = boto3.resource("dynamodb")
-    return _dynamodb
+    return db.dynamodb
 
 
 def cosine_similarity(a, b):
@@ -1,18 +1,114 @@
-import lambda_functions.MovieAuthFunction as maf
-import lambda_functions.MovieUserDataFunction as mudf
-import lambda_functions.RecommendationFunctions as rf
-from utils.config import Config
+import importlib
+import json
+
 from utils.utils_function import build_response
+from utils.router import Router, normalize_path
+import utils.activity_log as activity_log
+import utils.tracing as tracing
+import utils.call_accounting as call_accounting
+
+# Route table: (method, path template, module, handler, warm-up)
+# Handler modules are imported on first use so e.g. /auth/login never pulls in
+# numpy/onnxruntime/tokenizers through RecommendationFunctions. Warm-up names
+# module functions run once before the route's first request, so heavy state
+# (embeddings, the ONNX model) is only loaded by the routes that use it.
+ROUTES = [
+    ('GET', '/user-data/favorites', 'lambda_functions.MovieUserDataFunction', 'handle_get_favorites', ()),
+    ('POST', '/user-data/favorites', 'lambda_functions.MovieUserDataFunction', 'handle_add_favorite', ()),
+    ('DELETE', '/user-data/favorites/{movie_id}', 'lambda_functions.MovieUserDataFunction', 'handle_remove_favorite', ()),
+    ('GET', '/user-data/favorites/toggle/{movie_id}', 'lambda_functions.MovieUserDataFunction', 'handle_toggle_favorite', ()),
+    ('DELETE', '/user/account', 'lambda_functions.MovieUserDataFunction', 'handle_delete_account', ()),
+    ('GET', '/user/activity', 'lambda_functions.MovieUserDataFunction', 'handle_get_activity', ()),
+    ('POST', '/user-data/reviews', 'lambda_functions.MovieUserDataFunction', 'handle_add_review', ()),
+    ('GET', '/user-data/reviews', 'lambda_functions.MovieUserDataFunction', 'handle_get_reviews', ()),
+    ('GET', '/user-data/reviews/toggle/{movie_id}', 'lambda_functions.MovieUserDataFunction', 'handle_toggle_reviewed', ()),
+    ('DELETE', '/user-data/reviews/{movie_id}', 'lambda_functions.MovieUserDataFunction', 'handle_remove_review', ()),
+    ('POST', '/user-data/status', 'lambda_functions.MovieUserDataFunction', 'handle_batch_status', ()),
+    ('POST', '/auth/login', 'lambda_functions.MovieAuthFunction', 'handle_login', ()),
+    ('POST', '/auth/register', 'lambda_functions.MovieAuthFunction', 'handle_register', ()),
+    ('POST', '/auth/refresh', 'lambda_functions.MovieAuthFunction', 'handle_refresh', ()),
+    ('POST', '/search', 'lambda_functions.RecommendationFunctions', 'handle_semantic_search', ('load_embeddings', 'get_encoder')),
+    ('POST', '/content', 'lambda_functions.RecommendationFunctions', 'handle_content_based_search', ('load_embeddings',)),
+    ('POST', '/collaborative', 'lambda_functions.RecommendationFunctions', 'handle_collaborative_search', ()),
+    ('POST', '/similar', 'lambda_functions.RecommendationFunctions', 'handle_similar_search', ('load_embeddings',)),
+]
+
+router = Router()
+for _method, _template, _module_name, _handler_name, _warmup in ROUTES:
+    router.add(_method, _template, (_module_name, _handler_name, _warmup))
+
+_modules = {}
+_warmed = set()  # (module, warm-up function) already run
+
+def load_module(module_name):
+    """
+    Import a handler module on first use
+    Args:
+        module_name: dotted module path from ROUTES
+    Returns:
+        module: the imported handler module
+    """
+    module = _modules.get(module_name)
+    if module is None:
+        module = importlib.import_module(module_name)
+        _modules[module_name] = module
+    return module
+
+def warm_route(module, warmup):
+    """
+    Run a route's warm-up functions that have not run in this process yet
+    Args:
+        module: the route's handler module
+        warmup: names of module functions from ROUTES
+    """
+    for name in warmup:
+        key = (module.__name__, name)
+        if key not in _warmed:
+            getattr(module, name)()
+            _warmed.add(key)
 
-rf.load_embeddings()
+def resolve_route(path, http_method):
+    """
+    Find the handler for a request
+    Returns:
+        tuple: (handler function, path params), or (None, None) if no route matches
+    """
+    target, path_params = router.match(http_method, path)
+    if target is None:
+        return None, None
+    module_name, handler_name, warmup = target
+    with tracing.span('load_module'):
+        module = load_module(module_name)
+        warm_route(module, warmup)
+    return getattr(module, handler_name), path_params
+
+def strip_stage(event, path):
+    """Remove the API Gateway stage prefix (e.g. /deploy) from the request path"""
+    stage = event.get('requestContext', {}).get('stage')
+    if stage and stage != '$default' and path.startswith(f'/{stage}/'):
+        return path[len(stage) + 1:]
+    return path
+
+def finish_request(trace, recorder, response):
+    """
+    Attach the request's AWS call summary to its log record and close the trace
+    """
+    calls = call_accounting.stop(recorder)
+    if calls is not None:
+        if trace is not None:
+            trace.properties['calls'] = calls
+        else:
+            print(json.dumps({'calls': calls}, separators=(',', ':')))
+    return tracing.finish_request(trace, response)
 
 def lambda_handler(event, context):
     """
     Main entry point for the User Data Lambda function
     """
+    trace = tracing.start_request('unmatched')
+    recorder = call_accounting.start_request()
     try:
         # Extract path and HTTP method
-        print(len(Config._embeddings))
         path = event.get("requestContext", {}).get("http", {}).get("path", "")
         http_method = event.get("requestContext", {}).get("http", {}).get("method", "")
         if not http_method:
@@ -20,47 +116,26 @@ def lambda_handler(event, context):
             http_method = event.get('httpMethod', '')
 
         # Route request to appropriate handler
-        if path.endswith('/user-data/favorites') and http_method == 'GET':
-            return mudf.handle_get_favorites(event)
-        elif path.endswith('/user-data/favorites') and http_method == 'POST':
-            return mudf.handle_add_favorite(event)
-        elif '/user-data/favorites/' in path and http_method == 'DELETE':
-            return mudf.handle_remove_favorite(event)
-        elif '/user-data/favorites/toggle/' in path and http_method == 'GET':
-            return mudf.handle_toggle_favorite(event)
-        elif path.endswith('/user/account') and http_method == 'DELETE':
-            return mudf.handle_delete_account(event)
-        elif path.endswith('/user/activity') and http_method == 'GET':
-            return mudf.handle_get_activity(event)
-        elif path.endswith('/user-data/reviews') and http_method == 'POST':
-            return mudf.handle_add_review(event)
-        elif path.endswith('/user-data/reviews') and http_method == 'GET':
-            return mudf.handle_get_reviews(event)
-        elif '/user-data/reviews/toggle/' in path and http_method == 'GET':
-            return mudf.handle_toggle_reviewed(event)
-        elif '/user-data/reviews/' in path and http_method == 'DELETE':
-            return mudf.handle_remove_review(event)
-        elif path.endswith('/auth/login') and http_method == 'POST':
-            return maf.handle_login(event)
-        elif path.endswith('/auth/register') and http_method == 'POST':
-            return maf.handle_register(event)
-        elif path.endswith('/auth/refresh') and http_method == 'POST':
-            return maf.handle_refresh(event)
-        elif path.endswith('/search') and http_method == 'POST':
-            return rf.handle_semantic_search(event)
-        elif path.endswith('/content') and http_method == 'POST':
-            return rf.handle_content_based_search(event)
-        elif path.endswith('/collaborative') and http_method == 'POST':
-            return rf.handle_collaborative_search(event)        
-        elif path.endswith('/similar') and http_method == 'POST':
-            return rf.handle_similar_search(event)
-        elif path.endswith('/'):
-            return build_response(200, {'message': 'Hi, welcome to this API'})
+        path = strip_stage(event, path)
+        handler, path_params = resolve_route(path, http_method)
+        if handler:
+            if trace is not None:
+                trace.route = handler.__name__
+            with tracing.span('handler'):
+                response = handler(event, path_params) if path_params else handler(event)
+        elif normalize_path(path) == '/':
+            response = build_response(200, {'message': 'Hi, welcome to this API'})
         else:
-            return build_response(404, {'error': 'Path not found '+ path})
+            response = build_response(404, {'error': 'Path not found '+ path})
     
     except Exception as e:
         print(f"Error processing request: {str(e)}")
-        return build_response(500, {'error': 'Internal server error ' + str(e)})
-
-        
\ No newline at end of file
+        response = build_response(500, {'error': 'Internal server error ' + str(e)})
+    finally:
+        # Every invocation, including 404s and failed handlers, writes what it queued
+        # before Lambda freezes the sandbox
+        try:
+            activity_log.end_of_invocation()
+        except Exception as e:
+            print(f"Activity flush error: {str(e)}")
+    return finish_request(trace, recorder, response)
@@ -0,0 +1,304 @@
+"""
+Local HTTP serving mode
+Runs the Lambda handlers behind a pre-forked HTTP server for development,
+benchmarking and on-prem deployments. The parent loads the embeddings once
+into shared memory (utils.shared_embeddings) and forks worker processes that
+accept on the same listening socket; each worker adapts HTTP requests into
+the API Gateway event shape lambda_handler expects.
+
+Usage:
+    python local_server.py --port 8000 --workers 4
+    python local_server.py --embeddings embeddings.npz   # local base archive instead of S3
+
+Send SIGHUP to reload the embeddings and replace the workers, SIGTERM/SIGINT to stop.
+Workers stop gracefully: they finish in-flight requests and flush the activity
+buffer before exiting.
+"""
+import argparse
+import base64
+import os
+import signal
+import socket
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qsl, urlsplit
+
+from utils.config import Config
+
+lambda_handler = None  # imported in each worker after the fork
+
+
+def build_event(method, path, query, headers, body):
+    """
+    Adapt an HTTP request to the API Gateway (REST, v1) event shape
+    Args:
+        method: HTTP method
+        path: request path without the query string
+        query: raw query string
+        headers: request headers (any mapping of name -> value)
+        body: request body bytes
+    Returns:
+        dict: Lambda event
+    """
+    event = {
+        'httpMethod': method,
+        'path': path,
+        'headers': {name.lower(): value for name, value in headers.items()},
+        'queryStringParameters': dict(parse_qsl(query)) or None,
+        'requestContext': {'stage': '$default'},
+        'body': None,
+        'isBase64Encoded': False
+    }
+    if body:
+        try:
+            event['body'] = body.decode('utf-8')
+        except UnicodeDecodeError:
+            event['body'] = base64.b64encode(body).decode('ascii')
+            event['isBase64Encoded'] = True
+    return event
+
+
+def response_body(response):
+    """Body bytes of a Lambda proxy response"""
+    body = response.get('body') or ''
+    if response.get('isBase64Encoded'):
+        return base64.b64decode(body)
+    return body.encode('utf-8')
+
+
+KEEPALIVE_TIMEOUT = 5  # seconds an idle keep-alive connection holds its thread
+
+
+class LambdaRequestHandler(BaseHTTPRequestHandler):
+    """Passes every request through lambda_handler"""
+    protocol_version = 'HTTP/1.1'
+    timeout = KEEPALIVE_TIMEOUT
+
+    def _dispatch(self):
+        parts = urlsplit(self.path)
+        length = int(self.headers.get('Content-Length') or 0)
+        body = self.rfile.read(length) if length else b''
+
+        event = build_event(self.command, parts.path, parts.query, self.headers, body)
+        response = lambda_handler.lambda_handler(event, None)
+
+        payload = response_body(response)
+        self.send_response(response.get('statusCode', 500))
+        for name, value in (response.get('headers') or {}).items():
+            self.send_header(name, value)
+        if getattr(self.server, 'draining', False):
+            self.send_header('Connection', 'close')
+            self.close_connection = True
+        self.send_header('Content-Length', str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    do_GET = do_POST = do_PUT = do_DELETE = do_OPTIONS = _dispatch
+
+    def log_message(self, format, *args):
+        if Config.DEBUG_MODE:
+            super().log_message(format, *args)
+
+
+class WorkerHTTPServer(ThreadingHTTPServer):
+    """
+    Worker HTTP server whose request threads are joined on close, so a stopping
+    worker finishes the requests it has accepted instead of dropping them
+    """
+    daemon_threads = False
+    block_on_close = True
+    draining = False
+
+
+def load_embeddings(path=None):
+    """
+    Load embeddings in the parent process
+    Args:
+        path: optional local base archive (.npz); S3 (EMBEDDINGS_BUCKET) otherwise
+    Returns:
+        tuple: (embeddings dict, version)
+    """
+    from utils import embedding_store
+    if path:
+        with open(path, 'rb') as f:
+            embeddings = embedding_store.load_base_archive(f.read())
+        return embeddings, f"file:{os.path.basename(path)}:{int(os.path.getmtime(path))}"
+    # A private client: the shared one would be inherited by the forked workers
+    import boto3
+    return embedding_store.load_embeddings(boto3.client('s3', endpoint_url=Config.S3_ENDPOINT_URL))
+
+
+def worker_cpu_share(workers):
+    """CPUs per worker, so each worker's ONNX session does not oversubscribe the host"""
+    try:
+        cpus = len(os.sched_getaffinity(0))
+    except AttributeError:
+        cpus = os.cpu_count() or 1
+    return max(1, cpus // workers)
+
+
+def run_worker(listener, descriptor, workers):
+    """
+    Worker process body: attach to the shared embeddings, warm every handler
+    module and serve requests from the inherited listening socket
+    SIGTERM stops accepting, waits for in-flight requests and flushes the
+    activity buffer before returning.
+    """
+    global lambda_handler
+    for signum in (signal.SIGHUP, signal.SIGINT, signal.SIGCHLD):
+        signal.signal(signum, signal.SIG_DFL)
+    stop_requested = threading.Event()
+    signal.signal(signal.SIGTERM, lambda signum, frame: stop_requested.set())
+
+    if Config.ONNX_INTRA_OP_THREADS == 0:
+        Config.ONNX_INTRA_OP_THREADS = worker_cpu_share(workers)
+
+    import importlib
+    import lambda_handler as handler_module
+    from utils import shared_embeddings
+    from utils.embedding_snapshot import SnapshotHolder
+    lambda_handler = handler_module
+
+    # The parent owns reloads: workers never refresh from S3 themselves
+    recommendations = importlib.import_module('lambda_functions.RecommendationFunctions')
+    holder = SnapshotHolder(recommendations.get_s3_client, refresh_interval=0)
+    holder.set(shared_embeddings.attach(descriptor))
+    recommendations._snapshot_holder = holder
+    for module_name in dict.fromkeys(route[2] for route in lambda_handler.ROUTES):
+        lambda_handler.load_module(module_name)
+
+    server = WorkerHTTPServer(listener.getsockname()[:2], LambdaRequestHandler, bind_and_activate=False)
+    server.socket.close()
+    server.socket = listener
+
+    def stop_on_signal():
+        # shutdown() waits for serve_forever to return, so it cannot run in the serving thread
+        stop_requested.wait()
+        server.draining = True
+        server.shutdown()
+
+    threading.Thread(target=stop_on_signal, name='worker-stop', daemon=True).start()
+    if not stop_requested.is_set():
+        print(f"Worker {os.getpid()} serving embeddings {descriptor['version']} ({descriptor['shape'][0]} movies)")
+        server.serve_forever()
+    server.draining = True
+    server.server_close()  # joins the in-flight request threads
+    from utils import activity_log
+    activity_log.flush()
+
+
+class PreforkServer:
+    """
+    Parent process: owns the listening socket and the shared embeddings,
+    keeps `workers` children running
+    """
+
+    def __init__(self, host, port, workers, embeddings_path=None):
+        self.host = host
+        self.port = port
+        self.workers = workers
+        self.embeddings_path = embeddings_path
+        self.shared = None
+        self.children = set()
+        self._reload_requested = False
+        self._stopping = False
+
+    def serve(self):
+        from utils.shared_embeddings import SharedEmbeddings
+
+        embeddings, version = load_embeddings(self.embeddings_path)
+        self.shared = SharedEmbeddings(embeddings, version)
+        del embeddings
+
+        self.listener = socket.create_server((self.host, self.port), backlog=128, reuse_port=False)
+        print(f"Serving on http://{self.host}:{self.port} with {self.workers} workers "
+              f"(embeddings {version}, {self.shared.descriptor['shape'][0]} movies in shared memory)")
+
+        signal.signal(signal.SIGHUP, lambda signum, frame: setattr(self, '_reload_requested', True))
+        signal.signal(signal.SIGTERM, lambda signum, frame: setattr(self, '_stopping', True))
+        signal.signal(signal.SIGINT, lambda signum, frame: setattr(self, '_stopping', True))
+
+        try:
+            while not self._stopping:
+                self._reap()
+                if self._reload_requested:
+                    self._reload_requested = False
+                    self.reload()
+                while len(self.children) < self.workers and not self._stopping:
+                    self._spawn()
+                time.sleep(0.2)
+        finally:
+            self._stop_children(self.children)
+            self.shared.close()
+            self.listener.close()
+
+    def reload(self):
+        """Load the current embeddings into new shared blocks and replace the workers"""
+        from utils.shared_embeddings import SharedEmbeddings
+        try:
+            embeddings, version = load_embeddings(self.embeddings_path)
+        except Exception as e:
+            print(f"Error reloading embeddings, keeping {self.shared.descriptor['version']}: {str(e)}")
+            return
+        previous, old_children = self.shared, set(self.children)
+        self.shared = SharedEmbeddings(embeddings, version)
+        del embeddings
+        self.children = set()
+        for _ in range(self.workers):
+            self._spawn()
+        self._stop_children(old_children)
+        previous.close()
+        print(f"Reloaded embeddings {previous.descriptor['version']} -> {version}")
+
+    def _spawn(self):
+        pid = os.fork()
+        if pid == 0:
+            status = 1
+            try:
+                run_worker(self.listener, self.shared.descriptor, self.workers)
+                status = 0
+            finally:
+                os._exit(status)
+        self.children.add(pid)
+
+    def _reap(self):
+        for pid in list(self.children):
+            try:
+                done, status = os.waitpid(pid, os.WNOHANG)
+            except ChildProcessError:
+                done, status = pid, 0
+            if done:
+                self.children.discard(pid)
+                if not self._stopping:
+                    print(f"Worker {pid} exited with status {status}, restarting")
+
+    def _stop_children(self, children):
+        for pid in children:
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+        for pid in children:
+            try:
+                os.waitpid(pid, 0)
+            except ChildProcessError:
+                pass
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve the API locally with pre-forked workers")
+    parser.add_argument('--host', default=Config.SERVER_HOST)
+    parser.add_argument('--port', type=int, default=Config.SERVER_PORT)
+    parser.add_argument('--workers', type=int, default=Config.SERVER_WORKERS or os.cpu_count() or 1)
+    parser.add_argument('--embeddings', help='local embeddings base archive (.npz) instead of S3')
+    args = parser.parse_args()
+
+    if not hasattr(os, 'fork'):
+        sys.exit("local_server.py needs os.fork (Linux/macOS)")
+    PreforkServer(args.host, args.port, max(1, args.workers), args.embeddings).serve()
+
+
+if __name__ == "__main__":
+    main()
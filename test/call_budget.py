@@ -0,0 +1,233 @@
+#!/usr/bin/env python3
+"""
+Round-trip budget checks
+Runs routes through lambda_handler against the in-memory DynamoDB stand-in
+(test/local_dynamodb.py) and fails when a route makes more DynamoDB calls than
+its budget for a given input size, so N+1 access patterns show up as a failing
+check instead of on the bill.
+
+The helpers can be used on their own:
+    with call_budget(3):
+        handler(event)
+
+    assert_round_trips(run, sizes=[1, 10, 50], budget=lambda m: 2, seed=seed)
+
+Usage:
+    python test/call_budget.py --sizes 1 10 50 --output budgets.json
+"""
+import argparse
+import json
+import os
+import sys
+import time
+from contextlib import contextmanager
+from decimal import Decimal
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+os.environ.setdefault('AWS_DEFAULT_REGION', 'us-east-1')
+os.environ.setdefault('AWS_ACCESS_KEY_ID', 'local')
+os.environ.setdefault('AWS_SECRET_ACCESS_KEY', 'local')
+os.environ.setdefault('JWT_SECRET', 'local-round-trip-budget-secret-0123456789')
+
+import utils.call_accounting as call_accounting
+
+
+class RoundTripBudgetExceeded(AssertionError):
+    """Raised when a block makes more calls than its budget"""
+
+
+@contextmanager
+def call_budget(max_calls, service='dynamodb', operation=None):
+    """
+    Assert that the enclosed block makes at most max_calls API calls
+    Args:
+        max_calls: allowed round trips
+        service: service to count ('dynamodb', 's3' or None for all)
+        operation: optional single operation to count, e.g. 'GetItem'
+    Yields:
+        CallRecorder: the recorder, for inspecting calls and capacity
+    Raises:
+        RoundTripBudgetExceeded: the block exceeded its budget
+    """
+    recorder = call_accounting.start()
+    try:
+        yield recorder
+    finally:
+        call_accounting.stop(recorder)
+    used = recorder.total_calls(service, operation)
+    if used > max_calls:
+        raise RoundTripBudgetExceeded(
+            f"{used} {service or 'AWS'} calls, budget {max_calls}: {recorder.summary()['calls']}"
+        )
+
+
+def assert_round_trips(run, sizes, budget, seed=None, service='dynamodb'):
+    """
+    Check a budget that depends on input size
+    Args:
+        run: callable(size) performing the request
+        sizes: input sizes to try
+        budget: callable(size) -> allowed calls
+        seed: optional callable(size) preparing the stand-in's data first
+        service: service to count
+    Returns:
+        list: one {'size', 'budget', 'calls', 'ms', 'summary'} dict per size
+    """
+    results = []
+    for size in sizes:
+        if seed:
+            seed(size)
+        allowed = budget(size)
+        with call_budget(allowed, service) as recorder:
+            start = time.perf_counter()
+            run(size)
+            elapsed_ms = (time.perf_counter() - start) * 1000
+        results.append({
+            'size': size,
+            'budget': allowed,
+            'calls': recorder.total_calls(service),
+            'ms': round(elapsed_ms, 1),
+            'summary': recorder.summary()
+        })
+    return results
+
+
+# Route budgets against the local stand-in
+
+USER = {'user_id': 'budget-user', 'email': 'budget@example.com', 'name': 'Budget'}
+
+
+def seed_user_data(stand_in, size):
+    """Reset the stand-in with one user owning `size` favorites, reviews and activity items"""
+    from utils.config import Config
+    for table in stand_in.tables.values():
+        table.clear()
+    stand_in.put(Config.USERS_TABLE, USER)
+    for i in range(max(size, 12)):
+        stand_in.put(Config.MOVIES_TABLE, {'movie_id': str(i), 'title': f'Movie {i}', 'vote_count': Decimal(i)})
+    for i in range(size):
+        stand_in.put(Config.FAVORITES_TABLE, {'user_id': USER['user_id'], 'movie_id': str(i)})
+        stand_in.put(Config.REVIEWS_TABLE, {'user_id': USER['user_id'], 'movie_id': str(i), 'rating': Decimal(4)})
+        stand_in.put(Config.ACTIVITY_TABLE, {'user_id': USER['user_id'], 'timestamp': Decimal(1000 + i), 'action': 'view'})
+    # A neighbour who rated the same movies plus a few more, for collaborative filtering
+    for i in range(size + 3):
+        stand_in.put(Config.REVIEWS_TABLE, {'user_id': 'neighbour', 'movie_id': str(i), 'rating': Decimal(5)})
+
+
+def make_event(method, path, token, body=None, query=None):
+    return {
+        'httpMethod': method,
+        'path': path,
+        'headers': {'Authorization': f'Bearer {token}'},
+        'queryStringParameters': query,
+        'body': json.dumps(body) if body is not None else None
+    }
+
+
+# route name -> (event builder(size), budget(size)); auth adds one users GetItem.
+# Listing budgets are constants: a route whose reads grow with the page is N+1.
+# Collaborative filtering compares every movie the user rated, so it grows with
+# the user's ratings (not with the result page).
+ROUTE_BUDGETS = {
+    'GET /user-data/favorites': (
+        lambda size: ('GET', '/user-data/favorites', None, None),
+        lambda size: 3  # query + one BatchGetItem for the metadata
+    ),
+    'GET /user-data/reviews': (
+        lambda size: ('GET', '/user-data/reviews', None, None),
+        lambda size: 3  # query + one BatchGetItem for the metadata
+    ),
+    'POST /user-data/status': (
+        lambda size: ('POST', '/user-data/status', {'movie_ids': [str(i) for i in range(size)]}, None),
+        lambda size: 3  # one BatchGetItem per 50 movies (at most 2 below STATUS_QUERY_THRESHOLD), or two queries
+    ),
+    'GET /user/activity': (
+        lambda size: ('GET', '/user/activity', None, {'limit': '20'}),
+        lambda size: 2
+    ),
+    'GET /user-data/favorites/toggle/{movie_id}': (
+        lambda size: ('GET', '/user-data/favorites/toggle/1', None, None),
+        lambda size: 2
+    ),
+    'POST /collaborative': (
+        lambda size: ('POST', '/collaborative', {'top_k': 5}, None),
+        # ratings query, MovieIndex query per rated movie, query per neighbour, one BatchGetItem
+        lambda size: 2 + size + 10 + 1
+    ),
+}
+
+
+def install_stand_in(latency_ms=0):
+    """Point the shared DynamoDB clients at a fresh in-memory stand-in"""
+    from local_dynamodb import LocalDynamoDB
+    from utils.config import Config
+    import utils.database as db
+    import lambda_functions.RecommendationFunctions as rf
+
+    stand_in = LocalDynamoDB.from_repo_schema({
+        'Movies': Config.MOVIES_TABLE,
+        'Reviews': Config.REVIEWS_TABLE,
+        'MovieRecommender_Users': Config.USERS_TABLE,
+        'MovieRecommender_Favorites': Config.FAVORITES_TABLE,
+        'MovieRecommender_Activity': Config.ACTIVITY_TABLE,
+    })
+    stand_in.latency_ms = latency_ms
+    clients = {id(db.dynamodb.meta.client): db.dynamodb.meta.client}
+    rf_client = rf.get_dynamodb().meta.client
+    clients[id(rf_client)] = rf_client
+    for client in clients.values():
+        stand_in.install(client)
+    return stand_in
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Check DynamoDB round-trip budgets per route")
+    parser.add_argument('--sizes', type=int, nargs='*', default=[1, 10, 50])
+    parser.add_argument('--latency-ms', type=float, default=0,
+                        help='simulated DynamoDB round-trip, to compare serial and fanned-out routes')
+    parser.add_argument('--output', help='write results as JSON to this file')
+    args = parser.parse_args()
+
+    from utils.config import Config
+    Config.ACTIVITY_FLUSH_MODE = 'end_of_invocation'
+    Config.AUTH_CACHE_SIZE = 0  # count the users_table read on every request
+    import lambda_handler
+    from utils.utils_function import generate_token
+
+    stand_in = install_stand_in(args.latency_ms)
+    token = generate_token(USER)
+
+    report = []
+    failures = 0
+    for route, (build, budget) in ROUTE_BUDGETS.items():
+        def run(size):
+            method, path, body, query = build(size)
+            response = lambda_handler.lambda_handler(make_event(method, path, token, body, query), None)
+            if response['statusCode'] != 200:
+                raise RuntimeError(f"{route} returned {response['statusCode']}: {response['body']}")
+
+        try:
+            results = assert_round_trips(run, args.sizes, budget, seed=lambda size: seed_user_data(stand_in, size))
+            for result in results:
+                timing = f"  {result['ms']:.1f}ms" if args.latency_ms else ''
+                print(f"{route:>44} size={result['size']:<4} calls={result['calls']:<4} budget={result['budget']}{timing}")
+                report.append({'route': route, 'ok': True, **result})
+        except RoundTripBudgetExceeded as e:
+            failures += 1
+            print(f"{route:>44} OVER BUDGET: {e}")
+            report.append({'route': route, 'ok': False, 'error': str(e)})
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+        print(f"Results written to {args.output}")
+
+    if failures:
+        print(f"\n❌ {failures} route(s) over budget")
+        sys.exit(1)
+    print("\n✅ All routes within budget")
+
+
+if __name__ == "__main__":
+    main()
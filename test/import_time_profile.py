@@ -0,0 +1,93 @@
+#!/usr/bin/env python3
+"""
+Import-time profile for the Lambda entry point
+Runs `python -X importtime` on lambda_handler (and optionally each handler
+module), prints the slowest imports and fails if modules that must stay lazy
+are pulled in by the entry point or if the total exceeds a budget.
+
+Usage:
+    python test/import_time_profile.py
+    python test/import_time_profile.py --budget-ms 400 --top 15 --modules
+"""
+import argparse
+import os
+import subprocess
+import sys
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Heavy ML dependencies that only recommendation routes may load
+LAZY_MODULES = ['numpy', 'onnxruntime', 'tokenizers']
+
+HANDLER_MODULES = [
+    'lambda_functions.MovieAuthFunction',
+    'lambda_functions.MovieUserDataFunction',
+    'lambda_functions.RecommendationFunctions',
+]
+
+
+def profile_import(module_name):
+    """
+    Import module_name in a fresh interpreter with -X importtime
+    Returns:
+        list: (cumulative_us, self_us, module) per imported module
+    """
+    env = dict(os.environ)
+    env.setdefault('AWS_DEFAULT_REGION', 'us-east-1')
+    env.setdefault('JWT_SECRET', 'import-profile')
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', f'import {module_name}'],
+        cwd=REPO_ROOT, env=env, capture_output=True, text=True
+    )
+    if result.returncode != 0:
+        raise RuntimeError(f"Importing {module_name} failed:\n{result.stderr[-2000:]}")
+
+    entries = []
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        self_us, cumulative_us, name = line[len('import time:'):].split('|', 2)
+        entries.append((int(cumulative_us), int(self_us), name.rstrip()))
+    return entries
+
+
+def report(module_name, entries, top):
+    total_ms = sum(self_us for _, self_us, _ in entries) / 1000
+    print(f"\n== {module_name}: {total_ms:.1f} ms, {len(entries)} modules ==")
+    print(f"{'cumulative':>12} {'self':>10}  module")
+    for cumulative_us, self_us, name in sorted(entries, reverse=True)[:top]:
+        print(f"{cumulative_us / 1000:>10.1f}ms {self_us / 1000:>8.1f}ms  {name}")
+    return total_ms
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Import-time profile of the Lambda entry point")
+    parser.add_argument('--budget-ms', type=float, default=None, help='fail if lambda_handler import exceeds this')
+    parser.add_argument('--top', type=int, default=10, help='number of slowest imports to show')
+    parser.add_argument('--modules', action='store_true', help='also profile each handler module')
+    args = parser.parse_args()
+
+    failures = []
+
+    entries = profile_import('lambda_handler')
+    total_ms = report('lambda_handler', entries, args.top)
+
+    imported = {name.strip() for _, _, name in entries}
+    leaked = [m for m in LAZY_MODULES if m in imported]
+    if leaked:
+        failures.append(f"lambda_handler eagerly imports {', '.join(leaked)}")
+    if args.budget_ms is not None and total_ms > args.budget_ms:
+        failures.append(f"lambda_handler import took {total_ms:.1f} ms (budget {args.budget_ms} ms)")
+
+    if args.modules:
+        for module_name in HANDLER_MODULES:
+            report(module_name, profile_import(module_name), args.top)
+
+    if failures:
+        print("\n❌ " + "\n❌ ".join(failures))
+        sys.exit(1)
+    print("\n✅ Import profile OK")
+
+
+if __name__ == "__main__":
+    main()
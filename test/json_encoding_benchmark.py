@@ -0,0 +1,106 @@
+#!/usr/bin/env python3
+"""
+Response serialization benchmark
+Compares the previous convert_decimals + json.dumps path with encode_json
+(stdlib json and orjson backends) on recommendation-sized payloads of
+DynamoDB Movies items.
+
+Usage:
+    python test/json_encoding_benchmark.py --results 100 --iterations 200
+"""
+import argparse
+import json
+import os
+import random
+import statistics
+import sys
+import time
+from decimal import Decimal
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault('AWS_DEFAULT_REGION', 'us-east-1')
+
+from utils.config import Config
+import utils.utils_function as uf
+
+WORDS = ("space war love family crime detective future robot city night ship "
+         "island king queen secret journey friend dark light river").split()
+
+
+def make_movie(i):
+    """A Movies item shaped like the DynamoDB records returned by get_item"""
+    return {
+        'movie_id': str(1000 + i),
+        'title': ' '.join(random.choices(WORDS, k=3)).title(),
+        'overview': ' '.join(random.choices(WORDS, k=random.randint(40, 90))),
+        'genres': random.sample(['Action', 'Drama', 'Comedy', 'Science Fiction', 'Thriller', 'Romance'], 3),
+        'actors': [' '.join(random.choices(WORDS, k=2)).title() for _ in range(10)],
+        'directors': [' '.join(random.choices(WORDS, k=2)).title()],
+        'release_year': Decimal(random.randint(1950, 2020)),
+        'vote_average': Decimal(str(round(random.uniform(1, 10), 1))),
+        'vote_count': Decimal(random.randint(0, 20000)),
+        'popularity': Decimal(str(round(random.uniform(0, 500), 6))),
+        'runtime': Decimal(random.randint(70, 200)),
+        'adult': False,
+        'score': random.random(),
+    }
+
+
+def legacy_encode(body):
+    return json.dumps(uf.convert_decimals(body))
+
+
+def time_encoder(encode, payload, iterations):
+    encode(payload)
+    timings = []
+    for _ in range(iterations):
+        start = time.perf_counter()
+        encode(payload)
+        timings.append((time.perf_counter() - start) * 1000)
+    timings.sort()
+    return {
+        'p50_ms': statistics.median(timings),
+        'p95_ms': timings[int(len(timings) * 0.95) - 1],
+        'bytes': len(encode(payload).encode('utf-8'))
+    }
+
+
+def json_encode(body):
+    backend = Config.JSON_BACKEND
+    Config.JSON_BACKEND = 'json'
+    try:
+        return uf.encode_json(body)
+    finally:
+        Config.JSON_BACKEND = backend
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark response JSON encoding")
+    parser.add_argument('--results', type=int, nargs='*', default=[10, 100])
+    parser.add_argument('--iterations', type=int, default=200)
+    parser.add_argument('--output', help='write results as JSON to this file')
+    args = parser.parse_args()
+
+    random.seed(42)
+    encoders = {'convert_decimals+json': legacy_encode, 'encode_json[json]': json_encode}
+    if uf.orjson is not None:
+        encoders['encode_json[orjson]'] = uf.encode_json
+
+    report = []
+    for size in args.results:
+        payload = [make_movie(i) for i in range(size)]
+        assert json.loads(legacy_encode(payload)) == json.loads(json_encode(payload))
+        print(f"\n== {size} movies ==")
+        for name, encode in encoders.items():
+            result = time_encoder(encode, payload, args.iterations)
+            report.append({'results': size, 'encoder': name, **result})
+            print(f"{name:>24}: p50={result['p50_ms']:.3f}ms p95={result['p95_ms']:.3f}ms ({result['bytes']} bytes)")
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+        print(f"Results written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,332 @@
+#!/usr/bin/env python3
+"""
+In-memory DynamoDB stand-in for local tests and benchmarks
+Answers the DynamoDB JSON protocol from a botocore 'before-send' hook, so the
+real boto3 resource/table code paths (serialization, parsing, event hooks and
+call accounting) run unchanged without AWS or DynamoDB Local. Supports the
+operations and expressions this repo uses: GetItem, PutItem, DeleteItem,
+Query (incl. indexes, Limit, ExclusiveStartKey), Scan, BatchGetItem and
+BatchWriteItem.
+
+Usage:
+    stand_in = LocalDynamoDB.from_repo_schema()
+    stand_in.install(utils.database.dynamodb.meta.client)
+"""
+import json
+import re
+import time
+from decimal import Decimal
+
+from botocore.awsrequest import AWSResponse
+
+# (hash key, range key) per table and index, as created by initial_setup/create_table.py
+REPO_SCHEMA = {
+    'Movies': {'key': ('movie_id', None), 'indexes': {}},
+    'Reviews': {'key': ('user_id', 'movie_id'), 'indexes': {'MovieIndex': ('movie_id', 'user_id')}},
+    'MovieRecommender_Users': {'key': ('email', None), 'indexes': {'UserIdIndex': ('user_id', None)}},
+    'MovieRecommender_Favorites': {'key': ('user_id', 'movie_id'), 'indexes': {'MovieFavoritesIndex': ('movie_id', None)}},
+    'MovieRecommender_Activity': {'key': ('user_id', 'timestamp'), 'indexes': {}},
+}
+
+TOKEN_PATTERN = re.compile(r'\s*(<=|>=|<>|=|<|>|\(|\)|,|[#:]?[A-Za-z_][A-Za-z0-9_.]*)')
+
+
+class _RawBody:
+    def __init__(self, data):
+        self._data = data
+
+    def stream(self, **kwargs):
+        yield self._data
+
+
+def _to_python(value):
+    (kind, raw), = value.items()
+    if kind == 'N':
+        return Decimal(raw)
+    if kind in ('S', 'B', 'BOOL', 'NULL'):
+        return raw
+    if kind == 'L':
+        return [_to_python(v) for v in raw]
+    if kind == 'M':
+        return {k: _to_python(v) for k, v in raw.items()}
+    return raw
+
+
+class _Expression:
+    """Evaluator for key condition and filter expressions"""
+
+    def __init__(self, expression, names, values):
+        self.tokens = TOKEN_PATTERN.findall(expression)
+        self.names = names or {}
+        self.values = values or {}
+        self.pos = 0
+
+    def matches(self, item):
+        self.pos = 0
+        return self._or(item)
+
+    def _peek(self):
+        return self.tokens[self.pos] if self.pos < len(self.tokens) else None
+
+    def _next(self):
+        token = self._peek()
+        self.pos += 1
+        return token
+
+    def _or(self, item):
+        result = self._and(item)
+        while self._peek() and self._peek().upper() == 'OR':
+            self._next()
+            right = self._and(item)
+            result = result or right
+        return result
+
+    def _and(self, item):
+        result = self._not(item)
+        while self._peek() and self._peek().upper() == 'AND':
+            self._next()
+            right = self._not(item)
+            result = result and right
+        return result
+
+    def _not(self, item):
+        if self._peek() and self._peek().upper() == 'NOT':
+            self._next()
+            return not self._not(item)
+        return self._comparison(item)
+
+    def _operand(self, item):
+        token = self._next()
+        if token.startswith(':'):
+            return _to_python(self.values[token])
+        name = self.names.get(token, token)
+        value = item.get(name)
+        return _to_python(value) if value is not None else None
+
+    def _comparison(self, item):
+        if self._peek() == '(':
+            self._next()
+            result = self._or(item)
+            self._next()  # ')'
+            return result
+
+        if self._peek() in ('begins_with', 'attribute_exists', 'attribute_not_exists', 'contains'):
+            function = self._next()
+            self._next()  # '('
+            if function in ('attribute_exists', 'attribute_not_exists'):
+                token = self._next()
+                self._next()  # ')'
+                exists = self.names.get(token, token) in item
+                return exists if function == 'attribute_exists' else not exists
+            left = self._operand(item)
+            self._next()  # ','
+            right = self._operand(item)
+            self._next()  # ')'
+            if left is None:
+                return False
+            return left.startswith(right) if function == 'begins_with' else right in left
+
+        left = self._operand(item)
+        operator = self._next()
+        if operator.upper() == 'BETWEEN':
+            low = self._operand(item)
+            self._next()  # 'AND'
+            high = self._operand(item)
+            return left is not None and low <= left <= high
+        right = self._operand(item)
+        if operator == '=':
+            return left == right
+        if operator == '<>':
+            return left != right
+        if left is None:
+            return False
+        return {'<': left < right, '<=': left <= right, '>': left > right, '>=': left >= right}[operator]
+
+
+class LocalDynamoDB:
+    """
+    Tables held as {table name: {primary key tuple: wire-format item}}
+    """
+
+    def __init__(self, schema, latency_ms=0):
+        self.schema = schema
+        self.tables = {name: {} for name in schema}
+        self.requests = []
+        self.latency_ms = latency_ms  # simulated round-trip per request
+
+    @classmethod
+    def from_repo_schema(cls, table_names=None):
+        """
+        Stand-in with the repo's tables, optionally renamed
+        Args:
+            table_names: optional {schema name: configured table name}
+        """
+        table_names = table_names or {}
+        return cls({table_names.get(name, name): spec for name, spec in REPO_SCHEMA.items()})
+
+    def install(self, client):
+        """Answer every request of a boto3 DynamoDB client from memory"""
+        client.meta.events.register('before-send.dynamodb', self._handle)
+        return self
+
+    # Seeding helpers (plain Python values, Decimal for numbers)
+
+    def put(self, table_name, item):
+        wire = {k: self._to_wire(v) for k, v in item.items()}
+        self.tables[table_name][self._primary_key(table_name, wire)] = wire
+
+    def _to_wire(self, value):
+        if isinstance(value, bool):
+            return {'BOOL': value}
+        if isinstance(value, (int, float, Decimal)):
+            return {'N': str(value)}
+        if isinstance(value, list):
+            return {'L': [self._to_wire(v) for v in value]}
+        if isinstance(value, dict):
+            return {'M': {k: self._to_wire(v) for k, v in value.items()}}
+        if value is None:
+            return {'NULL': True}
+        return {'S': str(value)}
+
+    # Protocol
+
+    def _handle(self, request, **kwargs):
+        target = request.headers['X-Amz-Target']
+        if isinstance(target, bytes):
+            target = target.decode('ascii')
+        operation = target.split('.')[-1]
+        body = json.loads(request.body or b'{}')
+        self.requests.append(operation)
+        if self.latency_ms:
+            time.sleep(self.latency_ms / 1000.0)
+        try:
+            result = getattr(self, f'_op_{operation}')(body)
+            status = 200
+        except KeyError as e:
+            result = {'__type': 'com.amazonaws.dynamodb.v20120810#ResourceNotFoundException',
+                      'message': f'Requested resource not found: {e}'}
+            status = 400
+        payload = json.dumps(result).encode('utf-8')
+        headers = {'content-type': 'application/x-amz-json-1.0', 'content-length': str(len(payload))}
+        return AWSResponse(request.url, status, headers, _RawBody(payload))
+
+    def _primary_key(self, table_name, item, key_names=None):
+        hash_key, range_key = key_names or self.schema[table_name]['key']
+        key = (json.dumps(item[hash_key], sort_keys=True),)
+        if range_key:
+            key += (json.dumps(item[range_key], sort_keys=True),)
+        return key
+
+    def _project(self, item, body):
+        projection = body.get('ProjectionExpression')
+        if not projection:
+            return item
+        names = body.get('ExpressionAttributeNames') or {}
+        attributes = [names.get(p.strip(), p.strip()) for p in projection.split(',')]
+        return {name: item[name] for name in attributes if name in item}
+
+    def _capacity(self, body, table_name, units):
+        if body.get('ReturnConsumedCapacity') in ('TOTAL', 'INDEXES'):
+            return {'ConsumedCapacity': {'TableName': table_name, 'CapacityUnits': units}}
+        return {}
+
+    def _op_GetItem(self, body):
+        name = body['TableName']
+        item = self.tables[name].get(self._primary_key(name, body['Key']))
+        result = {'Item': self._project(item, body)} if item else {}
+        result.update(self._capacity(body, name, 0.5))
+        return result
+
+    def _op_PutItem(self, body):
+        name = body['TableName']
+        self.tables[name][self._primary_key(name, body['Item'])] = body['Item']
+        return self._capacity(body, name, 1.0)
+
+    def _op_DeleteItem(self, body):
+        name = body['TableName']
+        self.tables[name].pop(self._primary_key(name, body['Key']), None)
+        return self._capacity(body, name, 1.0)
+
+    def _sorted_items(self, name, key_names):
+        hash_key, range_key = key_names
+        items = list(self.tables[name].values())
+        if range_key:
+            items.sort(key=lambda item: _to_python(item[range_key]) if range_key in item else '')
+        return items
+
+    def _op_Query(self, body):
+        name = body['TableName']
+        spec = self.schema[name]
+        key_names = spec['indexes'][body['IndexName']] if body.get('IndexName') else spec['key']
+        condition = _Expression(body['KeyConditionExpression'],
+                                body.get('ExpressionAttributeNames'), body.get('ExpressionAttributeValues'))
+        filter_expression = body.get('FilterExpression')
+        items = [item for item in self._sorted_items(name, key_names)
+                 if key_names[0] in item and condition.matches(item)]
+        if body.get('ScanIndexForward') is False:
+            items.reverse()
+        return self._page(name, body, items, filter_expression)
+
+    def _op_Scan(self, body):
+        name = body['TableName']
+        items = list(self.tables[name].values())
+        return self._page(name, body, items, body.get('FilterExpression'))
+
+    def _page(self, name, body, items, filter_expression):
+        start = body.get('ExclusiveStartKey')
+        if start:
+            table_key = self._primary_key(name, start)
+            for index, item in enumerate(items):
+                if self._primary_key(name, item) == table_key:
+                    items = items[index + 1:]
+                    break
+        limit = body.get('Limit')
+        evaluated = items[:limit] if limit else items
+        if filter_expression:
+            condition = _Expression(filter_expression, body.get('ExpressionAttributeNames'),
+                                    body.get('ExpressionAttributeValues'))
+            matched = [item for item in evaluated if condition.matches(item)]
+        else:
+            matched = evaluated
+        result = {
+            'Items': [self._project(item, body) for item in matched],
+            'Count': len(matched),
+            'ScannedCount': len(evaluated)
+        }
+        if limit and len(items) > limit:
+            hash_key, range_key = self.schema[name]['key']
+            last = evaluated[-1]
+            result['LastEvaluatedKey'] = {k: last[k] for k in (hash_key, range_key) if k}
+        result.update(self._capacity(body, name, max(0.5, 0.5 * len(evaluated))))
+        return result
+
+    def _op_BatchGetItem(self, body):
+        responses = {}
+        capacity = []
+        for name, request in body['RequestItems'].items():
+            found = []
+            for key in request['Keys']:
+                item = self.tables[name].get(self._primary_key(name, key))
+                if item:
+                    found.append(self._project(item, request))
+            responses[name] = found
+            capacity.append({'TableName': name, 'CapacityUnits': 0.5 * len(request['Keys'])})
+        result = {'Responses': responses, 'UnprocessedKeys': {}}
+        if body.get('ReturnConsumedCapacity') in ('TOTAL', 'INDEXES'):
+            result['ConsumedCapacity'] = capacity
+        return result
+
+    def _op_BatchWriteItem(self, body):
+        capacity = []
+        for name, requests in body['RequestItems'].items():
+            for request in requests:
+                if 'PutRequest' in request:
+                    item = request['PutRequest']['Item']
+                    self.tables[name][self._primary_key(name, item)] = item
+                else:
+                    self.tables[name].pop(self._primary_key(name, request['DeleteRequest']['Key']), None)
+            capacity.append({'TableName': name, 'CapacityUnits': float(len(requests))})
+        result = {'UnprocessedItems': {}}
+        if body.get('ReturnConsumedCapacity') in ('TOTAL', 'INDEXES'):
+            result['ConsumedCapacity'] = capacity
+        return result
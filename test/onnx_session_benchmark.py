@@ -0,0 +1,127 @@
+#!/usr/bin/env python3
+"""
+ONNX Runtime SessionOptions benchmark
+Sweeps thread counts, graph optimization level, memory arena and spinning
+settings for the embedding model and reports single-query latency per setup.
+
+Usage:
+    python test/onnx_session_benchmark.py --model model_onnx/model.onnx --tokenizer model_onnx/tokenizer.json
+    python test/onnx_session_benchmark.py ... --output session_sweep.json
+"""
+import argparse
+import itertools
+import json
+import os
+import sys
+import time
+
+import numpy as np
+from tokenizers import Tokenizer
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import utils.onnx_session as onnx_session
+
+QUERIES = [
+    "action movies with superheroes and adventure",
+    "romantic comedies set in New York",
+    "sci-fi movies about space exploration",
+    "thrillers with plot twists",
+]
+
+
+def build_inputs(tokenizer_path, max_length):
+    """Tokenize QUERIES the same way get_model configures the tokenizer"""
+    tokenizer = Tokenizer.from_file(tokenizer_path)
+    tokenizer.enable_truncation(max_length=max_length)
+    tokenizer.enable_padding(direction='right', length=max_length, pad_id=0, pad_token='[PAD]', pad_type_id=0)
+    feeds = []
+    for query in QUERIES:
+        encoded = tokenizer.encode(query)
+        feeds.append({
+            "input_ids": np.array([encoded.ids], dtype=np.int64),
+            "attention_mask": np.array([encoded.attention_mask], dtype=np.int64)
+        })
+    return feeds
+
+
+def run_setup(model_path, feeds, settings, iterations, warmup):
+    """Create a session with settings and time single-query inference"""
+    start = time.perf_counter()
+    session = onnx_session.create_session(model_path, **settings)
+    session_init_ms = (time.perf_counter() - start) * 1000
+
+    for i in range(warmup):
+        session.run(None, feeds[i % len(feeds)])
+
+    timings = []
+    for i in range(iterations):
+        start = time.perf_counter()
+        session.run(None, feeds[i % len(feeds)])
+        timings.append((time.perf_counter() - start) * 1000)
+
+    return {
+        **settings,
+        'session_init_ms': session_init_ms,
+        'p50_ms': float(np.percentile(timings, 50)),
+        'p95_ms': float(np.percentile(timings, 95)),
+        'p99_ms': float(np.percentile(timings, 99)),
+        'mean_ms': float(np.mean(timings))
+    }
+
+
+def sweep(args):
+    cpus = onnx_session.available_cpus()
+    thread_counts = sorted({1, 2, cpus, max(1, cpus * 2)}) if not args.threads else args.threads
+    grid = itertools.product(
+        thread_counts,
+        args.optimization,
+        [True, False],  # enable_cpu_mem_arena
+        [False, True],  # allow_spinning
+    )
+
+    feeds = build_inputs(args.tokenizer, args.max_length)
+    results = []
+    print(f"Available CPUs: {cpus}")
+    print(f"{'intra':>5} {'opt':>9} {'arena':>5} {'spin':>5} | {'init':>8} {'p50':>8} {'p95':>8} {'p99':>8}")
+    for intra, optimization, arena, spinning in grid:
+        settings = {
+            'intra_op_threads': intra,
+            'inter_op_threads': 1,
+            'graph_optimization': optimization,
+            'enable_cpu_mem_arena': arena,
+            'allow_spinning': spinning
+        }
+        result = run_setup(args.model, feeds, settings, args.iterations, args.warmup)
+        results.append(result)
+        print(f"{intra:>5} {optimization:>9} {str(arena):>5} {str(spinning):>5} | "
+              f"{result['session_init_ms']:>7.1f}ms {result['p50_ms']:>6.2f}ms "
+              f"{result['p95_ms']:>6.2f}ms {result['p99_ms']:>6.2f}ms")
+
+    best = min(results, key=lambda r: r['p50_ms'])
+    print(f"\nBest p50: {best}")
+    return {'available_cpus': cpus, 'results': results, 'best': best}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Sweep onnxruntime SessionOptions for the embedding model")
+    parser.add_argument('--model', required=True, help='path to model.onnx')
+    parser.add_argument('--tokenizer', required=True, help='path to tokenizer.json')
+    parser.add_argument('--max-length', type=int, default=128)
+    parser.add_argument('--threads', type=int, nargs='*', help='intra-op thread counts to try')
+    parser.add_argument('--optimization', nargs='*', default=['basic', 'extended', 'all'],
+                        choices=list(onnx_session.GRAPH_OPTIMIZATION_LEVELS))
+    parser.add_argument('--iterations', type=int, default=100)
+    parser.add_argument('--warmup', type=int, default=10)
+    parser.add_argument('--output', help='write results as JSON to this file')
+    args = parser.parse_args()
+
+    report = sweep(args)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+        print(f"Results written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
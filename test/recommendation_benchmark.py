@@ -0,0 +1,278 @@
+#!/usr/bin/env python3
+"""
+Offline recommendation engine benchmark
+Generates synthetic embeddings and ratings at a configurable catalogue size and
+measures recommend_similar, recommend_content, recommend_semantic (with a tiny
+local ONNX model and tokenizer) and recommend_collaborative (against the
+in-memory DynamoDB stand-in) for latency percentiles, throughput and peak RSS.
+Each engine/size case runs in its own process so peak RSS is per case.
+Results are written as JSON so runs can be compared across commits.
+
+Usage:
+    python test/recommendation_benchmark.py --movies 10000 100000 --output bench.json
+    python test/recommendation_benchmark.py --engines similar semantic --model model_onnx/model.onnx --tokenizer model_onnx/tokenizer.json
+"""
+import argparse
+import json
+import os
+import platform
+import resource
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from decimal import Decimal
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+os.environ.setdefault('AWS_DEFAULT_REGION', 'us-east-1')
+os.environ.setdefault('AWS_ACCESS_KEY_ID', 'local')
+os.environ.setdefault('AWS_SECRET_ACCESS_KEY', 'local')
+
+import numpy as np
+
+ENGINES = ['similar', 'content', 'semantic', 'collaborative']
+
+QUERIES = [
+    "action movies with superheroes and adventure",
+    "romantic comedies set in new york",
+    "sci-fi movies about space exploration",
+    "thrillers with plot twists",
+]
+
+
+def make_snapshot(num_movies, dim, seed):
+    """Synthetic EmbeddingSnapshot: unit vectors, rows of one contiguous matrix"""
+    from utils.embedding_snapshot import EmbeddingSnapshot
+    rng = np.random.default_rng(seed)
+    matrix = rng.standard_normal((num_movies, dim), dtype=np.float32)
+    matrix /= np.linalg.norm(matrix, axis=1, keepdims=True)
+    embeddings = {str(i): matrix[i] for i in range(num_movies)}
+    return EmbeddingSnapshot(embeddings, f'bench-{num_movies}')
+
+
+def build_tiny_model(directory, dim):
+    """
+    Write a tiny ONNX encoder (token embedding lookup) and a matching
+    WordLevel tokenizer with the real model's input/output names
+    Returns:
+        tuple: (model path, tokenizer path)
+    """
+    import onnx
+    from onnx import helper, numpy_helper, TensorProto
+    from tokenizers import Tokenizer, models, pre_tokenizers
+
+    words = sorted({word for query in QUERIES for word in query.split()})
+    vocab = {'[PAD]': 0, '[UNK]': 1}
+    vocab.update({word: i + 2 for i, word in enumerate(words)})
+    tokenizer = Tokenizer(models.WordLevel(vocab, unk_token='[UNK]'))
+    tokenizer.pre_tokenizer = pre_tokenizers.Whitespace()
+    tokenizer_path = os.path.join(directory, 'tokenizer.json')
+    tokenizer.save(tokenizer_path)
+
+    table = numpy_helper.from_array(np.random.default_rng(0).random((len(vocab), dim), dtype=np.float32), 'table')
+    graph = helper.make_graph(
+        [helper.make_node('Gather', ['table', 'input_ids'], ['last_hidden_state'])],
+        'tiny_encoder',
+        [helper.make_tensor_value_info('input_ids', TensorProto.INT64, ['batch', 'sequence']),
+         helper.make_tensor_value_info('attention_mask', TensorProto.INT64, ['batch', 'sequence'])],
+        [helper.make_tensor_value_info('last_hidden_state', TensorProto.FLOAT, ['batch', 'sequence', dim])],
+        [table]
+    )
+    model = helper.make_model(graph, opset_imports=[helper.make_opsetid('', 14)])
+    model.ir_version = 8
+    model_path = os.path.join(directory, 'model.onnx')
+    onnx.save(model, model_path)
+    return model_path, tokenizer_path
+
+
+def install_encoder(rf, model_path, tokenizer_path, max_length):
+    """Set RecommendationFunctions' encoder from local files instead of S3"""
+    from tokenizers import Tokenizer
+    import utils.onnx_session as onnx_session
+
+    tokenizer = Tokenizer.from_file(tokenizer_path)
+    tokenizer.enable_truncation(max_length=max_length)
+    tokenizer.enable_padding(direction='right', length=max_length, pad_id=0, pad_token='[PAD]', pad_type_id=0)
+    session = onnx_session.create_session(model_path)
+    rf._encoder = onnx_session.SentenceEncoder(session, tokenizer, max_length)
+
+
+def seed_ratings(rf, num_movies, users, ratings_per_user, seed):
+    """
+    Fill the in-memory DynamoDB stand-in with synthetic reviews
+    Ratings concentrate on a popular head of the catalogue so users overlap
+    Returns:
+        list: user IDs to query
+    """
+    from local_dynamodb import LocalDynamoDB
+    from utils.config import Config
+
+    stand_in = LocalDynamoDB.from_repo_schema({'Reviews': Config.REVIEWS_TABLE, 'Movies': Config.MOVIES_TABLE})
+    stand_in.install(rf.get_dynamodb().meta.client)
+
+    rng = np.random.default_rng(seed)
+    head = max(ratings_per_user * 5, min(num_movies, 2000))
+    for u in range(users):
+        movie_ids = rng.choice(head, size=min(ratings_per_user, head), replace=False)
+        ratings = rng.integers(1, 6, size=len(movie_ids))
+        for movie_id, rating in zip(movie_ids, ratings):
+            stand_in.put(Config.REVIEWS_TABLE, {
+                'user_id': f'user-{u}', 'movie_id': str(movie_id), 'rating': Decimal(int(rating))
+            })
+    return [f'user-{u}' for u in range(min(users, 50))]
+
+
+def make_workload(engine, args):
+    """
+    Prepare one engine
+    Returns:
+        callable(i): runs the i-th query
+    """
+    import lambda_functions.RecommendationFunctions as rf
+
+    if engine == 'collaborative':
+        user_ids = seed_ratings(rf, args.movies, args.users, args.ratings_per_user, args.seed)
+        return lambda i: rf.recommend_collaborative(user_ids[i % len(user_ids)], args.top_k)
+
+    snapshot = make_snapshot(args.movies, args.dim, args.seed)
+    rng = np.random.default_rng(args.seed + 1)
+    movie_ids = [str(m) for m in rng.integers(0, args.movies, size=64)]
+
+    if engine == 'similar':
+        return lambda i: rf.recommend_similar(movie_ids[i % len(movie_ids)], args.top_k, snapshot=snapshot)
+
+    if engine == 'content':
+        rated = [[(movie_ids[(i + j) % len(movie_ids)], 1 + (i + j) % 5) for j in range(args.rated)]
+                 for i in range(len(movie_ids))]
+        return lambda i: rf.recommend_content(rated[i % len(rated)], args.top_k, snapshot=snapshot)
+
+    if engine == 'semantic':
+        if args.model and args.tokenizer:
+            model_path, tokenizer_path = args.model, args.tokenizer
+        else:
+            directory = tempfile.mkdtemp(prefix='bench_model_')
+            model_path, tokenizer_path = build_tiny_model(directory, args.dim)
+        install_encoder(rf, model_path, tokenizer_path, args.max_length)
+        return lambda i: rf.recommend_semantic(QUERIES[i % len(QUERIES)], args.top_k, snapshot=snapshot)
+
+    raise ValueError(f"Unknown engine: {engine}")
+
+
+def peak_rss_mb():
+    # ru_maxrss is KiB on Linux, bytes on macOS
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+
+
+def run_case(engine, args):
+    """Benchmark one engine at one catalogue size in this process"""
+    start = time.perf_counter()
+    workload = make_workload(engine, args)
+    setup_s = time.perf_counter() - start
+    setup_rss = peak_rss_mb()
+
+    for i in range(args.warmup):
+        workload(i)
+
+    timings = []
+    wall_start = time.perf_counter()
+    for i in range(args.iterations):
+        start = time.perf_counter()
+        workload(i)
+        timings.append((time.perf_counter() - start) * 1000)
+    wall_s = time.perf_counter() - wall_start
+
+    timings.sort()
+    return {
+        'engine': engine,
+        'movies': args.movies,
+        'dim': args.dim,
+        'iterations': args.iterations,
+        'setup_s': round(setup_s, 3),
+        'p50_ms': round(statistics.median(timings), 3),
+        'p95_ms': round(timings[max(0, int(len(timings) * 0.95) - 1)], 3),
+        'p99_ms': round(timings[max(0, int(len(timings) * 0.99) - 1)], 3),
+        'mean_ms': round(statistics.fmean(timings), 3),
+        'throughput_qps': round(args.iterations / wall_s, 2) if wall_s > 0 else None,
+        'setup_rss_mb': round(setup_rss, 1),
+        'peak_rss_mb': round(peak_rss_mb(), 1)
+    }
+
+
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__)), check=True).stdout.strip()
+    except Exception:
+        return None
+
+
+def case_arguments(args, engine, movies):
+    """Command line re-running one case in a child process"""
+    argv = [sys.executable, os.path.abspath(__file__), '--case', engine, '--movies', str(movies),
+            '--dim', str(args.dim), '--iterations', str(args.iterations), '--warmup', str(args.warmup),
+            '--top-k', str(args.top_k), '--rated', str(args.rated), '--users', str(args.users),
+            '--ratings-per-user', str(args.ratings_per_user), '--max-length', str(args.max_length),
+            '--seed', str(args.seed)]
+    if args.model and args.tokenizer:
+        argv += ['--model', args.model, '--tokenizer', args.tokenizer]
+    return argv
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the recommendation engines on synthetic data")
+    parser.add_argument('--movies', type=int, nargs='*', default=[10000])
+    parser.add_argument('--engines', nargs='*', default=ENGINES, choices=ENGINES)
+    parser.add_argument('--dim', type=int, default=384)
+    parser.add_argument('--iterations', type=int, default=50)
+    parser.add_argument('--warmup', type=int, default=3)
+    parser.add_argument('--top-k', type=int, default=10)
+    parser.add_argument('--rated', type=int, default=10, help='rated movies per recommend_content query')
+    parser.add_argument('--users', type=int, default=500, help='synthetic users for collaborative filtering')
+    parser.add_argument('--ratings-per-user', type=int, default=20)
+    parser.add_argument('--max-length', type=int, default=32)
+    parser.add_argument('--model', help='ONNX model for semantic search (default: generated tiny model)')
+    parser.add_argument('--tokenizer', help='tokenizer.json matching --model')
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--case', choices=ENGINES, help=argparse.SUPPRESS)
+    parser.add_argument('--output', help='write results as JSON to this file')
+    args = parser.parse_args()
+
+    if args.case:
+        # Child process: one engine, one size, result on the last stdout line
+        args.movies = args.movies[0]
+        print(json.dumps(run_case(args.case, args)))
+        return
+
+    results = []
+    for movies in args.movies:
+        for engine in args.engines:
+            proc = subprocess.run(case_arguments(args, engine, movies), capture_output=True, text=True)
+            lines = proc.stdout.strip().splitlines()
+            if proc.returncode != 0 or not lines:
+                print(f"{engine:>14} @ {movies:>8}: FAILED\n{proc.stderr.strip()[-2000:]}")
+                results.append({'engine': engine, 'movies': movies, 'error': proc.stderr.strip()[-2000:]})
+                continue
+            result = json.loads(lines[-1])
+            results.append(result)
+            print(f"{engine:>14} @ {movies:>8}: p50={result['p50_ms']:.2f}ms p95={result['p95_ms']:.2f}ms "
+                  f"p99={result['p99_ms']:.2f}ms {result['throughput_qps']} q/s peak RSS {result['peak_rss_mb']} MB")
+
+    report = {
+        'commit': git_commit(),
+        'timestamp': int(time.time()),
+        'python': platform.python_version(),
+        'numpy': np.__version__,
+        'cpus': os.cpu_count(),
+        'results': results
+    }
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+        print(f"Results written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
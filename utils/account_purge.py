@@ -0,0 +1,115 @@
+"""
+Account data purge module
+Deletes everything a user owns across the per-user tables, paging through
+each table's partition and removing items with BatchWriteItem in parallel
+"""
+import contextvars
+import time
+from concurrent.futures import ThreadPoolExecutor
+from boto3.dynamodb.conditions import Key
+
+from .config import Config
+from . import database as db
+
+# Per-user tables and their primary key attributes (user_id is the hash key)
+PURGE_TABLES = {
+    'favorites': ('user_id', 'movie_id'),
+    'reviews': ('user_id', 'movie_id'),
+    'activity': ('user_id', 'timestamp'),
+}
+
+BATCH_SIZE = 25  # BatchWriteItem limit
+
+
+def batch_delete(table, keys, max_attempts=None):
+    """
+    Delete up to 25 keys with BatchWriteItem, retrying unprocessed items
+    with exponential backoff
+    Args:
+        table: DynamoDB table resource
+        keys: list of primary key dicts
+        max_attempts: retries before giving up on unprocessed items
+    Returns:
+        tuple: (deleted_count, failed_count)
+    """
+    max_attempts = Config.PURGE_MAX_ATTEMPTS if max_attempts is None else max_attempts
+    requests = [{'DeleteRequest': {'Key': key}} for key in keys]
+    attempt = 0
+
+    while requests and attempt < max_attempts:
+        if attempt:
+            time.sleep(min(0.05 * (2 ** attempt), 2.0))
+        attempt += 1
+        response = db.dynamodb.batch_write_item(RequestItems={table.name: requests})
+        requests = response.get('UnprocessedItems', {}).get(table.name, [])
+
+    return len(keys) - len(requests), len(requests)
+
+
+def purge_table(name, user_id):
+    """
+    Page through one table's items for user_id and delete them in batches
+    Args:
+        name: key of PURGE_TABLES
+        user_id: owner of the items
+    Returns:
+        dict: deleted/failed/pages counts for the table
+    """
+    table = db.get_table(name)
+    key_attrs = PURGE_TABLES[name]
+    summary = {'deleted': 0, 'failed': 0, 'pages': 0}
+
+    query_kwargs = {
+        'KeyConditionExpression': Key('user_id').eq(user_id),
+        'ProjectionExpression': ', '.join(f'#k{i}' for i in range(len(key_attrs))),
+        'ExpressionAttributeNames': {f'#k{i}': attr for i, attr in enumerate(key_attrs)}
+    }
+
+    while True:
+        response = table.query(**query_kwargs)
+        summary['pages'] += 1
+        keys = [{attr: item[attr] for attr in key_attrs} for item in response.get('Items', [])]
+
+        for start in range(0, len(keys), BATCH_SIZE):
+            deleted, failed = batch_delete(table, keys[start:start + BATCH_SIZE])
+            summary['deleted'] += deleted
+            summary['failed'] += failed
+
+        last_key = response.get('LastEvaluatedKey')
+        if not last_key:
+            break
+        query_kwargs['ExclusiveStartKey'] = last_key
+
+    print(f"Purged {name} for user {user_id}: {summary}")
+    return summary
+
+
+def purge_user_data(user_id):
+    """
+    Delete a user's favorites, reviews and activity, one worker per table
+    Args:
+        user_id: user to purge
+    Returns:
+        dict: per-table summaries plus 'complete' and 'duration_ms'
+    """
+    start = time.perf_counter()
+    summary = {}
+
+    with ThreadPoolExecutor(max_workers=len(PURGE_TABLES)) as executor:
+        # Workers run in a copy of the request context so their calls are traced and accounted
+        futures = {
+            name: executor.submit(contextvars.copy_context().run, purge_table, name, user_id)
+            for name in PURGE_TABLES
+        }
+        for name, future in futures.items():
+            try:
+                summary[name] = future.result()
+            except Exception as e:
+                print(f"Error purging {name} for user {user_id}: {str(e)}")
+                summary[name] = {'deleted': 0, 'failed': None, 'pages': 0, 'error': str(e)}
+
+    summary['complete'] = all(
+        table_summary.get('failed') == 0 for table_summary in (summary[name] for name in PURGE_TABLES)
+    )
+    summary['duration_ms'] = int((time.perf_counter() - start) * 1000)
+    return summary
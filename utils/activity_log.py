@@ -0,0 +1,152 @@
+"""
+Buffered activity logging module
+Collects user activity items in-process and writes them to the activity table
+with BatchWriteItem instead of one put_item per action. Long-running servers
+flush from a background thread; in Lambda (where the process is frozen as soon
+as the handler returns) the flush runs at the end of each invocation, so the
+write is batched but still on the response path.
+"""
+import atexit
+import threading
+
+from .config import Config
+from . import database as db
+
+BATCH_SIZE = 25  # BatchWriteItem limit
+
+
+class ActivityBuffer:
+    """
+    In-process buffer of activity items flushed in batches
+    In 'background' mode a daemon thread flushes every ACTIVITY_FLUSH_INTERVAL
+    seconds, or as soon as ACTIVITY_FLUSH_SIZE items are pending. In
+    'end_of_invocation' mode (the default under Lambda) nothing runs in the
+    background and lambda_handler flushes after each request.
+    Unprocessed or failed items go back on the queue for the next flush and are
+    dropped only after ACTIVITY_FLUSH_MAX_ATTEMPTS attempts.
+    """
+
+    def __init__(self, max_items=None, max_wait=None, mode=None):
+        self.max_items = Config.ACTIVITY_FLUSH_SIZE if max_items is None else max_items
+        self.max_wait = Config.ACTIVITY_FLUSH_INTERVAL if max_wait is None else max_wait
+        self.mode = Config.ACTIVITY_FLUSH_MODE if mode is None else mode
+        self.max_attempts = Config.ACTIVITY_FLUSH_MAX_ATTEMPTS
+        self._items = []  # (item, failed attempts so far)
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._thread = None
+        self.flushed_count = 0
+        self.failed_count = 0
+        self.dropped_count = 0
+
+    def add(self, item):
+        """
+        Queue an activity item for the next flush
+        Args:
+            item: activity table item (user_id, timestamp, action, data)
+        """
+        with self._lock:
+            self._items.append((item, 0))
+            pending = len(self._items)
+
+        if self.mode == 'background':
+            self._ensure_thread()
+            if pending >= self.max_items:
+                self._wakeup.set()
+
+    def flush(self):
+        """
+        Write all pending items with BatchWriteItem, 25 per request
+        Returns:
+            int: number of items written
+        """
+        with self._lock:
+            entries, self._items = self._items, []
+        if not entries:
+            return 0
+
+        # Same user + millisecond keys would be rejected as duplicates in one batch: keep the last
+        latest = {}
+        for item, attempts in entries:
+            latest[(item.get('user_id'), item.get('timestamp'))] = (item, attempts)
+        entries = list(latest.values())
+
+        table_name = db.activity_table.name
+        written = 0
+        retry = []
+        for start in range(0, len(entries), BATCH_SIZE):
+            chunk = entries[start:start + BATCH_SIZE]
+            try:
+                response = db.dynamodb.batch_write_item(RequestItems={
+                    table_name: [{'PutRequest': {'Item': item}} for item, _ in chunk]
+                })
+                unprocessed = response.get('UnprocessedItems', {}).get(table_name, [])
+                unprocessed_keys = {
+                    (request['PutRequest']['Item'].get('user_id'), request['PutRequest']['Item'].get('timestamp'))
+                    for request in unprocessed
+                }
+                failed = [(item, attempts) for item, attempts in chunk
+                          if (item.get('user_id'), item.get('timestamp')) in unprocessed_keys]
+            except Exception as e:
+                print(f"Error logging activity: {str(e)}")
+                failed = chunk
+            written += len(chunk) - len(failed)
+            retry.extend(failed)
+
+        self.flushed_count += written
+        if retry:
+            self._requeue(retry)
+        return written
+
+    def _requeue(self, entries):
+        """Put failed items back at the head of the queue, dropping those out of attempts"""
+        self.failed_count += len(entries)
+        keep = [(item, attempts + 1) for item, attempts in entries if attempts + 1 < self.max_attempts]
+        dropped = len(entries) - len(keep)
+        if dropped:
+            self.dropped_count += dropped
+            print(f"Dropped {dropped} activity items after {self.max_attempts} attempts")
+        with self._lock:
+            self._items[:0] = keep
+
+    def pending(self):
+        """Number of items waiting to be flushed"""
+        with self._lock:
+            return len(self._items)
+
+    def _ensure_thread(self):
+        if self._thread is not None and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name='activity-flush', daemon=True)
+                self._thread.start()
+
+    def _run(self):
+        while True:
+            self._wakeup.wait(self.max_wait)
+            self._wakeup.clear()
+            self.flush()
+
+
+_buffer = ActivityBuffer()
+atexit.register(_buffer.flush)
+
+
+def record(item):
+    """Queue an activity item"""
+    _buffer.add(item)
+
+
+def flush():
+    """Flush pending activity items synchronously"""
+    return _buffer.flush()
+
+
+def end_of_invocation():
+    """
+    Invocation hook called by lambda_handler once the response is built
+    Flushes in 'end_of_invocation' mode; background mode leaves it to the thread
+    """
+    if _buffer.mode == 'end_of_invocation':
+        _buffer.flush()
@@ -0,0 +1,166 @@
+"""
+AWS call accounting module
+Counts the DynamoDB/S3 round trips a request makes, with DynamoDB consumed
+capacity and request/response bytes, using botocore event hooks on the shared
+clients. lambda_handler attaches the per-request summary to the request's log
+record; test/call_budget.py uses the same recorder to assert round-trip budgets.
+"""
+import threading
+from contextvars import ContextVar
+
+from .config import Config
+
+_current_recorder = ContextVar('current_call_recorder', default=None)
+
+# DynamoDB operations that accept ReturnConsumedCapacity
+CAPACITY_OPERATIONS = frozenset([
+    'GetItem', 'PutItem', 'UpdateItem', 'DeleteItem', 'Query', 'Scan',
+    'BatchGetItem', 'BatchWriteItem', 'TransactGetItems', 'TransactWriteItems'
+])
+
+
+class CallRecorder:
+    """
+    Round trips, consumed capacity and bytes of one request
+    Calls are keyed '<service>.<Operation>', e.g. 'dynamodb.Query'.
+    """
+
+    def __init__(self):
+        self.calls = {}
+        self.capacity = {}
+        self.bytes_sent = 0
+        self.bytes_received = 0
+        self._lock = threading.Lock()
+
+    def record_call(self, service, operation, bytes_received=0, consumed_capacity=None):
+        """Record one completed API call"""
+        key = f"{service}.{operation}"
+        with self._lock:
+            self.calls[key] = self.calls.get(key, 0) + 1
+            self.bytes_received += bytes_received
+            if consumed_capacity:
+                # A dict for single-table operations, a list for batch/transact ones
+                if isinstance(consumed_capacity, dict):
+                    consumed_capacity = [consumed_capacity]
+                for entry in consumed_capacity:
+                    table = entry.get('TableName', 'unknown')
+                    self.capacity[table] = self.capacity.get(table, 0.0) + float(entry.get('CapacityUnits', 0))
+
+    def record_sent(self, size):
+        with self._lock:
+            self.bytes_sent += size
+
+    def total_calls(self, service=None, operation=None):
+        """
+        Number of recorded calls, optionally for one service and/or operation
+        Args:
+            service: e.g. 'dynamodb' or 's3'
+            operation: e.g. 'GetItem'
+        Returns:
+            int: call count
+        """
+        total = 0
+        for key, count in self.calls.items():
+            call_service, call_operation = key.split('.', 1)
+            if service is not None and call_service != service:
+                continue
+            if operation is not None and call_operation != operation:
+                continue
+            total += count
+        return total
+
+    def summary(self):
+        """
+        Returns:
+            dict: JSON-serializable per-request summary
+        """
+        with self._lock:
+            return {
+                'total': sum(self.calls.values()),
+                'calls': dict(self.calls),
+                'consumed_capacity': {table: round(units, 2) for table, units in self.capacity.items()},
+                'bytes_sent': self.bytes_sent,
+                'bytes_received': self.bytes_received
+            }
+
+
+def start_request():
+    """
+    Start recording calls for the current request
+    Returns:
+        CallRecorder, or None when ENABLE_CALL_ACCOUNTING is off
+    """
+    if not Config.ENABLE_CALL_ACCOUNTING:
+        return None
+    return start()
+
+
+def start():
+    """Start recording calls in this context regardless of configuration"""
+    recorder = CallRecorder()
+    _current_recorder.set(recorder)
+    return recorder
+
+
+def stop(recorder):
+    """
+    Stop recording
+    Args:
+        recorder: value returned by start()/start_request() (None is a no-op)
+    Returns:
+        dict: the recorder's summary, or None
+    """
+    if recorder is None:
+        return None
+    if _current_recorder.get() is recorder:
+        _current_recorder.set(None)
+    return recorder.summary()
+
+
+def current():
+    """The active recorder, or None"""
+    return _current_recorder.get()
+
+
+def _request_consumed_capacity(params, model, **kwargs):
+    if _current_recorder.get() is not None and model.name in CAPACITY_OPERATIONS:
+        params.setdefault('ReturnConsumedCapacity', 'TOTAL')
+
+
+def _count_request_bytes(request, **kwargs):
+    recorder = _current_recorder.get()
+    if recorder is None:
+        return None
+    body = request.body
+    if isinstance(body, (bytes, bytearray, str)):
+        recorder.record_sent(len(body))
+    return None
+
+
+def _count_call(http_response, parsed, model, **kwargs):
+    recorder = _current_recorder.get()
+    if recorder is None:
+        return
+    size = 0
+    if http_response is not None:
+        # Never touch .content here: it would drain streaming S3 bodies
+        size = int(http_response.headers.get('content-length') or 0)
+    recorder.record_call(
+        model.service_model.service_name,
+        model.name,
+        bytes_received=size,
+        consumed_capacity=(parsed or {}).get('ConsumedCapacity')
+    )
+
+
+def instrument_client(client):
+    """
+    Register the accounting hooks on a boto3 low-level client
+    Args:
+        client: boto3 client (e.g. dynamodb.meta.client or an S3 client)
+    """
+    events = client.meta.events
+    if client.meta.service_model.service_name == 'dynamodb':
+        events.register('provide-client-params.dynamodb.*', _request_consumed_capacity)
+    events.register('before-send.*.*', _count_request_bytes)
+    events.register('after-call.*.*', _count_call)
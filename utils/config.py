@@ -14,6 +14,9 @@ class Config:
     # JWT Configuration
     JWT_SECRET = os.getenv('JWT_SECRET')
     JWT_EXPIRY = int(os.getenv('JWT_EXPIRY', '7200'))  # 2 hours in seconds
+    AUTH_CACHE_SIZE = int(os.getenv('AUTH_CACHE_SIZE', '1024'))  # 0 disables the verified-token cache
+    AUTH_CACHE_TTL = int(os.getenv('AUTH_CACHE_TTL', '60'))  # staleness window in seconds
+    AUTH_TRUST_CLAIMS_ON_READ = os.getenv('AUTH_TRUST_CLAIMS_ON_READ', 'false').lower() == 'true'
     
     # DynamoDB Table Names
     USERS_TABLE = os.getenv('USERS_TABLE', 'MovieRecommender_Users')
@@ -21,9 +24,26 @@ class Config:
     ACTIVITY_TABLE = os.getenv('ACTIVITY_TABLE', 'MovieRecommender_Activity')
     REVIEWS_TABLE = os.getenv('REVIEWS_TABLE', 'Reviews')
     MOVIES_TABLE = os.getenv('MOVIES_TABLE', 'Movies')
+
+    # AWS SDK clients (shared by every module, see utils.database.get_client)
+    DYNAMODB_ENDPOINT_URL = os.getenv('DYNAMODB_ENDPOINT_URL') or None  # e.g. DynamoDB Local
+    S3_ENDPOINT_URL = os.getenv('S3_ENDPOINT_URL') or None  # e.g. MinIO / LocalStack
+    AWS_MAX_POOL_CONNECTIONS = int(os.getenv('AWS_MAX_POOL_CONNECTIONS', '64'))  # >= handler threads x fan-out
+    AWS_CONNECT_TIMEOUT = float(os.getenv('AWS_CONNECT_TIMEOUT', '2'))  # seconds
+    AWS_READ_TIMEOUT = float(os.getenv('AWS_READ_TIMEOUT', '10'))  # seconds per socket read
+    AWS_RETRY_MODE = os.getenv('AWS_RETRY_MODE', 'adaptive')  # legacy | standard | adaptive
+    AWS_MAX_ATTEMPTS = int(os.getenv('AWS_MAX_ATTEMPTS', '4'))  # including the first attempt
+    FANOUT_MAX_CONCURRENCY = int(os.getenv('FANOUT_MAX_CONCURRENCY', '16'))  # parallel reads per request (utils.fanout)
+    FANOUT_CALL_TIMEOUT = float(os.getenv('FANOUT_CALL_TIMEOUT', '5'))  # seconds per fanned-out call, 0 = none
       # S3 Configuration for Embeddings
     EMBEDDINGS_BUCKET = os.getenv('EMBEDDINGS_BUCKET', 'movieembeddings')
     EMBEDDINGS_OUTPUT_FILE = os.getenv('EMBEDDINGS_OUTPUT_FILE', 'embeddings.npz')
+    EMBEDDINGS_MANIFEST_FILE = os.getenv('EMBEDDINGS_MANIFEST_FILE', 'embeddings_manifest.json')
+    EMBEDDINGS_DELTA_PREFIX = os.getenv('EMBEDDINGS_DELTA_PREFIX', 'embeddings_deltas/')
+    EMBEDDINGS_CACHE_DIR = os.getenv('EMBEDDINGS_CACHE_DIR', '/tmp/embeddings_cache')
+    EMBEDDINGS_COMPACT_THRESHOLD = int(os.getenv('EMBEDDINGS_COMPACT_THRESHOLD', '20'))
+    EMBEDDINGS_REFRESH_SECONDS = int(os.getenv('EMBEDDINGS_REFRESH_SECONDS', '300'))  # 0 disables hot-reload
+    MOVIE_ATTRIBUTES_FILE = os.getenv('MOVIE_ATTRIBUTES_FILE', 'movie_attributes.npz')  # filter columns (utils.movie_attributes)
     
     # ML Model Configuration
     EMBEDDING_MODEL = os.getenv('EMBEDDING_MODEL', 'sentence-transformers/all-MiniLM-L6-v2')
@@ -32,18 +52,63 @@ class Config:
     MODEL_ONNX_FILE = os.getenv('MODEL_ONNX_FILE', 'model_onnx/model.onnx')
     MODEL_TOKENIZER_FILE = os.getenv('MODEL_TOKENIZER_FILE', 'model_onnx/tokenizer.json')
     
+    # ONNX Runtime Session Configuration
+    ONNX_INTRA_OP_THREADS = int(os.getenv('ONNX_INTRA_OP_THREADS', '0'))  # 0 = derive from available CPUs
+    ONNX_INTER_OP_THREADS = int(os.getenv('ONNX_INTER_OP_THREADS', '1'))
+    ONNX_GRAPH_OPTIMIZATION = os.getenv('ONNX_GRAPH_OPTIMIZATION', 'all')  # disabled, basic, extended, all
+    ONNX_EXECUTION_MODE = os.getenv('ONNX_EXECUTION_MODE', 'sequential')  # sequential, parallel
+    ONNX_ENABLE_CPU_MEM_ARENA = os.getenv('ONNX_ENABLE_CPU_MEM_ARENA', 'true').lower() == 'true'
+    ONNX_ENABLE_MEM_PATTERN = os.getenv('ONNX_ENABLE_MEM_PATTERN', 'true').lower() == 'true'
+    ONNX_ALLOW_SPINNING = os.getenv('ONNX_ALLOW_SPINNING', 'false').lower() == 'true'
+    ONNX_CACHE_DIR = os.getenv('ONNX_CACHE_DIR', '/tmp/onnx_cache')  # empty disables optimized-model caching
+    ONNX_SEQUENCE_BUCKETS = [int(b) for b in os.getenv('ONNX_SEQUENCE_BUCKETS', '16,32,64').split(',') if b]
+    
     # API Configuration
     MAX_RESULTS = int(os.getenv('MAX_RESULTS', '100'))
     DEFAULT_TOP_K = int(os.getenv('DEFAULT_TOP_K', '10'))
+    STATUS_MAX_MOVIES = int(os.getenv('STATUS_MAX_MOVIES', '500'))
+    STATUS_QUERY_THRESHOLD = int(os.getenv('STATUS_QUERY_THRESHOLD', '100'))  # above this, query the user's partitions instead
+    SEEN_CACHE_SIZE = int(os.getenv('SEEN_CACHE_SIZE', '1024'))  # users whose rated/favorited movies are cached, 0 disables
+    SEEN_CACHE_TTL = int(os.getenv('SEEN_CACHE_TTL', '300'))  # seconds; own writes invalidate immediately
+    PAGINATION_CACHE_SIZE = int(os.getenv('PAGINATION_CACHE_SIZE', '256'))  # ranked lists kept for page 2..n
+    PAGINATION_CACHE_TTL = int(os.getenv('PAGINATION_CACHE_TTL', '300'))
+    JSON_BACKEND = os.getenv('JSON_BACKEND', 'auto')  # auto (orjson if installed), json
+    ENABLE_COMPRESSION = os.getenv('ENABLE_COMPRESSION', 'true').lower() == 'true'
+    COMPRESSION_MIN_BYTES = int(os.getenv('COMPRESSION_MIN_BYTES', '1024'))
+    GZIP_LEVEL = int(os.getenv('GZIP_LEVEL', '6'))
+    BROTLI_QUALITY = int(os.getenv('BROTLI_QUALITY', '5'))
     
     # Feature Flags
     ENABLE_ACTIVITY_LOGGING = os.getenv('ENABLE_ACTIVITY_LOGGING', 'true').lower() == 'true'
+    # background (long-running servers) or end_of_invocation (Lambda freezes the process after each response)
+    ACTIVITY_FLUSH_MODE = os.getenv('ACTIVITY_FLUSH_MODE') or (
+        'end_of_invocation' if os.getenv('AWS_LAMBDA_FUNCTION_NAME') else 'background')
+    ACTIVITY_FLUSH_SIZE = int(os.getenv('ACTIVITY_FLUSH_SIZE', '25'))
+    ACTIVITY_FLUSH_INTERVAL = float(os.getenv('ACTIVITY_FLUSH_INTERVAL', '1.0'))  # seconds
+    ACTIVITY_FLUSH_MAX_ATTEMPTS = int(os.getenv('ACTIVITY_FLUSH_MAX_ATTEMPTS', '3'))  # flushes before a failed item is dropped
+    ACTIVITY_PAGE_SIZE = int(os.getenv('ACTIVITY_PAGE_SIZE', '50'))
+    ACTIVITY_MAX_PAGE_SIZE = int(os.getenv('ACTIVITY_MAX_PAGE_SIZE', '200'))
+    PURGE_MAX_ATTEMPTS = int(os.getenv('PURGE_MAX_ATTEMPTS', '8'))  # BatchWriteItem retries for unprocessed items
     DEBUG_MODE = os.getenv('DEBUG_MODE', 'false').lower() == 'true'
+    ENABLE_TRACING = os.getenv('ENABLE_TRACING', 'false').lower() == 'true'  # per-stage EMF log line per request
+    ENABLE_SERVER_TIMING = os.getenv('ENABLE_SERVER_TIMING', 'false').lower() == 'true'
+    METRICS_NAMESPACE = os.getenv('METRICS_NAMESPACE', 'MovieRecommender')
+    ENABLE_CALL_ACCOUNTING = os.getenv('ENABLE_CALL_ACCOUNTING', 'false').lower() == 'true'  # DynamoDB/S3 calls per request
+
+    # Local serving modes (local_server.py, async_server.py)
+    SERVER_HOST = os.getenv('SERVER_HOST', '127.0.0.1')
+    SERVER_PORT = int(os.getenv('SERVER_PORT', '8000'))
+    SERVER_WORKERS = int(os.getenv('SERVER_WORKERS', '0'))  # 0 = one per CPU
+    SERVER_HANDLER_THREADS = int(os.getenv('SERVER_HANDLER_THREADS', '64'))  # async_server.py handler pool
+    BATCH_MAX_SIZE = int(os.getenv('BATCH_MAX_SIZE', '16'))  # semantic queries per ONNX call
+    BATCH_MAX_WAIT_MS = float(os.getenv('BATCH_MAX_WAIT_MS', '5'))  # added latency bound while a batch fills
+    ENABLE_COALESCING = os.getenv('ENABLE_COALESCING', 'true').lower() == 'true'  # share identical in-flight lookups
     
     # CORS Configuration
     ALLOWED_ORIGINS = os.getenv('ALLOWED_ORIGINS', '*')
     ALLOWED_METHODS = os.getenv('ALLOWED_METHODS', 'GET,POST,PUT,DELETE,OPTIONS')
     ALLOWED_HEADERS = os.getenv('ALLOWED_HEADERS', 'Content-Type,Authorization')
+    EXPOSED_HEADERS = os.getenv('EXPOSED_HEADERS', 'X-Embeddings-Version,X-Next-Cursor')
     
     @classmethod
     def validate_required_config(cls):
@@ -76,6 +141,7 @@ class Config:
             'Access-Control-Allow-Origin': cls.ALLOWED_ORIGINS,
             'Access-Control-Allow-Headers': cls.ALLOWED_HEADERS,
             'Access-Control-Allow-Methods': cls.ALLOWED_METHODS,
+            'Access-Control-Expose-Headers': cls.EXPOSED_HEADERS,
             'Content-Type': 'application/json'
         }
     
@@ -91,6 +157,7 @@ class Config:
             print(f"Activity Table: {cls.ACTIVITY_TABLE}")
             print(f"Embeddings Bucket: {cls.EMBEDDINGS_BUCKET}")
             print(f"Embedding Model: {cls.EMBEDDING_MODEL}")
+            print(f"ONNX Threads (intra/inter): {cls.ONNX_INTRA_OP_THREADS or 'auto'}/{cls.ONNX_INTER_OP_THREADS}")
             print(f"Max Results: {cls.MAX_RESULTS}")
             print(f"Activity Logging: {cls.ENABLE_ACTIVITY_LOGGING}")
             print("============================")
@@ -1,14 +1,127 @@
 """
 Database connection and table management module
-Provides centralized access to DynamoDB tables using shared configuration
+Provides centralized access to DynamoDB tables using shared configuration,
+and the process-wide AWS client factory every module goes through
 """
+import threading
+import time
 import boto3
+from botocore.config import Config as BotocoreConfig
 from .config import Config
+from . import tracing
+from . import call_accounting
+
+_session = None
+_clients = {}
+_resources = {}
+_factory_lock = threading.Lock()
+
+# Services served through a boto3 resource: get_client returns the resource's
+# client so both share one connection pool
+RESOURCE_SERVICES = ('dynamodb',)
+
+BATCH_GET_LIMIT = 100  # BatchGetItem keys per request
+BATCH_GET_MAX_ATTEMPTS = 5
+
+
+def client_config():
+    """
+    Tuned botocore configuration shared by every client
+    Returns:
+        botocore.config.Config: pool size, keep-alive, timeouts and retry mode from Config
+    """
+    return BotocoreConfig(
+        max_pool_connections=Config.AWS_MAX_POOL_CONNECTIONS,
+        tcp_keepalive=True,
+        connect_timeout=Config.AWS_CONNECT_TIMEOUT,
+        read_timeout=Config.AWS_READ_TIMEOUT,
+        retries={'mode': Config.AWS_RETRY_MODE, 'total_max_attempts': Config.AWS_MAX_ATTEMPTS}
+    )
+
+
+def endpoint_url(service_name):
+    """Configured endpoint override for a service (None = the AWS default)"""
+    return {
+        'dynamodb': Config.DYNAMODB_ENDPOINT_URL,
+        's3': Config.S3_ENDPOINT_URL
+    }.get(service_name)
+
+
+def _get_session():
+    # The default boto3 session is not safe to create clients from concurrently
+    global _session
+    if _session is None:
+        _session = boto3.session.Session()
+    return _session
+
+
+def get_resource(service_name):
+    """
+    Get the shared, instrumented boto3 resource for a service
+    Args:
+        service_name: e.g. 'dynamodb'
+    Returns:
+        boto3 service resource
+    """
+    resource = _resources.get(service_name)
+    if resource is None:
+        with _factory_lock:
+            resource = _resources.get(service_name)
+            if resource is None:
+                resource = _get_session().resource(
+                    service_name, config=client_config(), endpoint_url=endpoint_url(service_name))
+                instrument_client(resource.meta.client)
+                _resources[service_name] = resource
+    return resource
+
+
+def get_client(service_name):
+    """
+    Get the shared, instrumented boto3 client for a service
+    Args:
+        service_name: e.g. 's3', 'dynamodb'
+    Returns:
+        boto3 low-level client
+    """
+    if service_name in RESOURCE_SERVICES:
+        return get_resource(service_name).meta.client
+    client = _clients.get(service_name)
+    if client is None:
+        with _factory_lock:
+            client = _clients.get(service_name)
+            if client is None:
+                client = _get_session().client(
+                    service_name, config=client_config(), endpoint_url=endpoint_url(service_name))
+                instrument_client(client)
+                _clients[service_name] = client
+    return client
+
 
-# Initialize DynamoDB resource
 def get_dynamodb_resource():
     """Get DynamoDB resource with proper configuration"""
-    return boto3.resource('dynamodb')
+    return get_resource('dynamodb')
+
+def _start_call_timer(context, **kwargs):
+    if tracing.current() is not None:
+        context['trace_start'] = time.perf_counter()
+
+def _stop_call_timer(model, context, **kwargs):
+    start = context.get('trace_start')
+    trace = tracing.current()
+    if start is not None and trace is not None:
+        trace.add(f"{model.service_model.service_name}.{model.name}", (time.perf_counter() - start) * 1000)
+
+def instrument_client(client):
+    """
+    Time every API call of a boto3 client as a '<service>.<Operation>' stage
+    of the active request trace (see utils.tracing) and count it in the
+    request's call accounting (see utils.call_accounting)
+    Args:
+        client: boto3 low-level client
+    """
+    client.meta.events.register('before-call.*.*', _start_call_timer)
+    client.meta.events.register('after-call.*.*', _stop_call_timer)
+    call_accounting.instrument_client(client)
 
 # Initialize DynamoDB resource
 dynamodb = get_dynamodb_resource()
@@ -39,6 +152,33 @@ def get_table(table_name):
     """
     return TABLES.get(table_name.lower())
 
+def batch_get_items(table, keys, **projection):
+    """
+    Read items by primary key with BatchGetItem, 100 keys per request
+    Unprocessed keys are retried with backoff, duplicate keys are read once.
+    Args:
+        table: DynamoDB table resource
+        keys: list of primary key dicts
+        projection: optional ProjectionExpression / ExpressionAttributeNames
+    Returns:
+        list: the items found, in no particular order
+    """
+    unique = list({tuple(sorted(key.items())): key for key in keys}.values())
+    items = []
+    for start in range(0, len(unique), BATCH_GET_LIMIT):
+        request_items = {table.name: {'Keys': unique[start:start + BATCH_GET_LIMIT], **projection}}
+        attempt = 0
+        while request_items:
+            if attempt:
+                time.sleep(min(0.05 * (2 ** attempt), 1.0))
+            attempt += 1
+            response = dynamodb.batch_get_item(RequestItems=request_items)
+            items.extend(response.get('Responses', {}).get(table.name, []))
+            request_items = response.get('UnprocessedKeys') or {}
+            if request_items and attempt >= BATCH_GET_MAX_ATTEMPTS:
+                raise RuntimeError('BatchGetItem left unprocessed keys')
+    return items
+
 def health_check():
     """
     Perform basic health check on database connections
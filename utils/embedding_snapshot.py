@@ -0,0 +1,203 @@
+"""
+Versioned embedding snapshots with background hot-reload
+Keeps the active embeddings behind a single reference that a background thread
+replaces when a new version is published to S3
+"""
+import json
+import threading
+import time
+from collections.abc import Mapping
+
+import numpy as np
+
+from .config import Config
+from . import embedding_store
+
+
+class MatrixEmbeddings(Mapping):
+    """
+    Read-only movie_id -> embedding mapping backed by one (N, dim) matrix
+    Values are row views, so the matrix can live in memory the process does
+    not own (e.g. a multiprocessing.shared_memory block) without copies.
+    """
+
+    def __init__(self, ids, matrix, buffer_owner=None):
+        if len(ids) != matrix.shape[0]:
+            raise ValueError(f"{len(ids)} ids for {matrix.shape[0]} embedding rows")
+        self.ids = ids
+        self.matrix = matrix
+        # Keeps the memory behind matrix mapped for as long as this mapping lives
+        self.buffer_owner = buffer_owner
+        self._index = {movie_id: i for i, movie_id in enumerate(ids)}
+
+    @classmethod
+    def from_dict(cls, embeddings):
+        """
+        Pack a movie_id -> embedding dict into one contiguous float32 matrix
+        """
+        ids = list(embeddings)
+        matrix = np.empty((len(ids), len(embeddings[ids[0]]) if ids else 0), dtype=np.float32)
+        for i, movie_id in enumerate(ids):
+            matrix[i] = embeddings[movie_id]
+        return cls(ids, matrix)
+
+    def index_of(self, movie_id):
+        """Row of movie_id in the matrix, or None"""
+        return self._index.get(movie_id)
+
+    def __getitem__(self, movie_id):
+        return self.matrix[self._index[movie_id]]
+
+    def __contains__(self, movie_id):
+        return movie_id in self._index
+
+    def __iter__(self):
+        return iter(self.ids)
+
+    def __len__(self):
+        return len(self.ids)
+
+
+class EmbeddingSnapshot:
+    """
+    Immutable view of one published embeddings version
+    Request code grabs one snapshot reference and uses it for the whole request;
+    once a newer snapshot is swapped in, the old one is freed as soon as the last
+    in-flight request drops its reference.
+    """
+
+    def __init__(self, embeddings, version):
+        self.embeddings = embeddings
+        self.version = version
+        self.loaded_at = time.time()
+        self._matrix_view = None
+        self._matrix_embeddings = None
+
+    def __len__(self):
+        return len(self.embeddings)
+
+    def matrix_view(self):
+        """
+        Matrix form of the embeddings for vectorized scoring
+        Built once per snapshot (free when embeddings is a MatrixEmbeddings).
+        Returns:
+            tuple: (ids list, (N, dim) float32 matrix, (N,) inverse row norms,
+                    0 for zero rows)
+        """
+        view = self._matrix_view
+        if view is None:
+            embeddings = self.embeddings
+            if not isinstance(embeddings, MatrixEmbeddings):
+                embeddings = MatrixEmbeddings.from_dict(embeddings)
+            norms = np.linalg.norm(embeddings.matrix, axis=1)
+            inverse_norms = np.divide(1.0, norms, out=np.zeros_like(norms), where=norms != 0)
+            self._matrix_embeddings = embeddings
+            view = self._matrix_view = (embeddings.ids, embeddings.matrix, inverse_norms)
+        return view
+
+    def index_of(self, movie_id):
+        """Row of movie_id in matrix_view(), or None"""
+        self.matrix_view()
+        return self._matrix_embeddings.index_of(movie_id)
+
+
+class SnapshotHolder:
+    """
+    Holds the active EmbeddingSnapshot and refreshes it off the request path
+    """
+
+    def __init__(self, s3_client_factory, refresh_interval=None):
+        self._s3_client_factory = s3_client_factory
+        self._refresh_interval = Config.EMBEDDINGS_REFRESH_SECONDS if refresh_interval is None else refresh_interval
+        self._snapshot = None
+        self._load_lock = threading.Lock()
+        self._thread = None
+        self._stop = threading.Event()
+        self.reload_count = 0
+        self.last_check_at = None
+        self.last_error = None
+
+    def get(self):
+        """
+        Return the active snapshot, loading it synchronously on first use
+        """
+        snapshot = self._snapshot
+        if snapshot is None:
+            with self._load_lock:
+                if self._snapshot is None:
+                    self._snapshot = self._load()
+                snapshot = self._snapshot
+            self.start()
+        return snapshot
+
+    def set(self, snapshot):
+        """
+        Install a snapshot loaded elsewhere (e.g. attached from shared memory)
+        """
+        with self._load_lock:
+            self._snapshot = snapshot
+            Config._embeddings = snapshot.embeddings
+
+    def refresh(self):
+        """
+        Reload the embeddings if the published version differs from the active one
+        Returns:
+            bool: True if a new snapshot was swapped in
+        """
+        with self._load_lock:
+            s3 = self._s3_client_factory()
+            self.last_check_at = time.time()
+            version = embedding_store.get_version(s3)
+            current = self._snapshot
+            if current is not None and version == current.version:
+                return False
+
+            snapshot = self._load()
+            # Single reference assignment: requests see either the old or the new snapshot
+            self._snapshot = snapshot
+            self.reload_count += 1
+            previous_version = current.version if current is not None else None
+            print(f"Swapped embeddings snapshot {previous_version} -> {snapshot.version} ({len(snapshot)} movies)")
+            print(json.dumps(self.metrics()))
+            return True
+
+    def start(self):
+        """Start the background refresh thread if enabled and not already running"""
+        if self._refresh_interval <= 0 or (self._thread is not None and self._thread.is_alive()):
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name='embeddings-refresh', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """Stop the background refresh thread"""
+        self._stop.set()
+
+    def metrics(self):
+        """
+        Non-sensitive snapshot state for logs and health responses
+        """
+        snapshot = self._snapshot
+        return {
+            'embeddings_version': snapshot.version if snapshot is not None else None,
+            'embeddings_count': len(snapshot) if snapshot is not None else 0,
+            'embeddings_loaded_at': int(snapshot.loaded_at) if snapshot is not None else None,
+            'embeddings_reload_count': self.reload_count,
+            'embeddings_last_error': self.last_error
+        }
+
+    def _load(self):
+        embeddings, version = embedding_store.load_embeddings(self._s3_client_factory())
+        embeddings = MatrixEmbeddings.from_dict(embeddings)
+        Config._embeddings = embeddings
+        return EmbeddingSnapshot(embeddings, version)
+
+    def _run(self):
+        while not self._stop.wait(self._refresh_interval):
+            try:
+                self.refresh()
+                self.last_error = None
+            except Exception as e:
+                # Keep serving the current snapshot; try again on the next tick
+                self.last_error = str(e)
+                print(f"Error refreshing embeddings snapshot: {str(e)}")
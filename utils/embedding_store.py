@@ -0,0 +1,394 @@
+"""
+Embedding artifact storage module
+Loads movie embeddings as a base snapshot plus append-only delta segments,
+caching the base locally so containers don't re-download the full archive
+"""
+import io
+import json
+import os
+import time
+import numpy as np
+from botocore.exceptions import ClientError
+
+from .config import Config
+
+EMBEDDING_DIM = 384
+MISSING_KEY_CODES = ('404', 'NoSuchKey', 'NotFound')
+MIN_RETIRE_AGE = 300  # seconds a superseded object is kept, at least (see compact)
+
+# Manifest layout stored at Config.EMBEDDINGS_MANIFEST_FILE:
+# {
+#     "base": {"key": "embeddings.npz", "seq": 0},
+#     "segments": [{"key": "embeddings_deltas/00000001.npz", "seq": 1}, ...],
+#     "retired": [{"key": "embeddings_deltas/00000001.npz", "retired_at": 1700000000}, ...]
+# }
+# Each segment is a .npz with an 'upserts' array in the same (N, 385) layout as
+# the base archive and a 'deletes' array of movie ids. Segments are applied in
+# sequence order, so replaying an already-applied segment is harmless.
+# compact() writes each new base under its own key and lists the objects it
+# supersedes as "retired"; they are deleted by a later compaction once no
+# container can still be loading from the manifest that referenced them.
+
+
+def parse_embeddings_array(arr):
+    """
+    Convert a (N, 385) array into a movie_id -> embedding dict
+    Args:
+        arr: numpy array with the first 384 columns holding the embedding and
+             the last column holding the movie_id
+    Returns:
+        dict: movie_id -> float32 embedding (rows of one contiguous matrix)
+    """
+    if arr.ndim != 2 or arr.shape[1] != EMBEDDING_DIM + 1:
+        raise ValueError(f"Unexpected array shape or format in .npz: {arr.shape}")
+
+    matrix = np.ascontiguousarray(arr[:, :-1].astype(np.float32))
+    embeddings_dict = {}
+    for i, movie_id in enumerate(arr[:, -1]):
+        if isinstance(movie_id, bytes):
+            movie_id = movie_id.decode('utf-8')
+        embeddings_dict[str(movie_id)] = matrix[i]
+
+    return embeddings_dict
+
+
+def build_embeddings_array(embeddings):
+    """
+    Inverse of parse_embeddings_array
+    Args:
+        embeddings: dict movie_id -> embedding
+    Returns:
+        numpy object array of shape (N, 385)
+    """
+    arr = np.empty((len(embeddings), EMBEDDING_DIM + 1), dtype=object)
+    for i, (movie_id, embedding) in enumerate(embeddings.items()):
+        arr[i, :-1] = np.asarray(embedding, dtype=np.float32)
+        arr[i, -1] = str(movie_id)
+    return arr
+
+
+def read_npz(content):
+    """
+    Open a .npz archive from raw bytes
+    Args:
+        content: bytes of the archive
+    Returns:
+        NpzFile: loaded archive
+    """
+    return np.load(io.BytesIO(content), allow_pickle=True)
+
+
+def write_npz(**arrays):
+    """
+    Serialize arrays into a compressed .npz archive
+    Returns:
+        bytes: archive content
+    """
+    buffer = io.BytesIO()
+    np.savez_compressed(buffer, **arrays)
+    return buffer.getvalue()
+
+
+def load_base_archive(content):
+    """
+    Parse a base snapshot archive into an embeddings dict
+    Args:
+        content: bytes of the .npz archive
+    Returns:
+        dict: movie_id -> embedding
+    """
+    npzfile = read_npz(content)
+    array_names = npzfile.files
+    if not array_names:
+        raise ValueError("No arrays found in .npz file")
+    arr = npzfile[array_names[0]]
+    print(f"Loaded array '{array_names[0]}' with shape {arr.shape} and dtype {arr.dtype}")
+    return parse_embeddings_array(arr)
+
+
+def apply_segment(embeddings, content):
+    """
+    Apply one delta segment to an embeddings dict in place
+    Args:
+        embeddings: dict movie_id -> embedding
+        content: bytes of the segment .npz archive
+    Returns:
+        tuple: (upserted_count, deleted_count)
+    """
+    npzfile = read_npz(content)
+    upserts = npzfile['upserts'] if 'upserts' in npzfile.files else None
+    deletes = npzfile['deletes'] if 'deletes' in npzfile.files else None
+
+    upserted = 0
+    if upserts is not None and len(upserts):
+        updates = parse_embeddings_array(upserts)
+        embeddings.update(updates)
+        upserted = len(updates)
+
+    deleted = 0
+    if deletes is not None:
+        for movie_id in deletes:
+            if isinstance(movie_id, bytes):
+                movie_id = movie_id.decode('utf-8')
+            if embeddings.pop(str(movie_id), None) is not None:
+                deleted += 1
+
+    return upserted, deleted
+
+
+def get_manifest(s3):
+    """
+    Read the embeddings manifest from S3
+    Falls back to a base-only manifest for buckets holding a single archive
+    Args:
+        s3: boto3 S3 client
+    Returns:
+        tuple: (manifest dict, manifest ETag or None)
+    """
+    try:
+        obj = s3.get_object(Bucket=Config.EMBEDDINGS_BUCKET, Key=Config.EMBEDDINGS_MANIFEST_FILE)
+    except ClientError as e:
+        if not is_missing_object(e):
+            raise
+        return {'base': {'key': Config.EMBEDDINGS_OUTPUT_FILE, 'seq': 0}, 'segments': []}, None
+
+    manifest = json.loads(obj['Body'].read())
+    manifest.setdefault('segments', [])
+    return manifest, obj.get('ETag')
+
+
+def get_version(s3):
+    """
+    Cheap version probe for the published embeddings
+    Args:
+        s3: boto3 S3 client
+    Returns:
+        str: ETag of the manifest, or of the base archive when there is no manifest
+    """
+    try:
+        head = s3.head_object(Bucket=Config.EMBEDDINGS_BUCKET, Key=Config.EMBEDDINGS_MANIFEST_FILE)
+        return _normalize_etag(head.get('ETag'))
+    except ClientError as e:
+        if not is_missing_object(e):
+            raise
+    try:
+        head = s3.head_object(Bucket=Config.EMBEDDINGS_BUCKET, Key=Config.EMBEDDINGS_OUTPUT_FILE)
+        return _normalize_etag(head.get('ETag'))
+    except ClientError as e:
+        if e.response.get('Error', {}).get('Code') not in MISSING_KEY_CODES:
+            raise
+    return None
+
+
+def is_missing_object(error):
+    """
+    Whether an S3 ClientError means the object does not exist
+    Without s3:ListBucket, S3 answers 403 AccessDenied instead of 404 for a
+    missing key, so that counts as missing too (e.g. no manifest in a legacy
+    single-archive bucket)
+    """
+    return error.response.get('Error', {}).get('Code') in MISSING_KEY_CODES + ('AccessDenied', '403', 'Forbidden')
+
+
+def _normalize_etag(etag):
+    return etag.strip('"') if etag else etag
+
+
+def put_manifest(s3, manifest):
+    """Write the embeddings manifest to S3"""
+    s3.put_object(
+        Bucket=Config.EMBEDDINGS_BUCKET,
+        Key=Config.EMBEDDINGS_MANIFEST_FILE,
+        Body=json.dumps(manifest).encode('utf-8'),
+        ContentType='application/json'
+    )
+
+
+def _cache_paths():
+    cache_dir = Config.EMBEDDINGS_CACHE_DIR
+    return os.path.join(cache_dir, 'base.npz'), os.path.join(cache_dir, 'base.json')
+
+
+def _read_cached_base(base_key, base_etag):
+    """
+    Return (embeddings, seq) from the local cache if it matches the S3 base
+    """
+    archive_path, meta_path = _cache_paths()
+    try:
+        with open(meta_path, 'r', encoding='utf-8') as f:
+            meta = json.load(f)
+        if meta.get('key') != base_key or meta.get('etag') != base_etag:
+            return None, 0
+        with open(archive_path, 'rb') as f:
+            embeddings = load_base_archive(f.read())
+        return embeddings, int(meta.get('seq', 0))
+    except (OSError, ValueError) as e:
+        if Config.DEBUG_MODE:
+            print(f"Embeddings cache miss: {str(e)}")
+        return None, 0
+
+
+def _write_cached_base(embeddings, base_key, base_etag, seq, content=None):
+    """
+    Store a base snapshot (optionally already compacted up to seq) in the local cache
+    """
+    archive_path, meta_path = _cache_paths()
+    try:
+        os.makedirs(Config.EMBEDDINGS_CACHE_DIR, exist_ok=True)
+        if content is None:
+            content = write_npz(embeddings=build_embeddings_array(embeddings))
+        tmp_path = archive_path + '.tmp'
+        with open(tmp_path, 'wb') as f:
+            f.write(content)
+        os.replace(tmp_path, archive_path)
+        with open(meta_path, 'w', encoding='utf-8') as f:
+            json.dump({'key': base_key, 'etag': base_etag, 'seq': seq}, f)
+    except OSError as e:
+        print(f"Warning: Could not write embeddings cache: {str(e)}")
+
+
+def load_embeddings(s3):
+    """
+    Load embeddings as base snapshot + delta segments
+    The base archive is downloaded only when the locally cached copy is missing
+    or stale; segments newer than the cached sequence number are applied on top.
+    When too many segments pile up the merged result is written back to the
+    local cache so the next load starts from the compacted snapshot.
+    Args:
+        s3: boto3 S3 client
+    Returns:
+        tuple: (dict movie_id -> embedding, version string as in get_version)
+    """
+    manifest, manifest_etag = get_manifest(s3)
+    base = manifest['base']
+    base_key = base['key']
+
+    if not base_key.endswith('.npz'):
+        raise ValueError(f"Unsupported embeddings format: {base_key}")
+
+    head = s3.head_object(Bucket=Config.EMBEDDINGS_BUCKET, Key=base_key)
+    base_etag = head.get('ETag')
+
+    embeddings, applied_seq = _read_cached_base(base_key, base_etag)
+    if embeddings is None:
+        print(f"Loading embeddings from s3://{Config.EMBEDDINGS_BUCKET}/{base_key}")
+        obj = s3.get_object(Bucket=Config.EMBEDDINGS_BUCKET, Key=base_key)
+        content = obj['Body'].read()
+        print(f"File size: {len(content)} bytes")
+        embeddings = load_base_archive(content)
+        applied_seq = int(base.get('seq', 0))
+        _write_cached_base(embeddings, base_key, base_etag, applied_seq, content=content)
+    else:
+        print(f"Loaded cached embeddings base {base_key} at seq {applied_seq}")
+
+    pending = sorted(
+        (segment for segment in manifest['segments'] if int(segment['seq']) > applied_seq),
+        key=lambda segment: int(segment['seq'])
+    )
+    for segment in pending:
+        obj = s3.get_object(Bucket=Config.EMBEDDINGS_BUCKET, Key=segment['key'])
+        upserted, deleted = apply_segment(embeddings, obj['Body'].read())
+        applied_seq = int(segment['seq'])
+        print(f"Applied embeddings delta {segment['key']}: {upserted} upserted, {deleted} deleted")
+
+    if len(pending) >= Config.EMBEDDINGS_COMPACT_THRESHOLD:
+        print(f"Compacting {len(pending)} embeddings deltas into local cache")
+        _write_cached_base(embeddings, base_key, base_etag, applied_seq)
+
+    return embeddings, _normalize_etag(manifest_etag or base_etag)
+
+
+def publish_delta(s3, upserts=None, deletes=None):
+    """
+    Append a delta segment with added/updated and deleted movie vectors
+    Assumes a single writer: concurrent publishers may overwrite each other's
+    manifest update.
+    Args:
+        s3: boto3 S3 client
+        upserts: dict movie_id -> embedding of added or updated movies
+        deletes: iterable of movie ids to remove
+    Returns:
+        int: sequence number of the new segment
+    """
+    manifest, _ = get_manifest(s3)
+    segments = manifest['segments']
+    last_seq = max([int(manifest['base'].get('seq', 0))] + [int(s['seq']) for s in segments])
+    seq = last_seq + 1
+
+    content = write_npz(
+        upserts=build_embeddings_array(upserts or {}),
+        deletes=np.array([str(mid) for mid in (deletes or [])], dtype=object),
+        seq=np.array(seq)
+    )
+    key = f"{Config.EMBEDDINGS_DELTA_PREFIX}{seq:08d}.npz"
+    s3.put_object(Bucket=Config.EMBEDDINGS_BUCKET, Key=key, Body=content)
+
+    segments.append({'key': key, 'seq': seq})
+    put_manifest(s3, manifest)
+    print(f"Published embeddings delta {key} (seq {seq})")
+    return seq
+
+
+def compact(s3):
+    """
+    Merge the base snapshot and all delta segments into a new base archive
+    The merged archive is written under a new key and the manifest is swapped to
+    it with an empty segment list in one put. The previous base and segments
+    stay in place, listed as retired, because a container that read the old
+    manifest moments earlier may still be downloading them; retired objects
+    older than the refresh interval (at least MIN_RETIRE_AGE) are deleted here.
+    Args:
+        s3: boto3 S3 client
+    Returns:
+        int: sequence number the new base is current up to
+    """
+    manifest, _ = get_manifest(s3)
+    base_key = manifest['base']['key']
+    seq = int(manifest['base'].get('seq', 0))
+    retired = _purge_retired(s3, manifest.get('retired', []))
+
+    segments = sorted(manifest['segments'], key=lambda segment: int(segment['seq']))
+    if not segments:
+        if retired != manifest.get('retired', []):
+            put_manifest(s3, {'base': manifest['base'], 'segments': [], 'retired': retired})
+        print(f"No embeddings deltas to compact ({base_key}, seq {seq})")
+        return seq
+
+    obj = s3.get_object(Bucket=Config.EMBEDDINGS_BUCKET, Key=base_key)
+    embeddings = load_base_archive(obj['Body'].read())
+    for segment in segments:
+        seg_obj = s3.get_object(Bucket=Config.EMBEDDINGS_BUCKET, Key=segment['key'])
+        apply_segment(embeddings, seg_obj['Body'].read())
+        seq = int(segment['seq'])
+
+    new_base_key = f"{os.path.splitext(Config.EMBEDDINGS_OUTPUT_FILE)[0]}.{seq:08d}.npz"
+    content = write_npz(embeddings=build_embeddings_array(embeddings))
+    s3.put_object(Bucket=Config.EMBEDDINGS_BUCKET, Key=new_base_key, Body=content)
+
+    now = int(time.time())
+    superseded = [segment['key'] for segment in segments]
+    if base_key != Config.EMBEDDINGS_OUTPUT_FILE:
+        superseded.append(base_key)  # the original archive is never deleted
+    retired += [{'key': key, 'retired_at': now} for key in superseded]
+    put_manifest(s3, {'base': {'key': new_base_key, 'seq': seq}, 'segments': [], 'retired': retired})
+
+    print(f"Compacted {len(segments)} embeddings deltas into {new_base_key} (seq {seq}, {len(embeddings)} movies)")
+    return seq
+
+
+def _purge_retired(s3, retired):
+    """
+    Delete retired objects old enough that no load can still reference them
+    Returns:
+        list: the retired entries that were kept
+    """
+    min_age = max(Config.EMBEDDINGS_REFRESH_SECONDS, MIN_RETIRE_AGE)
+    now = time.time()
+    kept = []
+    for entry in retired:
+        if now - int(entry.get('retired_at', now)) < min_age:
+            kept.append(entry)
+            continue
+        s3.delete_object(Bucket=Config.EMBEDDINGS_BUCKET, Key=entry['key'])
+        print(f"Deleted retired embeddings object {entry['key']}")
+    return kept
@@ -0,0 +1,120 @@
+"""
+Concurrent fan-out for independent I/O calls within one request
+Handlers hand a list of independent calls (typically DynamoDB reads) to
+gather() instead of running them one after another, so a request waits for
+roughly the slowest round-trip instead of their sum. Calls run on a
+process-wide thread pool, at most max_concurrency at a time per gather(), each
+in a copy of the caller's context so it is traced and accounted to the request.
+"""
+import contextvars
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+from .config import Config
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+class FanoutTimeout(TimeoutError):
+    """A fanned-out call did not finish within its timeout"""
+
+
+def get_executor():
+    """
+    Process-wide fan-out pool, sized to the AWS connection pool so threads
+    never queue for a connection
+    """
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(max_workers=Config.AWS_MAX_POOL_CONNECTIONS,
+                                               thread_name_prefix='fanout')
+    return _executor
+
+
+def gather(calls, max_concurrency=None, timeout=None, return_exceptions=False):
+    """
+    Run independent zero-argument calls concurrently
+    Args:
+        calls: list of callables
+        max_concurrency: most calls in flight at once (default FANOUT_MAX_CONCURRENCY)
+        timeout: seconds each call may take once started (default FANOUT_CALL_TIMEOUT, 0 = none)
+        return_exceptions: put exceptions in the result list instead of raising the first one
+    Returns:
+        list: results in the order of calls
+    Raises:
+        FanoutTimeout, or the first exception raised by a call, unless return_exceptions
+    """
+    calls = list(calls)
+    max_concurrency = max(1, Config.FANOUT_MAX_CONCURRENCY if max_concurrency is None else max_concurrency)
+    timeout = Config.FANOUT_CALL_TIMEOUT if timeout is None else timeout
+    results = [None] * len(calls)
+
+    if len(calls) <= 1:
+        # Nothing to overlap: run inline, bounded by the client timeouts only
+        for i, call in enumerate(calls):
+            try:
+                results[i] = call()
+            except Exception as e:
+                if not return_exceptions:
+                    raise
+                results[i] = e
+        return results
+
+    executor = get_executor()
+    next_call = 0
+    running = {}  # future -> index
+    started = {}  # index -> monotonic start, set on the pool thread (queueing is not timed)
+
+    def run(i, call):
+        started[i] = time.monotonic()
+        return call()
+
+    def submit():
+        nonlocal next_call
+        while next_call < len(calls) and len(running) < max_concurrency:
+            context = contextvars.copy_context()
+            running[executor.submit(context.run, run, next_call, calls[next_call])] = next_call
+            next_call += 1
+
+    submit()
+    while running:
+        wait_for = None
+        if timeout:
+            now = time.monotonic()
+            deadlines = [started[i] + timeout for i in running.values() if i in started]
+            # Calls still queued for a pool thread get their deadline once started
+            wait_for = max(0.0, min(deadlines + [now + timeout]) - now)
+        done, _ = wait(list(running), timeout=wait_for, return_when=FIRST_COMPLETED)
+
+        now = time.monotonic()
+        for future, i in list(running.items()):
+            if future in done:
+                del running[future]
+                error = future.exception()
+                if error is None:
+                    results[i] = future.result()
+                    continue
+            elif timeout and i in started and now - started[i] >= timeout:
+                # The call keeps its pool thread until botocore's own timeouts end it
+                del running[future]
+                error = FanoutTimeout(f"call {i} did not finish within {timeout}s")
+            else:
+                continue
+            if not return_exceptions:
+                raise error
+            results[i] = error
+        submit()
+    return results
+
+
+def map_calls(fn, items, **kwargs):
+    """
+    gather() fn(item) for every item
+    Returns:
+        list: fn(item) results in item order
+    """
+    return gather([lambda item=item: fn(item) for item in items], **kwargs)
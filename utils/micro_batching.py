@@ -0,0 +1,98 @@
+"""
+Dynamic micro-batching module
+Requests submitted from many threads (or asyncio tasks) are queued; a single
+worker thread takes the first waiting request, collects more for up to
+max_wait_ms or until max_batch_size, processes them with one call and hands
+each caller its own result.
+"""
+import asyncio
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+from .config import Config
+
+
+class MicroBatcher:
+    """
+    Collects concurrent requests into batches for one processing thread
+    process_batch receives a list of items and must return one result per item,
+    in order. An exception fails every request of the batch.
+    """
+
+    def __init__(self, process_batch, max_batch_size=None, max_wait_ms=None, name='micro-batcher'):
+        self.process_batch = process_batch
+        self.max_batch_size = max(1, Config.BATCH_MAX_SIZE if max_batch_size is None else max_batch_size)
+        self.max_wait = (Config.BATCH_MAX_WAIT_MS if max_wait_ms is None else max_wait_ms) / 1000.0
+        self.name = name
+        self._queue = queue.Queue()
+        self._thread = None
+        self._thread_lock = threading.Lock()
+        self.batch_count = 0
+        self.item_count = 0
+        self.largest_batch = 0
+
+    def submit(self, item, timeout=None):
+        """
+        Queue an item and block until its result is ready
+        Args:
+            item: one request for process_batch
+            timeout: optional seconds to wait
+        Returns:
+            the item's result
+        """
+        return self.submit_future(item).result(timeout)
+
+    def submit_async(self, item):
+        """Queue an item from a coroutine; returns an awaitable result"""
+        return asyncio.wrap_future(self.submit_future(item))
+
+    def submit_future(self, item):
+        """Queue an item and return a concurrent.futures.Future of its result"""
+        self._ensure_thread()
+        future = Future()
+        self._queue.put((item, future))
+        return future
+
+    def metrics(self):
+        return {
+            'batches': self.batch_count,
+            'items': self.item_count,
+            'largest_batch': self.largest_batch,
+            'mean_batch': round(self.item_count / self.batch_count, 2) if self.batch_count else 0
+        }
+
+    def _ensure_thread(self):
+        if self._thread is not None and self._thread.is_alive():
+            return
+        with self._thread_lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name=self.name, daemon=True)
+                self._thread.start()
+
+    def _collect(self):
+        batch = [self._queue.get()]
+        deadline = time.monotonic() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.monotonic()
+            try:
+                batch.append(self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._collect()
+            self.batch_count += 1
+            self.item_count += len(batch)
+            self.largest_batch = max(self.largest_batch, len(batch))
+            try:
+                results = self.process_batch([item for item, _ in batch])
+                for (_, future), result in zip(batch, results):
+                    future.set_result(result)
+            except Exception as e:
+                for _, future in batch:
+                    if not future.done():
+                        future.set_exception(e)
@@ -0,0 +1,265 @@
+"""
+Movie attribute columns for filtered vector search
+The filterable Movies attributes (genres, release_year, adult, vote_count) are
+published as one .npz archive next to the embeddings. At serving time they are
+reordered to the rows of the embedding matrix, so a request filter becomes one
+vectorized boolean mask applied to the scores before top-k selection.
+"""
+import numpy as np
+from botocore.exceptions import ClientError
+
+from .config import Config
+from .embedding_store import read_npz, write_npz, is_missing_object
+
+MAX_GENRES = 64  # one bit per genre in a uint64
+UNKNOWN_YEAR = 0
+
+FILTER_KEYS = ('genres', 'release_year', 'adult', 'min_vote_count')
+
+
+class InvalidFilterError(ValueError):
+    """Malformed 'filters' object in a request"""
+
+
+class AttributesUnavailableError(Exception):
+    """No attribute archive is published, so filters cannot be applied"""
+
+
+class MovieAttributes:
+    """
+    Column-oriented attributes, one row per movie id
+    genre_bits holds a bitmap per movie (bit i = genre_names[i]); release_year
+    is UNKNOWN_YEAR when the movie has none.
+    """
+
+    def __init__(self, ids, genre_names, genre_bits, release_year, adult, vote_count):
+        self.ids = list(ids)
+        self.genre_names = list(genre_names)
+        self.genre_bits = genre_bits
+        self.release_year = release_year
+        self.adult = adult
+        self.vote_count = vote_count
+        self._genre_index = {name.lower(): i for i, name in enumerate(self.genre_names)}
+
+    def __len__(self):
+        return len(self.ids)
+
+    @classmethod
+    def from_items(cls, items):
+        """
+        Build the columns from Movies items
+        Args:
+            items: iterable of dicts with movie_id and optional genres,
+                   release_year, adult, vote_count
+        """
+        items = list(items)
+        genre_names = sorted({genre for item in items for genre in (item.get('genres') or [])})
+        if len(genre_names) > MAX_GENRES:
+            raise ValueError(f"{len(genre_names)} genres, at most {MAX_GENRES} fit the genre bitmap")
+        genre_bit = {name: np.uint64(1) << np.uint64(i) for i, name in enumerate(genre_names)}
+
+        genre_bits = np.zeros(len(items), dtype=np.uint64)
+        release_year = np.full(len(items), UNKNOWN_YEAR, dtype=np.int16)
+        adult = np.zeros(len(items), dtype=bool)
+        vote_count = np.zeros(len(items), dtype=np.int32)
+        for i, item in enumerate(items):
+            for genre in item.get('genres') or []:
+                genre_bits[i] |= genre_bit[genre]
+            if item.get('release_year'):
+                release_year[i] = int(item['release_year'])
+            adult[i] = bool(item.get('adult', False))
+            vote_count[i] = int(item.get('vote_count') or 0)
+        return cls([str(item['movie_id']) for item in items], genre_names, genre_bits, release_year, adult, vote_count)
+
+    @classmethod
+    def from_npz(cls, content):
+        """Parse an archive written by to_npz"""
+        npzfile = read_npz(content)
+        return cls(
+            [str(movie_id) for movie_id in npzfile['ids']],
+            [str(name) for name in npzfile['genre_names']],
+            npzfile['genre_bits'].astype(np.uint64),
+            npzfile['release_year'].astype(np.int16),
+            npzfile['adult'].astype(bool),
+            npzfile['vote_count'].astype(np.int32)
+        )
+
+    def to_npz(self):
+        """
+        Returns:
+            bytes: compressed .npz archive of the columns
+        """
+        return write_npz(
+            ids=np.array(self.ids, dtype=str),
+            genre_names=np.array(self.genre_names, dtype=str),
+            genre_bits=self.genre_bits,
+            release_year=self.release_year,
+            adult=self.adult,
+            vote_count=self.vote_count
+        )
+
+    def aligned_to(self, ids):
+        """
+        Reorder the columns to a list of movie ids (e.g. the embedding matrix rows)
+        Movies without attributes get no genres, an unknown year, adult False
+        and 0 votes, so any filter on those attributes excludes them.
+        Returns:
+            MovieAttributes: one row per id, in order
+        """
+        row_of = {movie_id: i for i, movie_id in enumerate(self.ids)}
+        source = np.array([row_of.get(movie_id, -1) for movie_id in ids], dtype=np.int64)
+        known = source >= 0
+        picked = np.where(known, source, 0)
+
+        def take(column, missing):
+            if len(column) == 0:
+                return np.full(len(ids), missing, dtype=column.dtype)
+            return np.where(known, column[picked], missing).astype(column.dtype)
+
+        return MovieAttributes(
+            ids, self.genre_names,
+            take(self.genre_bits, 0), take(self.release_year, UNKNOWN_YEAR),
+            take(self.adult, False), take(self.vote_count, 0)
+        )
+
+    def mask(self, filters):
+        """
+        Rows matching every filter
+        Args:
+            filters: normalized filters from parse_filters
+        Returns:
+            numpy bool array, one entry per row
+        """
+        mask = np.ones(len(self.ids), dtype=bool)
+        if 'genres' in filters:
+            # Any of the requested genres; unknown genre names match nothing
+            wanted = np.uint64(0)
+            for name in filters['genres']:
+                i = self._genre_index.get(name)
+                if i is not None:
+                    wanted |= np.uint64(1) << np.uint64(i)
+            mask &= (self.genre_bits & wanted) != 0
+        if 'release_year' in filters:
+            year_range = filters['release_year']
+            mask &= self.release_year != UNKNOWN_YEAR
+            if 'gte' in year_range:
+                mask &= self.release_year >= year_range['gte']
+            if 'lte' in year_range:
+                mask &= self.release_year <= year_range['lte']
+        if 'adult' in filters:
+            mask &= self.adult == filters['adult']
+        if 'min_vote_count' in filters:
+            mask &= self.vote_count >= filters['min_vote_count']
+        return mask
+
+
+def parse_filters(raw):
+    """
+    Validate and normalize the 'filters' object of a recommendation request
+    Accepted shape:
+        {"genres": ["Science Fiction", ...],          # any of, case-insensitive
+         "release_year": {"gte": 1990, "lte": 1999},  # inclusive bounds
+         "adult": false,
+         "min_vote_count": 100}
+    Args:
+        raw: the request's 'filters' value
+    Returns:
+        dict: normalized filters (stable key order), or None when empty
+    Raises:
+        InvalidFilterError: malformed filters
+    """
+    if not raw:
+        return None
+    if not isinstance(raw, dict):
+        raise InvalidFilterError("filters must be an object")
+    unknown = set(raw) - set(FILTER_KEYS)
+    if unknown:
+        raise InvalidFilterError(f"Unknown filters: {', '.join(sorted(unknown))}")
+
+    filters = {}
+    if raw.get('genres') is not None:
+        genres = raw['genres']
+        if isinstance(genres, str):
+            genres = [genres]
+        if not isinstance(genres, list) or not all(isinstance(g, str) for g in genres):
+            raise InvalidFilterError("filters.genres must be a list of genre names")
+        genres = sorted({g.strip().lower() for g in genres if g.strip()})
+        if genres:
+            filters['genres'] = genres
+    if raw.get('release_year') is not None:
+        year_range = raw['release_year']
+        if isinstance(year_range, int) and not isinstance(year_range, bool):
+            year_range = {'gte': year_range, 'lte': year_range}
+        if not isinstance(year_range, dict) or set(year_range) - {'gte', 'lte'}:
+            raise InvalidFilterError("filters.release_year must be a year or an object with gte/lte")
+        normalized = {}
+        for bound in ('gte', 'lte'):
+            if year_range.get(bound) is not None:
+                normalized[bound] = _parse_int(year_range[bound], f"filters.release_year.{bound} must be a year")
+        filters['release_year'] = normalized
+    if raw.get('adult') is not None:
+        if not isinstance(raw['adult'], bool):
+            raise InvalidFilterError("filters.adult must be true or false")
+        filters['adult'] = raw['adult']
+    if raw.get('min_vote_count') is not None:
+        filters['min_vote_count'] = max(0, _parse_int(raw['min_vote_count'], "filters.min_vote_count must be an integer"))
+    return filters or None
+
+
+def _parse_int(value, message):
+    """int(value) for ints and numeric strings; booleans and anything else raise InvalidFilterError(message)"""
+    if isinstance(value, bool):
+        raise InvalidFilterError(message)
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        raise InvalidFilterError(message)
+
+
+def get_version(s3):
+    """
+    ETag of the published attribute archive
+    Returns:
+        str: ETag, or None when no archive is published
+    Raises:
+        AttributesUnavailableError: the archive cannot be read
+    """
+    try:
+        head = s3.head_object(Bucket=Config.EMBEDDINGS_BUCKET, Key=Config.MOVIE_ATTRIBUTES_FILE)
+        return head.get('ETag', '').strip('"') or None
+    except ClientError as e:
+        if not is_missing_object(e):
+            raise AttributesUnavailableError(f"Cannot read {_archive_url()}: {str(e)}")
+    return None
+
+
+def load_attributes(s3):
+    """
+    Download the published attribute archive
+    Returns:
+        tuple: (MovieAttributes, ETag)
+    Raises:
+        AttributesUnavailableError: nothing is published, or the archive cannot be read
+    """
+    try:
+        obj = s3.get_object(Bucket=Config.EMBEDDINGS_BUCKET, Key=Config.MOVIE_ATTRIBUTES_FILE)
+    except ClientError as e:
+        if is_missing_object(e):
+            raise AttributesUnavailableError(f"{_archive_url()} not found")
+        raise AttributesUnavailableError(f"Cannot read {_archive_url()}: {str(e)}")
+    attributes = MovieAttributes.from_npz(obj['Body'].read())
+    print(f"Loaded attributes of {len(attributes)} movies ({len(attributes.genre_names)} genres)")
+    return attributes, obj.get('ETag', '').strip('"') or None
+
+
+def _archive_url():
+    return f"s3://{Config.EMBEDDINGS_BUCKET}/{Config.MOVIE_ATTRIBUTES_FILE}"
+
+
+def publish_attributes(s3, attributes):
+    """Upload the attribute archive next to the embeddings"""
+    s3.put_object(
+        Bucket=Config.EMBEDDINGS_BUCKET,
+        Key=Config.MOVIE_ATTRIBUTES_FILE,
+        Body=attributes.to_npz()
+    )
@@ -0,0 +1,288 @@
+"""
+ONNX Runtime session configuration module
+Builds tuned SessionOptions from shared configuration, sized for the CPUs the
+process can actually use (Lambda exposes a fractional vCPU share via cgroups)
+"""
+import math
+import os
+import threading
+import numpy as np
+import onnxruntime
+
+from .config import Config
+from . import tracing
+
+GRAPH_OPTIMIZATION_LEVELS = {
+    'disabled': onnxruntime.GraphOptimizationLevel.ORT_DISABLE_ALL,
+    'basic': onnxruntime.GraphOptimizationLevel.ORT_ENABLE_BASIC,
+    'extended': onnxruntime.GraphOptimizationLevel.ORT_ENABLE_EXTENDED,
+    'all': onnxruntime.GraphOptimizationLevel.ORT_ENABLE_ALL
+}
+
+EXECUTION_MODES = {
+    'sequential': onnxruntime.ExecutionMode.ORT_SEQUENTIAL,
+    'parallel': onnxruntime.ExecutionMode.ORT_PARALLEL
+}
+
+
+def available_cpus():
+    """
+    Number of CPUs usable by this process
+    Honors the scheduler affinity mask and a cgroup v2/v1 CPU quota, rounding
+    fractional quotas up (1.4 vCPU -> 2 threads)
+    Returns:
+        int: usable CPU count
+    """
+    try:
+        cpus = len(os.sched_getaffinity(0))
+    except AttributeError:
+        cpus = os.cpu_count() or 1
+
+    quota = _cgroup_cpu_quota()
+    if quota:
+        cpus = min(cpus, max(1, math.ceil(quota)))
+    return max(1, cpus)
+
+
+def _cgroup_cpu_quota():
+    try:
+        with open('/sys/fs/cgroup/cpu.max', 'r') as f:
+            quota, period = f.read().split()[:2]
+        if quota != 'max':
+            return int(quota) / int(period)
+    except (OSError, ValueError):
+        pass
+    try:
+        with open('/sys/fs/cgroup/cpu/cpu.cfs_quota_us', 'r') as f:
+            quota = int(f.read())
+        with open('/sys/fs/cgroup/cpu/cpu.cfs_period_us', 'r') as f:
+            period = int(f.read())
+        if quota > 0:
+            return quota / period
+    except (OSError, ValueError):
+        pass
+    return None
+
+
+def build_session_options(optimized_model_path=None, **overrides):
+    """
+    Build SessionOptions from Config, with optional per-call overrides
+    Args:
+        optimized_model_path: where ORT should serialize the optimized graph
+        overrides: any of intra_op_threads, inter_op_threads, graph_optimization,
+                   execution_mode, enable_cpu_mem_arena, enable_mem_pattern,
+                   allow_spinning (used by the benchmark sweep)
+    Returns:
+        onnxruntime.SessionOptions
+    """
+    settings = get_session_settings()
+    settings.update(overrides)
+
+    so = onnxruntime.SessionOptions()
+    so.intra_op_num_threads = settings['intra_op_threads']
+    so.inter_op_num_threads = settings['inter_op_threads']
+    so.graph_optimization_level = GRAPH_OPTIMIZATION_LEVELS[settings['graph_optimization']]
+    so.execution_mode = EXECUTION_MODES[settings['execution_mode']]
+    so.enable_cpu_mem_arena = settings['enable_cpu_mem_arena']
+    so.enable_mem_pattern = settings['enable_mem_pattern']
+    spinning = '1' if settings['allow_spinning'] else '0'
+    so.add_session_config_entry('session.intra_op.allow_spinning', spinning)
+    so.add_session_config_entry('session.inter_op.allow_spinning', spinning)
+    if optimized_model_path:
+        so.optimized_model_filepath = optimized_model_path
+    return so
+
+
+def get_session_settings():
+    """
+    Resolve the effective session settings from Config
+    Returns:
+        dict: settings consumed by build_session_options
+    """
+    intra_op_threads = Config.ONNX_INTRA_OP_THREADS or available_cpus()
+    return {
+        'intra_op_threads': intra_op_threads,
+        'inter_op_threads': Config.ONNX_INTER_OP_THREADS,
+        'graph_optimization': Config.ONNX_GRAPH_OPTIMIZATION,
+        'execution_mode': Config.ONNX_EXECUTION_MODE,
+        'enable_cpu_mem_arena': Config.ONNX_ENABLE_CPU_MEM_ARENA,
+        'enable_mem_pattern': Config.ONNX_ENABLE_MEM_PATTERN,
+        'allow_spinning': Config.ONNX_ALLOW_SPINNING
+    }
+
+
+def create_session(model_path, optimized_model_path=None, **overrides):
+    """
+    Create a CPU InferenceSession with tuned options
+    If optimized_model_path already exists it is loaded directly with graph
+    optimizations disabled, skipping the optimization pass on warm restarts;
+    otherwise the optimized graph is written there for the next start. The
+    graph is written to a temporary file and renamed into place, so a crash or
+    a concurrent worker never leaves a truncated cache, and a cache that fails
+    to load is deleted and rebuilt from model_path.
+    Args:
+        model_path: path of the source .onnx model
+        optimized_model_path: optional on-disk cache of the optimized graph
+    Returns:
+        onnxruntime.InferenceSession
+    """
+    if optimized_model_path and os.path.exists(optimized_model_path):
+        cached_overrides = dict(overrides)
+        cached_overrides.setdefault('graph_optimization', 'disabled')
+        so = build_session_options(**cached_overrides)
+        try:
+            return onnxruntime.InferenceSession(optimized_model_path, sess_options=so, providers=['CPUExecutionProvider'])
+        except Exception as e:
+            print(f"Discarding unreadable optimized model cache {optimized_model_path}: {str(e)}")
+            try:
+                os.remove(optimized_model_path)
+            except OSError:
+                pass
+
+    if not optimized_model_path:
+        so = build_session_options(**overrides)
+        return onnxruntime.InferenceSession(model_path, sess_options=so, providers=['CPUExecutionProvider'])
+
+    os.makedirs(os.path.dirname(optimized_model_path) or '.', exist_ok=True)
+    # Same directory so the rename is atomic; keep the .onnx suffix so ORT writes ONNX, not ORT format
+    tmp_path = f"{optimized_model_path}.{os.getpid()}.{threading.get_ident()}.tmp.onnx"
+    so = build_session_options(optimized_model_path=tmp_path, **overrides)
+    try:
+        session = onnxruntime.InferenceSession(model_path, sess_options=so, providers=['CPUExecutionProvider'])
+        if os.path.exists(tmp_path):
+            os.replace(tmp_path, optimized_model_path)
+        return session
+    finally:
+        if os.path.exists(tmp_path):
+            try:
+                os.remove(tmp_path)
+            except OSError:
+                pass
+
+
+class SentenceEncoder:
+    """
+    Sentence encoder on top of an InferenceSession
+    Inputs are padded to the smallest configured sequence bucket instead of the
+    tokenizer max length. For single queries each bucket keeps preallocated
+    input/output arrays bound once through ORT IO binding, so a request only
+    writes token ids into existing buffers and pools the output in place;
+    encode_batch serves micro-batches of concurrent queries.
+    """
+
+    def __init__(self, session, tokenizer, max_length, buckets=None):
+        self.session = session
+        self.tokenizer = tokenizer
+        self.max_length = max_length
+        self.buckets = sorted(b for b in (buckets or Config.ONNX_SEQUENCE_BUCKETS) if b < max_length) + [max_length]
+
+        output = session.get_outputs()[0]
+        self.output_name = output.name
+        self.pooled_output = len(output.shape) == 2
+        self.hidden_size = output.shape[-1]
+        self._buffers = {}
+        self._buffers_lock = threading.Lock()
+
+    def encode(self, text):
+        """
+        Encode text into an L2-normalized float32 embedding
+        Args:
+            text: query string
+        Returns:
+            numpy.ndarray: embedding of shape (hidden_size,)
+        """
+        with tracing.span('tokenize'):
+            encoded = self.tokenizer.encode(text)
+        length = max(1, min(sum(encoded.attention_mask), self.max_length))
+        buffers = self._get_buffers(self._bucket_for(length))
+
+        with buffers['lock']:
+            input_ids, attention_mask = buffers['input_ids'], buffers['attention_mask']
+            input_ids[0, :length] = encoded.ids[:length]
+            input_ids[0, length:] = 0
+            attention_mask[0, :length] = 1
+            attention_mask[0, length:] = 0
+
+            with tracing.span('inference'):
+                self.session.run_with_iobinding(buffers['binding'])
+
+            pooled = buffers['pooled']
+            if self.pooled_output:
+                pooled[:] = buffers['output'][0]
+            else:
+                # Masked mean pooling: padding sits after the real tokens
+                np.sum(buffers['output'][0, :length], axis=0, out=pooled)
+                pooled /= length
+            pooled /= max(float(np.linalg.norm(pooled)), 1e-12)
+            return pooled.copy()
+
+    def encode_batch(self, texts):
+        """
+        Encode several texts with one inference call
+        Batches have a variable size, so inputs are plain arrays padded to the
+        bucket of the longest text rather than the per-bucket bound buffers.
+        Args:
+            texts: list of query strings
+        Returns:
+            numpy.ndarray: L2-normalized embeddings of shape (len(texts), hidden_size)
+        """
+        with tracing.span('tokenize'):
+            encodings = self.tokenizer.encode_batch(list(texts))
+        lengths = np.array([max(1, min(sum(e.attention_mask), self.max_length)) for e in encodings])
+        bucket = self._bucket_for(int(lengths.max()))
+
+        input_ids = np.zeros((len(encodings), bucket), dtype=np.int64)
+        attention_mask = np.zeros((len(encodings), bucket), dtype=np.int64)
+        for i, (encoded, length) in enumerate(zip(encodings, lengths)):
+            input_ids[i, :length] = encoded.ids[:length]
+            attention_mask[i, :length] = 1
+
+        with tracing.span('inference'):
+            output = self.session.run([self.output_name], {
+                'input_ids': input_ids,
+                'attention_mask': attention_mask
+            })[0]
+
+        if self.pooled_output:
+            pooled = np.ascontiguousarray(output, dtype=np.float32)
+        else:
+            # Masked mean pooling over each row's real tokens
+            pooled = np.einsum('bsh,bs->bh', output, attention_mask.astype(np.float32))
+            pooled /= lengths[:, None].astype(np.float32)
+        pooled /= np.maximum(np.linalg.norm(pooled, axis=1, keepdims=True), 1e-12)
+        return pooled
+
+    def _bucket_for(self, length):
+        for bucket in self.buckets:
+            if length <= bucket:
+                return bucket
+        return self.max_length
+
+    def _get_buffers(self, bucket):
+        buffers = self._buffers.get(bucket)
+        if buffers is not None:
+            return buffers
+
+        with self._buffers_lock:
+            buffers = self._buffers.get(bucket)
+            if buffers is None:
+                input_ids = np.zeros((1, bucket), dtype=np.int64)
+                attention_mask = np.zeros((1, bucket), dtype=np.int64)
+                output_shape = (1, self.hidden_size) if self.pooled_output else (1, bucket, self.hidden_size)
+                output = np.zeros(output_shape, dtype=np.float32)
+
+                binding = self.session.io_binding()
+                binding.bind_ortvalue_input('input_ids', onnxruntime.OrtValue.ortvalue_from_numpy(input_ids))
+                binding.bind_ortvalue_input('attention_mask', onnxruntime.OrtValue.ortvalue_from_numpy(attention_mask))
+                binding.bind_ortvalue_output(self.output_name, onnxruntime.OrtValue.ortvalue_from_numpy(output))
+
+                buffers = {
+                    'input_ids': input_ids,
+                    'attention_mask': attention_mask,
+                    'output': output,
+                    'pooled': np.zeros(self.hidden_size, dtype=np.float32),
+                    'binding': binding,
+                    'lock': threading.Lock()
+                }
+                self._buffers[bucket] = buffers
+        return buffers
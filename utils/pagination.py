@@ -0,0 +1,176 @@
+"""
+Cursor pagination for ranked recommendation results
+The first page computes the ranking to MAX_RESULTS depth and caches the ranked
+id list for a short time; later pages decode an opaque cursor and slice the
+cached list instead of re-running the search (recomputing only on a cache miss).
+Also provides opaque cursors over DynamoDB LastEvaluatedKey for query listings.
+"""
+import base64
+import hashlib
+import json
+import threading
+import time
+from collections import OrderedDict
+from decimal import Decimal
+
+from .config import Config
+
+
+class InvalidCursorError(ValueError):
+    """Raised when a cursor cannot be decoded or does not belong to the request"""
+
+
+class CursorExpiredError(ValueError):
+    """Raised when a cursor refers to an embeddings version no longer served"""
+
+
+def query_hash(route, params):
+    """
+    Stable hash of a ranking request (route + parameters that affect the ranking)
+    Args:
+        route: route name, e.g. 'search'
+        params: JSON-serializable ranking parameters
+    Returns:
+        str: hex digest
+    """
+    canonical = json.dumps([route, params], sort_keys=True, separators=(',', ':'), default=str)
+    return hashlib.sha256(canonical.encode('utf-8')).hexdigest()[:32]
+
+
+def encode_cursor(qhash, offset, version):
+    """Encode an opaque cursor"""
+    payload = json.dumps({'q': qhash, 'o': offset, 'v': version}, separators=(',', ':'))
+    return base64.urlsafe_b64encode(payload.encode('utf-8')).decode('ascii').rstrip('=')
+
+
+def decode_cursor(cursor):
+    """
+    Decode an opaque cursor
+    Returns:
+        tuple: (query hash, offset, embeddings version)
+    """
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode('ascii')))
+        offset = int(payload['o'])
+        if offset < 0:
+            raise ValueError("negative offset")
+        return payload['q'], offset, payload.get('v')
+    except Exception as e:
+        raise InvalidCursorError(f"Invalid cursor: {str(e)}")
+
+
+def encode_key_cursor(last_evaluated_key, attributes):
+    """
+    Encode a DynamoDB LastEvaluatedKey as an opaque cursor
+    Args:
+        last_evaluated_key: LastEvaluatedKey from a query response
+        attributes: key attributes to keep (the hash key is re-derived by the caller)
+    Returns:
+        str: cursor
+    """
+    payload = json.dumps({name: last_evaluated_key[name] for name in attributes},
+                         separators=(',', ':'), default=_key_default)
+    return base64.urlsafe_b64encode(payload.encode('utf-8')).decode('ascii').rstrip('=')
+
+
+def decode_key_cursor(cursor):
+    """
+    Decode a cursor produced by encode_key_cursor
+    Returns:
+        dict: key attributes
+    Raises:
+        InvalidCursorError: cursor is malformed
+    """
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode('ascii')))
+        if not isinstance(payload, dict):
+            raise ValueError("not an object")
+        return payload
+    except Exception as e:
+        raise InvalidCursorError(f"Invalid cursor: {str(e)}")
+
+
+def _key_default(value):
+    # Numeric key attributes come back from boto3 as Decimal
+    if isinstance(value, Decimal):
+        return int(value) if value == value.to_integral_value() else float(value)
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+class RankingCache:
+    """
+    Small TTL + LRU cache of ranked (movie_id, score) lists
+    """
+
+    def __init__(self, max_entries=None, ttl=None):
+        self.max_entries = Config.PAGINATION_CACHE_SIZE if max_entries is None else max_entries
+        self.ttl = Config.PAGINATION_CACHE_TTL if ttl is None else ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            ranking, expires_at = entry
+            if expires_at <= time.time():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return ranking
+
+    def put(self, key, ranking):
+        if self.max_entries <= 0:
+            return
+        with self._lock:
+            self._entries[key] = (ranking, time.time() + self.ttl)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+
+_ranking_cache = RankingCache()
+
+
+def get_page(route, params, version, page_size, cursor, rank):
+    """
+    Return one page of a ranking, computing and caching it when needed
+    Args:
+        route: route name used in the query hash
+        params: ranking parameters used in the query hash
+        version: embeddings version the ranking depends on (or a fixed tag)
+        page_size: number of results per page (the request's top_k, clamped to MAX_RESULTS)
+        cursor: cursor from a previous page, or None for the first page
+        rank: callable(depth) -> list of (movie_id, score), best first
+    Returns:
+        tuple: (list of (movie_id, score) for this page, next cursor or None)
+    Raises:
+        InvalidCursorError: cursor is malformed or from another query
+        CursorExpiredError: cursor was issued for a different embeddings version
+    """
+    page_size = min(page_size, Config.MAX_RESULTS)
+    qhash = query_hash(route, params)
+    offset = 0
+    if cursor:
+        cursor_hash, offset, cursor_version = decode_cursor(cursor)
+        if cursor_hash != qhash:
+            raise InvalidCursorError("Cursor does not match this request")
+        if cursor_version != version:
+            raise CursorExpiredError("Results changed since this cursor was issued")
+
+    # The first page always recomputes so it is never staler than before;
+    # later pages reuse the list it cached
+    depth = Config.MAX_RESULTS
+    cache_key = (qhash, version, depth)
+    ranking = _ranking_cache.get(cache_key) if cursor else None
+    if ranking is None:
+        ranking = rank(depth)
+        _ranking_cache.put(cache_key, ranking)
+
+    page = ranking[offset:offset + page_size]
+    next_offset = offset + page_size
+    next_cursor = encode_cursor(qhash, next_offset, version) if next_offset < len(ranking) else None
+    return page, next_cursor
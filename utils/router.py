@@ -0,0 +1,110 @@
+"""
+Request routing module
+Compiles route templates like '/user-data/favorites/{movie_id}' into a
+(method, path) dict for static routes plus a segment trie for parameterized
+ones, so dispatch is a dict lookup and path parameters are extracted once
+"""
+from urllib.parse import unquote
+
+
+def normalize_path(path):
+    """
+    Normalize a request path: collapse empty segments and drop the trailing slash
+    Args:
+        path: raw request path
+    Returns:
+        str: normalized path ('/' for the root)
+    """
+    segments = [segment for segment in path.split('/') if segment]
+    return '/' + '/'.join(segments)
+
+
+class _TrieNode:
+    __slots__ = ('children', 'param_name', 'param_child', 'targets')
+
+    def __init__(self):
+        self.children = {}
+        self.param_name = None
+        self.param_child = None
+        self.targets = {}
+
+
+class Router:
+    """
+    Method + path router with '{name}' path parameters
+    Literal segments take precedence over parameters at the same position, so
+    '/user-data/favorites/toggle/{movie_id}' is never shadowed by
+    '/user-data/favorites/{movie_id}'.
+    """
+
+    def __init__(self):
+        self._static = {}
+        self._root = _TrieNode()
+
+    def add(self, method, template, target):
+        """
+        Register a route
+        Args:
+            method: HTTP method
+            template: path template, e.g. '/user-data/reviews/{movie_id}'
+            target: value returned by match() for this route
+        """
+        template = normalize_path(template)
+        if '{' not in template:
+            self._static[(method, template)] = target
+            return
+
+        node = self._root
+        for segment in template.strip('/').split('/'):
+            if segment.startswith('{') and segment.endswith('}'):
+                name = segment[1:-1]
+                if node.param_child is None:
+                    node.param_child = _TrieNode()
+                    node.param_name = name
+                elif node.param_name != name:
+                    raise ValueError(f"Conflicting parameter names at {template}: {node.param_name} vs {name}")
+                node = node.param_child
+            else:
+                node = node.children.setdefault(segment, _TrieNode())
+        node.targets[method] = target
+
+    def match(self, method, path):
+        """
+        Resolve a request
+        Args:
+            method: HTTP method
+            path: request path (normalized here)
+        Returns:
+            tuple: (target, path_params) or (None, None) if no route matches
+        """
+        path = normalize_path(path)
+        target = self._static.get((method, path))
+        if target is not None:
+            return target, {}
+
+        segments = path.strip('/').split('/') if path != '/' else []
+        params = {}
+        target = self._match_node(self._root, segments, 0, method, params)
+        if target is None:
+            return None, None
+        return target, params
+
+    def _match_node(self, node, segments, index, method, params):
+        if index == len(segments):
+            return node.targets.get(method)
+
+        segment = segments[index]
+        child = node.children.get(segment)
+        if child is not None:
+            target = self._match_node(child, segments, index + 1, method, params)
+            if target is not None:
+                return target
+
+        if node.param_child is not None:
+            params[node.param_name] = unquote(segment)
+            target = self._match_node(node.param_child, segments, index + 1, method, params)
+            if target is not None:
+                return target
+            del params[node.param_name]
+
+        return None
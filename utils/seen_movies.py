@@ -0,0 +1,118 @@
+"""
+Per-user set of already-seen (reviewed or favorited) movies
+Loaded with one keys-only query per table, cached in-process and dropped on
+the user's own writes, so recommendation requests can exclude the user's
+movies with a row mask before top-k selection instead of over-fetching.
+"""
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+from boto3.dynamodb.conditions import Key
+
+from .config import Config
+from . import database as db
+from . import fanout
+
+# user_id -> {'movie_ids', 'expires_at', 'mask': (snapshot version, mask) or None}, most recently used last
+_cache = OrderedDict()
+_generation = 0  # bumped by every invalidate, so a load racing a write is not cached
+_cache_lock = threading.Lock()
+
+
+def query_user_movie_ids(table, user_id):
+    """
+    Get every movie ID in a user's partition of a (user_id, movie_id) table
+    Args:
+        table: DynamoDB table resource
+        user_id: User ID
+    Returns:
+        set: movie IDs
+    """
+    movie_ids = set()
+    query_kwargs = {
+        'KeyConditionExpression': Key('user_id').eq(user_id),
+        'ProjectionExpression': 'movie_id'
+    }
+    while True:
+        response = table.query(**query_kwargs)
+        movie_ids.update(item['movie_id'] for item in response.get('Items', []))
+        last_key = response.get('LastEvaluatedKey')
+        if not last_key:
+            return movie_ids
+        query_kwargs['ExclusiveStartKey'] = last_key
+
+
+def _get_entry(user_id):
+    with _cache_lock:
+        entry = _cache.get(user_id)
+        if entry is not None and entry['expires_at'] > time.time():
+            _cache.move_to_end(user_id)
+            return entry
+        _cache.pop(user_id, None)
+        generation = _generation
+
+    favorites, reviews = fanout.gather([
+        lambda: query_user_movie_ids(db.favorites_table, user_id),
+        lambda: query_user_movie_ids(db.reviews_table, user_id)
+    ])
+    entry = {
+        'movie_ids': frozenset(favorites | reviews),
+        'expires_at': time.time() + Config.SEEN_CACHE_TTL,
+        'mask': None
+    }
+    if Config.SEEN_CACHE_SIZE > 0:
+        with _cache_lock:
+            if _generation == generation:
+                _cache[user_id] = entry
+                _cache.move_to_end(user_id)
+                while len(_cache) > Config.SEEN_CACHE_SIZE:
+                    _cache.popitem(last=False)
+    return entry
+
+
+def get_seen_movie_ids(user_id):
+    """
+    Movies the user has reviewed or favorited
+    Args:
+        user_id: User ID
+    Returns:
+        frozenset: movie IDs
+    """
+    return _get_entry(user_id)['movie_ids']
+
+
+def seen_mask(user_id, snapshot):
+    """
+    Row mask over the snapshot's matrix excluding the user's movies
+    Args:
+        user_id: User ID
+        snapshot: EmbeddingSnapshot the scores are computed on
+    Returns:
+        numpy bool array (False = seen), or None when the user has no movies
+    """
+    entry = _get_entry(user_id)
+    if not entry['movie_ids']:
+        return None
+    cached = entry['mask']
+    if cached is not None and cached[0] == snapshot.version:
+        return cached[1]
+    rows = [row for row in (snapshot.index_of(mid) for mid in entry['movie_ids']) if row is not None]
+    mask = np.ones(len(snapshot), dtype=bool)
+    mask[rows] = False
+    entry['mask'] = (snapshot.version, mask)
+    return mask
+
+
+def invalidate(user_id):
+    """
+    Drop a user's cached movies after they add or remove a favorite or review
+    Other warm containers keep their entries for at most SEEN_CACHE_TTL seconds
+    Args:
+        user_id: User ID
+    """
+    global _generation
+    with _cache_lock:
+        _cache.pop(user_id, None)
+        _generation += 1
@@ -0,0 +1,81 @@
+"""
+Shared-memory embeddings for multi-process serving
+The serving parent copies the embedding matrix and the movie id catalog into
+multiprocessing.shared_memory blocks once; worker processes attach to the
+blocks and wrap the matrix in a read-only MatrixEmbeddings view, so an extra
+worker adds its id index instead of a private copy of every vector.
+"""
+import json
+from multiprocessing import shared_memory
+
+import numpy as np
+
+from .embedding_snapshot import EmbeddingSnapshot, MatrixEmbeddings
+
+
+class SharedEmbeddings:
+    """
+    Owner side of one shared embeddings version
+    The creating process must call close() to unlink the blocks.
+    """
+
+    def __init__(self, embeddings, version):
+        ids = [str(movie_id) for movie_id in embeddings]
+        dim = len(next(iter(embeddings.values()))) if ids else 0
+
+        self.matrix_block = shared_memory.SharedMemory(create=True, size=max(1, len(ids) * dim * 4))
+        matrix = np.ndarray((len(ids), dim), dtype=np.float32, buffer=self.matrix_block.buf)
+        for i, movie_id in enumerate(embeddings):
+            matrix[i] = embeddings[movie_id]
+        del matrix
+
+        ids_blob = json.dumps(ids, separators=(',', ':')).encode('utf-8')
+        self.ids_block = shared_memory.SharedMemory(create=True, size=max(1, len(ids_blob)))
+        self.ids_block.buf[:len(ids_blob)] = ids_blob
+
+        self.descriptor = {
+            'version': version,
+            'matrix': self.matrix_block.name,
+            'ids': self.ids_block.name,
+            'ids_bytes': len(ids_blob),
+            'shape': [len(ids), dim]
+        }
+
+    def close(self):
+        """Release and unlink the shared blocks"""
+        for block in (self.matrix_block, self.ids_block):
+            block.close()
+            try:
+                block.unlink()
+            except FileNotFoundError:
+                pass
+
+
+def _open_block(name):
+    try:
+        # Python 3.13+: attaching must not register the block for cleanup
+        return shared_memory.SharedMemory(name=name, track=False)
+    except TypeError:
+        # Older versions register it with the resource tracker shared with
+        # the owner (forked workers inherit it), which is harmless
+        return shared_memory.SharedMemory(name=name)
+
+
+def attach(descriptor):
+    """
+    Attach to shared embeddings from another process
+    Args:
+        descriptor: SharedEmbeddings.descriptor of the owner
+    Returns:
+        EmbeddingSnapshot: snapshot whose embeddings are row views of the shared matrix
+    """
+    ids_block = _open_block(descriptor['ids'])
+    try:
+        ids = json.loads(bytes(ids_block.buf[:descriptor['ids_bytes']]).decode('utf-8'))
+    finally:
+        ids_block.close()
+
+    matrix_block = _open_block(descriptor['matrix'])
+    matrix = np.ndarray(tuple(descriptor['shape']), dtype=np.float32, buffer=matrix_block.buf)
+    matrix.flags.writeable = False
+    return EmbeddingSnapshot(MatrixEmbeddings(ids, matrix, buffer_owner=matrix_block), descriptor['version'])
@@ -0,0 +1,99 @@
+"""
+Single-flight request coalescing
+Concurrent callers asking for the same key share one in-flight computation:
+the first caller (leader) runs it, later callers (followers) wait for its
+result instead of repeating the work. Nothing is cached once the call ends.
+"""
+import threading
+
+from .config import Config
+from . import tracing
+
+_groups = {}
+
+
+class _Call:
+    __slots__ = ('done', 'result', 'error')
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    """
+    Named group of coalesced calls with leader/follower counters
+    The process totals are in metrics(); each call is also counted on the
+    active request's trace as '<name>.leaders' / '<name>.followers'.
+    """
+
+    def __init__(self, name):
+        self.name = name
+        self._calls = {}
+        self._lock = threading.Lock()
+        self.leaders = 0
+        self.followers = 0
+        self.errors = 0
+        _groups[name] = self
+
+    def do(self, key, fn):
+        """
+        Run fn() for key, or wait for the call already running for key
+        Args:
+            key: hashable identity of the computation
+            fn: zero-argument callable
+        Returns:
+            fn's result (the same object for every caller sharing the call)
+        Raises:
+            whatever fn raised, in every caller sharing the call
+        """
+        if not Config.ENABLE_COALESCING:
+            return fn()
+
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+                self.leaders += 1
+            else:
+                self.followers += 1
+        tracing.count(f'{self.name}.leaders' if leader else f'{self.name}.followers')
+
+        if not leader:
+            with tracing.span(f'{self.name}.coalesced'):
+                call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = fn()
+            return call.result
+        except Exception as e:
+            call.error = e
+            self.errors += 1
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+
+    def metrics(self):
+        total = self.leaders + self.followers
+        return {
+            'leaders': self.leaders,
+            'followers': self.followers,
+            'errors': self.errors,
+            'saved_ratio': round(self.followers / total, 4) if total else 0.0
+        }
+
+
+def metrics():
+    """
+    Counters of every coalescing group in this process
+    Returns:
+        dict: group name -> leaders/followers/errors/saved_ratio
+    """
+    return {name: group.metrics() for name, group in _groups.items()}
@@ -0,0 +1,191 @@
+"""
+Per-request stage timing module
+lambda_handler opens a trace for each request; code along the handler stack
+wraps its stages in span('name') and the per-stage durations are emitted at
+the end as one CloudWatch Embedded Metric Format (EMF) log line and, when
+enabled, a Server-Timing response header. Event counters recorded with
+count('name') are emitted the same way. With tracing disabled span() returns
+a shared no-op context manager, so instrumented code costs one lookup.
+"""
+import json
+import threading
+import time
+from contextvars import ContextVar
+
+from .config import Config
+
+_current_trace = ContextVar('current_trace', default=None)
+
+
+class _NoopSpan:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+
+_NOOP_SPAN = _NoopSpan()
+
+
+class _Span:
+    __slots__ = ('trace', 'name', 'start')
+
+    def __init__(self, trace, name):
+        self.trace = trace
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.trace.add(self.name, (time.perf_counter() - self.start) * 1000)
+        return False
+
+
+class Trace:
+    """
+    Stage durations of one request
+    Spans with the same name accumulate (total milliseconds and count), so a
+    stage run once per result is reported as a single entry.
+    """
+
+    def __init__(self, route):
+        self.route = route
+        self.start = time.perf_counter()
+        self.stages = {}
+        self.counters = {}
+        self.properties = {}
+        self._lock = threading.Lock()
+
+    def add(self, name, duration_ms):
+        """Record duration_ms for stage name"""
+        with self._lock:
+            entry = self.stages.get(name)
+            if entry is None:
+                self.stages[name] = [duration_ms, 1]
+            else:
+                entry[0] += duration_ms
+                entry[1] += 1
+
+    def count(self, name, n=1):
+        """Add n to counter name"""
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + n
+
+    def total_ms(self):
+        return (time.perf_counter() - self.start) * 1000
+
+    def to_emf(self, total_ms):
+        """
+        Build the EMF log record: one metric per stage and per counter, dimensioned by route
+        Returns:
+            dict: JSON-serializable EMF record
+        """
+        metrics = {name: round(entry[0], 3) for name, entry in self.stages.items()}
+        metrics['total'] = round(total_ms, 3)
+        record = {
+            '_aws': {
+                'Timestamp': int(time.time() * 1000),
+                'CloudWatchMetrics': [{
+                    'Namespace': Config.METRICS_NAMESPACE,
+                    'Dimensions': [['Route']],
+                    'Metrics': [{'Name': name, 'Unit': 'Milliseconds'} for name in metrics]
+                    + [{'Name': name, 'Unit': 'Count'} for name in self.counters]
+                }]
+            },
+            'Route': self.route,
+            'counts': {name: entry[1] for name, entry in self.stages.items()},
+        }
+        record.update(self.properties)
+        record.update(metrics)
+        record.update(self.counters)
+        return record
+
+    def server_timing(self, total_ms):
+        """Format the stages (and counters, as desc) as a Server-Timing header value"""
+        parts = [f"{_metric_token(name)};dur={entry[0]:.1f}" for name, entry in self.stages.items()]
+        parts.extend(f'{_metric_token(name)};desc="{value}"' for name, value in self.counters.items())
+        parts.append(f"total;dur={total_ms:.1f}")
+        return ', '.join(parts)
+
+
+def _metric_token(name):
+    # Server-Timing metric names are HTTP tokens: no dots or spaces
+    return ''.join(c if c.isalnum() or c in '-_' else '_' for c in name)
+
+
+def enabled():
+    """Whether stage timing is collected at all"""
+    return Config.ENABLE_TRACING or Config.ENABLE_SERVER_TIMING
+
+
+def start_request(route):
+    """
+    Open the trace of a request
+    Args:
+        route: route name used as the metrics dimension (handler name)
+    Returns:
+        Trace, or None when tracing is disabled
+    """
+    if not enabled():
+        return None
+    trace = Trace(route)
+    _current_trace.set(trace)
+    return trace
+
+
+def current():
+    """The active trace of this request, or None"""
+    return _current_trace.get()
+
+
+def span(name):
+    """
+    Time a stage of the active request
+    Usage:
+        with tracing.span('inference'):
+            ...
+    """
+    trace = _current_trace.get()
+    if trace is None:
+        return _NOOP_SPAN
+    return _Span(trace, name)
+
+
+def count(name, n=1):
+    """Add n to a counter of the active request"""
+    trace = _current_trace.get()
+    if trace is not None:
+        trace.count(name, n)
+
+
+def annotate(key, value):
+    """Attach a property to the active request's log record"""
+    trace = _current_trace.get()
+    if trace is not None:
+        trace.properties[key] = value
+
+
+def finish_request(trace, response):
+    """
+    Close a trace: emit its EMF log line and add the Server-Timing header
+    Args:
+        trace: value returned by start_request (None is a no-op)
+        response: API Gateway response dict
+    Returns:
+        dict: the response
+    """
+    if trace is None:
+        return response
+    _current_trace.set(None)
+    total_ms = trace.total_ms()
+    if Config.ENABLE_TRACING:
+        trace.properties.setdefault('statusCode', response.get('statusCode'))
+        print(json.dumps(trace.to_emf(total_ms), separators=(',', ':'), default=str))
+    if Config.ENABLE_SERVER_TIMING:
+        response.setdefault('headers', {})['Server-Timing'] = trace.server_timing(total_ms)
+    return response
@@ -10,10 +10,25 @@ import base64
 import hmac
 import hashlib
 import os
+import threading
+import gzip
+from collections import OrderedDict
 from .config import Config
 from . import database as db
+from . import activity_log
+from . import tracing
 from decimal import Decimal
 
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
 logger = logging.getLogger(__name__)
 
 def get_cors_headers():
@@ -39,11 +54,54 @@ def generate_token(user):
     
     return jwt.encode(payload, Config.JWT_SECRET, algorithm='HS256')
 
-def get_authenticated_user(event):
+# Verified token -> (user record, cache expiry), most recently used last
+_auth_cache = OrderedDict()
+_auth_cache_lock = threading.Lock()
+
+def _get_cached_user(token):
+    """Return the cached user for a previously verified token, if still fresh"""
+    with _auth_cache_lock:
+        entry = _auth_cache.get(token)
+        if entry is None:
+            return None
+        user, expires_at = entry
+        if expires_at <= time.time():
+            del _auth_cache[token]
+            return None
+        _auth_cache.move_to_end(token)
+        return user
+
+def _cache_user(token, user, token_exp):
+    """Cache a verified token until its expiry or the staleness window, whichever is first"""
+    if Config.AUTH_CACHE_SIZE <= 0:
+        return
+    expires_at = min(token_exp or 0, time.time() + Config.AUTH_CACHE_TTL)
+    with _auth_cache_lock:
+        _auth_cache[token] = (user, expires_at)
+        _auth_cache.move_to_end(token)
+        while len(_auth_cache) > Config.AUTH_CACHE_SIZE:
+            _auth_cache.popitem(last=False)
+
+def invalidate_user(email):
+    """
+    Drop every cached token of a user (e.g. after account deletion)
+    Other warm containers keep their entries for at most AUTH_CACHE_TTL seconds
+    Args:
+        email: Email of the user to invalidate
+    """
+    with _auth_cache_lock:
+        for token in [t for t, (user, _) in _auth_cache.items() if user.get('email') == email]:
+            del _auth_cache[token]
+
+def get_authenticated_user(event, read_only=False):
     """
     Get authenticated user from JWT token
+    Verified tokens are cached in-process so repeated requests skip the
+    users_table read. With AUTH_TRUST_CLAIMS_ON_READ enabled, read-only routes
+    build the user from the signed claims alone.
     Args:
         event: Lambda event object containing headers
+        read_only: True for routes that only need the user's identity
     Returns:
         dict: User object if valid token, None otherwise
     """
@@ -56,6 +114,10 @@ def get_authenticated_user(event):
         return None
     
     token = auth_header.split(' ')[1]
+
+    user = _get_cached_user(token)
+    if user is not None:
+        return user
     
     try:
         payload = jwt.decode(token, Config.JWT_SECRET, algorithms=['HS256'])
@@ -63,13 +125,23 @@ def get_authenticated_user(event):
         
         if not email:
             return None
+
+        if read_only and Config.AUTH_TRUST_CLAIMS_ON_READ:
+            return {
+                'user_id': payload.get('user_id'),
+                'email': email,
+                'name': payload.get('name')
+            }
         
         # Get user from DynamoDB
         response = db.users_table.get_item(
             Key={'email': email}
         )
         
-        return response.get('Item')
+        user = response.get('Item')
+        if user:
+            _cache_user(token, user, payload.get('exp'))
+        return user
     except jwt.ExpiredSignatureError:
         if Config.DEBUG_MODE:
             print("JWT token expired")
@@ -120,20 +192,135 @@ def verify_password(password, stored_hash, salt):
     computed_hash = hash_password(password, salt)
     return computed_hash == stored_hash
 
-def build_response(status_code, body):
+def build_response(status_code, body, headers=None, accept_encoding=None):
     """
     Build API Gateway response with proper CORS headers
     Args:
         status_code: HTTP status code
         body: Response body (will be JSON encoded)
+        headers: Optional extra response headers
+        accept_encoding: Client Accept-Encoding header; large bodies are
+                         compressed (br or gzip) and base64 encoded when set
     Returns:
         dict: API Gateway response object
     """
-    return {
-        'statusCode': status_code,
-        'headers': get_cors_headers(),
-        'body': json.dumps(body) if not isinstance(body, str) else body
-    }
+    response_headers = get_cors_headers()
+    if headers:
+        response_headers.update(headers)
+    with tracing.span('serialize'):
+        response = {
+            'statusCode': status_code,
+            'headers': response_headers,
+            'body': encode_json(body) if not isinstance(body, str) else body
+        }
+    if accept_encoding:
+        with tracing.span('compress'):
+            compress_response(response, accept_encoding)
+    return response
+
+def get_accept_encoding(event):
+    """Get the Accept-Encoding request header regardless of header name casing"""
+    headers = event.get('headers') or {}
+    for name, value in headers.items():
+        if name.lower() == 'accept-encoding':
+            return value
+    return None
+
+def choose_encoding(accept_encoding):
+    """
+    Pick the response encoding from an Accept-Encoding header
+    Args:
+        accept_encoding: header value, e.g. 'gzip, deflate, br;q=0.9'
+    Returns:
+        str: 'br', 'gzip' or None
+    """
+    accepted = {}
+    for part in accept_encoding.split(','):
+        token, _, params = part.strip().partition(';')
+        quality = 1.0
+        params = params.strip()
+        if params.startswith('q='):
+            try:
+                quality = float(params[2:])
+            except ValueError:
+                quality = 0.0
+        accepted[token.strip().lower()] = quality
+
+    candidates = (['br'] if brotli is not None else []) + ['gzip']
+    wildcard = accepted.get('*', 0.0)
+    best = max(candidates, key=lambda enc: accepted.get(enc, wildcard))
+    return best if accepted.get(best, wildcard) > 0 else None
+
+def compress_response(response, accept_encoding):
+    """
+    Compress a response body in place when the client accepts it
+    Bodies below COMPRESSION_MIN_BYTES are left as-is
+    Args:
+        response: response dict from build_response
+        accept_encoding: client Accept-Encoding header
+    Returns:
+        dict: the same response dict
+    """
+    raw = response['body'].encode('utf-8')
+    response['headers']['Vary'] = 'Accept-Encoding'
+    if not Config.ENABLE_COMPRESSION or len(raw) < Config.COMPRESSION_MIN_BYTES:
+        return response
+
+    encoding = choose_encoding(accept_encoding)
+    if encoding == 'br':
+        compressed = brotli.compress(raw, quality=Config.BROTLI_QUALITY)
+    elif encoding == 'gzip':
+        compressed = gzip.compress(raw, compresslevel=Config.GZIP_LEVEL)
+    else:
+        return response
+
+    response['body'] = base64.b64encode(compressed).decode('ascii')
+    response['isBase64Encoded'] = True
+    response['headers']['Content-Encoding'] = encoding
+    return response
+
+def _json_default(obj):
+    """Serialize types json/orjson don't handle natively (DynamoDB Decimals, sets, numpy values)"""
+    if isinstance(obj, Decimal):
+        return int(obj) if obj % 1 == 0 else float(obj)
+    if isinstance(obj, (set, frozenset)):
+        return list(obj)
+    if hasattr(obj, 'tolist'):
+        return obj.tolist()
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+def encode_json(body):
+    """
+    Encode a response body to JSON in a single pass
+    DynamoDB items can be passed as-is: Decimal values are converted by the
+    default hook while encoding instead of copying the structure beforehand.
+    Uses orjson when installed unless JSON_BACKEND is 'json'.
+    Args:
+        body: JSON-serializable object, possibly containing Decimal values
+    Returns:
+        str: JSON document
+    """
+    if orjson is not None and Config.JSON_BACKEND != 'json':
+        return orjson.dumps(
+            body,
+            default=_json_default,
+            option=orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY
+        ).decode('utf-8')
+    return json.dumps(body, default=_json_default, separators=(',', ':'))
+
+def get_path_parameter(event, path_params, name):
+    """
+    Get a path parameter extracted by the router
+    Args:
+        event: Lambda event object
+        path_params: Parameters matched by lambda_handler's router (may be None)
+        name: Parameter name from the route template
+    Returns:
+        str: Parameter value, falling back to API Gateway pathParameters
+    """
+    if path_params and path_params.get(name):
+        return path_params[name]
+    return (event.get('pathParameters') or {}).get(name)
 
 def validate_email(email):
     """
@@ -188,7 +375,7 @@ def validate_password_strength(password):
 
 def log_user_activity(user_id, action, data=None):
     """
-    Log user activity to activity table if logging is enabled
+    Queue user activity for the activity table if logging is enabled
     Args:
         user_id: User ID performing the action
         action: Action being performed
@@ -208,10 +395,8 @@ def log_user_activity(user_id, action, data=None):
     if data:
         item['data'] = data
     
-    try:
-        db.activity_table.put_item(Item=item)
-    except Exception as e:
-        print(f"Error logging activity: {str(e)}")
+    # Buffered and written in batches off the request path
+    activity_log.record(item)
 
 def sanitize_input(input_string, max_length=None):
     """